@@ -8,6 +8,9 @@ from api.v1.routes import (
     generate_video,
     picture_ads,
     download,
+    events,
+    metrics,
+    webhooks,
 )
 from api.v1.services.auth import get_current_user
 
@@ -16,6 +19,7 @@ router = APIRouter()
 secure_router = APIRouter(dependencies=[Depends(get_current_user)])
 
 router.include_router(login.router, tags=["Auth"], prefix="/auth")
+router.include_router(webhooks.router, tags=["Webhooks"], prefix="/webhooks")
 secure_router.include_router(download.router, prefix="/download")
 secure_router.include_router(
     generate_image.router, tags=["Generate Image"], prefix="/generate"
@@ -30,3 +34,6 @@ router.include_router(
 secure_router.include_router(
     picture_ads.router, tags=["Picture Ads"], prefix="/picture-ads"
 )
+secure_router.include_router(metrics.router, tags=["Metrics"], prefix="/metrics")
+# EventSource không gửi được header: /events tự xác thực (token trên query string)
+router.include_router(events.router, tags=["Events"], prefix="/events")
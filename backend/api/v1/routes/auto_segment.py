@@ -1,13 +1,11 @@
-import asyncio
-from http.client import HTTPException
 import json
 from api.v1.schemas.auto_segment import (
-    ImageProcessRequest,
     SegmentationResult,
     WebSocketMessage,
 )
 from api.v1.services.auth import get_current_user
-from api.v1.services.auto_segment import process_image_with_sam
+from api.v1.services.auto_segment import SegmentSession
+from core.config import settings
 from core.database import get_db
 from core.websocket import manager
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
@@ -59,6 +57,13 @@ router = APIRouter()
 @router.websocket("/{client_id}")
 async def websocket_endpoint(websocket: WebSocket, client_id: str):
     await websocket.accept()
+    # SAM2 chạy trong task riêng để vòng nhận luôn đọc được message mới
+    session = SegmentSession(
+        send=lambda data: manager.send_json(data, client_id),
+        max_concurrency=settings.SEGMENT_MAX_CONCURRENCY,
+        debounce=settings.SEGMENT_PROMPT_DEBOUNCE,
+        stage_images=settings.SEGMENT_STAGE_IMAGES,
+    )
 
     try:
         print(f"Client {client_id} đã kết nối")
@@ -70,86 +75,12 @@ async def websocket_endpoint(websocket: WebSocket, client_id: str):
                 data = await websocket.receive_text()
                 message_data = json.loads(data)
                 action = message_data.get("action")
+                seq = session.next_seq(message_data)
 
-                if action == "process_image":
-                    # Xử lý action process_image
-                    await manager.send_json(
-                        {"status": "processing", "message": "Đang xử lý ảnh..."},
-                        client_id,
-                    )
-
-                    image_url = message_data.get("image_url")
-                    prompts = message_data.get("prompts")
-                    box_prompts = message_data.get("box_prompts", [])
-
-                    result = await process_image_with_sam(
-                        image_url, prompts, box_prompts
-                    )
-                    result_image_url = result.get("image", {}).get("url", "")
-
-                    if result_image_url:
-                        await manager.send_json(
-                            {
-                                "status": "success",
-                                "result": {
-                                    "image_url": result_image_url,
-                                    "original_image_url": image_url,
-                                },
-                            },
-                            client_id,
-                        )
-                    else:
-                        await manager.send_json(
-                            {
-                                "status": "error",
-                                "message": "Không nhận được URL ảnh kết quả",
-                            },
-                            client_id,
-                        )
-
-                elif action == "update_prompt":
-                    # Xử lý action update_prompt
-                    print(f"Client {client_id} yêu cầu cập nhật prompt")
-                    await manager.send_json(
-                        {
-                            "status": "processing",
-                            "message": "Đang cập nhật với prompt mới...",
-                        },
-                        client_id,
-                    )
-
-                    image_url = message_data.get("image_url")
-                    prompts = message_data.get("prompts")
-                    box_prompts = message_data.get("box_prompts", [])
-
-                    result = await process_image_with_sam(
-                        image_url, prompts, box_prompts
-                    )
-                    result_image_url = result.get("image", {}).get("url", "")
-
-                    if result_image_url:
-                        print(f"Cập nhật prompt thành công cho client {client_id}")
-                        await manager.send_json(
-                            {
-                                "status": "success",
-                                "result": {
-                                    "image_url": result_image_url,
-                                    "original_image_url": image_url,
-                                },
-                            },
-                            client_id,
-                        )
-                    else:
-                        print(
-                            f"Lỗi: Không nhận được URL ảnh kết quả cho client {client_id}"
-                        )
-                        await manager.send_json(
-                            {
-                                "status": "error",
-                                "message": "Không nhận được URL ảnh kết quả",
-                            },
-                            client_id,
-                        )
+                if action in ("process_image", "update_prompt"):
+                    if action == "update_prompt":
+                        print(f"Client {client_id} yêu cầu cập nhật prompt")
+                    await session.submit(action, message_data, seq)
 
                 elif action == "broadcast":
                     # Xử lý action broadcast
@@ -166,19 +97,18 @@ async def websocket_endpoint(websocket: WebSocket, client_id: str):
 
                 else:
                     print(f"Client {client_id} gửi action không hợp lệ: {action}")
-                    await manager.send_json(
+                    await session.send(
                         {
                             "status": "error",
                             "message": f"Action không hợp lệ: {action}",
                         },
-                        client_id,
+                        seq,
                     )
 
             except json.JSONDecodeError:
                 print(f"Lỗi: Dữ liệu JSON không hợp lệ từ client {client_id}")
-                await manager.send_json(
-                    {"status": "error", "message": "Dữ liệu JSON không hợp lệ"},
-                    client_id,
+                await session.send(
+                    {"status": "error", "message": "Dữ liệu JSON không hợp lệ"}
                 )
             except WebSocketDisconnect:
                 # Client đã ngắt kết nối, thoát khỏi vòng lặp
@@ -187,10 +117,7 @@ async def websocket_endpoint(websocket: WebSocket, client_id: str):
                 break
             except Exception as e:
                 print(f"Lỗi khi xử lý message từ client {client_id}: {str(e)}")
-                await manager.send_json(
-                    {"status": "error", "message": f"Lỗi: {str(e)}"},
-                    client_id,
-                )
+                await session.send({"status": "error", "message": f"Lỗi: {str(e)}"})
 
     except WebSocketDisconnect:
         print(f"Client {client_id} đã ngắt kết nối")
@@ -200,4 +127,7 @@ async def websocket_endpoint(websocket: WebSocket, client_id: str):
         print(f"WebSocket error với client {client_id}: {str(e)}")
         manager.disconnect(client_id)
 
+    finally:
+        await session.aclose()
+
     print(f"Kết thúc xử lý cho client {client_id}")
@@ -1,67 +1,172 @@
-from fastapi import APIRouter, HTTPException, Request
-from fastapi.responses import StreamingResponse
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import FileResponse, RedirectResponse, StreamingResponse
 import httpx
+import mimetypes
 import urllib.parse
 import re
 
+from core.blob_cache import BlobCacheError, blob_cache
+from core.clients import get_image_storage
+from core.config import settings
+from core.google_cloud import ImageStorage
+from core.http_clients import http_clients
+
 
 router = APIRouter()
 
+# Header của client được chuyển tiếp lên upstream (Range cho tua video / tải tiếp,
+# If-None-Match... cho revalidate cache)
+FORWARDED_REQUEST_HEADERS = (
+    "range",
+    "if-range",
+    "if-none-match",
+    "if-modified-since",
+)
+
+FORWARDED_RESPONSE_HEADERS = (
+    "content-length",
+    "content-range",
+    "accept-ranges",
+    "etag",
+    "last-modified",
+    # aiter_raw chuyển nguyên byte đã nén (nếu có) của upstream
+    "content-encoding",
+)
+
+
+def _bucket_object_path(url: str) -> Optional[str]:
+    """Đường dẫn object nếu url trỏ tới bucket của mình, ngược lại None."""
+    parsed = urllib.parse.urlsplit(url)
+    if parsed.netloc != "storage.googleapis.com":
+        return None
+    prefix = f"/{settings.GCS_BUCKET_NAME}/"
+    if not parsed.path.startswith(prefix):
+        return None
+    return urllib.parse.unquote(parsed.path[len(prefix) :])
+
+
+def _is_cached_asset(url: str, filename: str) -> bool:
+    """Ảnh trong bucket của mình được phục vụ qua cache đĩa cục bộ."""
+    if _bucket_object_path(url) is None:
+        return False
+    guessed_type = mimetypes.guess_type(filename)[0]
+    return bool(guessed_type and guessed_type.startswith("image/"))
+
+
+async def _iter_upstream(upstream: httpx.Response):
+    # Đóng response upstream kể cả khi client ngắt kết nối giữa chừng
+    try:
+        async for chunk in upstream.aiter_raw():
+            yield chunk
+    finally:
+        await upstream.aclose()
+
 
 @router.get("/")
-async def download_file(request: Request, url: str):
+async def download_file(
+    request: Request,
+    url: str,
+    storage: ImageStorage = Depends(get_image_storage),
+):
     filename = url.split("/")[-1]
     filename = filename.split("?")[0]
     filename = urllib.parse.unquote(filename)
     filename = re.sub(r'[\\/*?:"<>|]', "_", filename)
 
-    try:
-        async with httpx.AsyncClient(follow_redirects=True, timeout=30.0) as client:
-            headers = {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-                "Referer": url,
+    # Chế độ signed: client tải thẳng từ GCS qua signed URL, worker không
+    # phải chuyển tiếp bytes
+    object_path = _bucket_object_path(url)
+    if object_path and settings.GCS_DELIVERY_MODE == "signed":
+        signed_url = await storage.generate_signed_url(
+            object_path,
+            response_disposition=f'attachment; filename="{filename}"',
+        )
+        return RedirectResponse(signed_url, status_code=302)
+
+    if _is_cached_asset(url, filename):
+        try:
+            entry = await blob_cache.fetch(url)
+        except BlobCacheError as e:
+            if e.status_code != 413:
+                raise HTTPException(
+                    status_code=e.status_code,
+                    detail=f"Lỗi HTTP {e.status_code}: {str(e)}",
+                )
+        else:
+            cached_headers = {
+                "Cache-Control": "private, no-cache",
+                "ETag": entry.etag,
             }
+            if request.headers.get("if-none-match") == entry.etag:
+                return Response(status_code=304, headers=cached_headers)
 
-            head_response = await client.head(url, headers=headers)
-            content_type = head_response.headers.get(
-                "content-type", "application/octet-stream"
+            return FileResponse(
+                entry.path,
+                media_type=entry.content_type,
+                filename=filename,
+                headers=cached_headers,
             )
 
-            if "image" in content_type.lower():
-                media_type = content_type
-            else:
-                if filename.lower().endswith((".jpg", ".jpeg")):
-                    media_type = "image/jpeg"
-                elif filename.lower().endswith(".png"):
-                    media_type = "image/png"
-                elif filename.lower().endswith(".gif"):
-                    media_type = "image/gif"
-                elif filename.lower().endswith(".pdf"):
-                    media_type = "application/pdf"
-                else:
-                    media_type = "application/octet-stream"
-
-            # Gửi request GET để tải file
-            response = await client.get(url, headers=headers)
-            response.raise_for_status()
-
-            # Trả về response dạng stream với header tải xuống
-            return StreamingResponse(
-                content=response.iter_bytes(),
-                media_type=media_type,
-                headers={
-                    "Content-Disposition": f'attachment; filename="{filename}"',
-                    "Cache-Control": "no-cache, no-store, must-revalidate",
-                    "Pragma": "no-cache",
-                    "Expires": "0",
-                },
-            )
-    except httpx.HTTPStatusError as e:
-        status_code = e.response.status_code
-        raise HTTPException(
-            status_code=status_code, detail=f"Lỗi HTTP {status_code}: {str(e)}"
+    client = http_clients.for_url(url)
+    headers = {
+        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+        "Referer": url,
+    }
+    for name in FORWARDED_REQUEST_HEADERS:
+        if name in request.headers:
+            headers[name] = request.headers[name]
+
+    try:
+        # Chỉ một request GET dạng stream, không HEAD và không buffer toàn bộ file
+        upstream = await client.send(
+            client.build_request("GET", url, headers=headers), stream=True
         )
     except httpx.RequestError as e:
         raise HTTPException(status_code=500, detail=f"Lỗi kết nối: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Lỗi không xác định: {str(e)}")
+
+    if upstream.status_code >= 400:
+        status_code = upstream.status_code
+        await upstream.aclose()
+        raise HTTPException(
+            status_code=status_code,
+            detail=f"Lỗi HTTP {status_code}: {upstream.reason_phrase}",
+        )
+
+    content_type = upstream.headers.get("content-type", "application/octet-stream")
+
+    if "image" in content_type.lower() or "video" in content_type.lower():
+        media_type = content_type
+    else:
+        if filename.lower().endswith((".jpg", ".jpeg")):
+            media_type = "image/jpeg"
+        elif filename.lower().endswith(".png"):
+            media_type = "image/png"
+        elif filename.lower().endswith(".gif"):
+            media_type = "image/gif"
+        elif filename.lower().endswith(".pdf"):
+            media_type = "application/pdf"
+        else:
+            media_type = "application/octet-stream"
+
+    response_headers = {
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        # Cho phép trình duyệt giữ bản sao nhưng phải revalidate bằng ETag
+        "Cache-Control": "private, no-cache",
+    }
+    for name in FORWARDED_RESPONSE_HEADERS:
+        if name in upstream.headers:
+            response_headers[name] = upstream.headers[name]
+
+    if upstream.status_code == 304:
+        await upstream.aclose()
+        return Response(status_code=304, headers=response_headers)
+
+    return StreamingResponse(
+        content=_iter_upstream(upstream),
+        status_code=upstream.status_code,
+        media_type=media_type,
+        headers=response_headers,
+    )
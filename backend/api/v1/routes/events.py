@@ -0,0 +1,84 @@
+import json
+from datetime import timedelta
+from enum import Enum
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+from api.v1.services.auth import get_current_user, get_events_user
+from api.v1.services.provider_jobs import provider_job_store
+from api.v1.services.video_jobs import video_job_store
+from core.config import settings
+from core.events import job_events
+from core.security import EVENTS_TOKEN_SCOPE, create_token
+from models.user import User
+
+router = APIRouter()
+
+
+class JobTopic(str, Enum):
+    VIDEO = "video"
+    LEONARDO = "leonardo"
+    VARIATION = "variation"
+
+
+@router.post("/token")
+async def create_events_token(current_user: User = Depends(get_current_user)):
+    """Token ngắn hạn để mở EventSource (truyền qua ?token=)."""
+    token = create_token(
+        subject=current_user.email,
+        expires_delta=timedelta(seconds=settings.SSE_TOKEN_TTL),
+        scope=EVENTS_TOKEN_SCOPE,
+    )
+    return {"token": token, "expires_in": settings.SSE_TOKEN_TTL}
+
+
+@router.get("/{topic}/{job_id}")
+async def stream_job_events(
+    topic: JobTopic,
+    job_id: str,
+    request: Request,
+    current_user: User = Depends(get_events_user),
+):
+    """
+    Server-Sent Events: gửi trạng thái hiện tại rồi mỗi lần trạng thái job thay
+    đổi, đóng stream khi job kết thúc. Thay cho việc client gọi lại các
+    endpoint status liên tục. Xác thực bằng token từ POST /events/token.
+    """
+    if topic == JobTopic.VIDEO:
+        job = await video_job_store.get(job_id)
+        if job is None or (
+            job.user_id is not None and job.user_id != current_user.id
+        ):
+            raise HTTPException(status_code=404, detail="Request not found")
+    else:
+        # Job Leonardo ghi chủ sở hữu vào provider_jobs lúc submit
+        provider_job = await provider_job_store.get(topic.value, job_id)
+        if (
+            provider_job is not None
+            and provider_job.user_id is not None
+            and provider_job.user_id != current_user.id
+        ):
+            raise HTTPException(status_code=404, detail="Request not found")
+
+    subscription = job_events.subscribe(topic.value, job_id)
+
+    async def event_stream():
+        try:
+            while not await request.is_disconnected():
+                event = await subscription.get(timeout=settings.SSE_KEEPALIVE_SECONDS)
+                if event is None:
+                    yield ": keep-alive\n\n"
+                    continue
+
+                yield f"event: status\ndata: {json.dumps(event)}\n\n"
+                if event["final"]:
+                    break
+        finally:
+            subscription.close()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,32 +1,28 @@
 import io
 import base64
-import aiohttp
 from typing import Optional, List
 import uuid
 from api.v1.schemas.generate_image import (
+    DeleteImagesRequest,
+    DeleteImagesResponse,
     GenerateImageRequest,
     ImageHistoryPaginatedResponse,
     ImageResponse,
 )
 from fastapi import APIRouter, Depends, File, Form, UploadFile, HTTPException, Query
-from openai import OpenAI, OpenAIError
+from openai import OpenAIError
 from api.v1.services.auth import get_current_user
 from api.v1.services.image import (
     ImageHistoryService,
     ImageService,
     prepare_openai_params,
 )
+from core.blob_cache import BlobCacheError, blob_cache
+from core.clients import get_image_service
 from core.config import settings
 from core.database import DbSession
 from models.user import Image, User
 
-client = OpenAI(api_key=settings.OPENAI_API_KEY)
-image_service = ImageService(
-    openai_api_key=settings.OPENAI_API_KEY,
-    bucket_name=settings.GCS_BUCKET_NAME,
-    credentials_path=settings.GCS_CREDENTIALS_PATH,
-)
-
 router = APIRouter()
 
 
@@ -35,6 +31,7 @@ async def generate_image(
     db: DbSession,
     data: GenerateImageRequest,
     current_user: User = Depends(get_current_user),
+    image_service: ImageService = Depends(get_image_service),
 ):
     try:
         params = prepare_openai_params(
@@ -78,6 +75,7 @@ async def edit_image(
     image: UploadFile = File(...),
     mask: Optional[UploadFile] = File(None),
     current_user: User = Depends(get_current_user),
+    image_service: ImageService = Depends(get_image_service),
 ):
     source_image = None
     mask_source_image = None
@@ -166,6 +164,7 @@ async def batch_edit_images(
     output_compression: Optional[int] = Form(None),
     images: List[UploadFile] = File(...),
     current_user: User = Depends(get_current_user),
+    image_service: ImageService = Depends(get_image_service),
 ):
     if not images or len(images) == 0:
         raise HTTPException(status_code=400, detail="No images provided")
@@ -235,15 +234,42 @@ async def get_image_history(
     db: DbSession,
     page: int = Query(1, ge=1, description="Số trang"),
     size: int = Query(10, ge=1, le=100, description="Kích thước trang"),
+    cursor: Optional[str] = Query(
+        None, description="next_cursor của trang trước; ưu tiên hơn page"
+    ),
+    include_total: bool = Query(True, description="Đếm tổng số ảnh"),
     current_user: User = Depends(get_current_user),
+    image_service: ImageService = Depends(get_image_service),
 ):
     try:
-        images, total = await ImageHistoryService.get_user_image_history(
-            db=db, user_id=current_user.id, page=page, size=size, is_source=False
-        )
+        try:
+            images, total, next_cursor = (
+                await ImageHistoryService.get_user_image_history(
+                    db=db,
+                    user_id=current_user.id,
+                    page=page,
+                    size=size,
+                    is_source=False,
+                    cursor=cursor,
+                    include_total=include_total,
+                )
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        signed_urls = None
+        if settings.GCS_DELIVERY_MODE == "signed":
+            signed_urls = await ImageHistoryService.sign_history_urls(
+                images=images, image_storage=image_service.image_storage
+            )
 
         result = ImageHistoryService.format_image_history_response(
-            images=images, total=total, page=page, size=size
+            images=images,
+            total=total,
+            page=page,
+            size=size,
+            signed_urls=signed_urls,
+            next_cursor=next_cursor,
         )
 
         return result
@@ -265,12 +291,13 @@ async def edit_image_from_url(
     image_url: str = Form(...),  # URL từ Google Cloud Storage
     mask_file: Optional[UploadFile] = File(None),
     current_user: User = Depends(get_current_user),
+    image_service: ImageService = Depends(get_image_service),
 ):
     source_image_record = None
     mask_source_image = None
 
     try:
-        url_parts = image_url.split("/")
+        url_parts = image_url.split("?")[0].split("/")
         bucket_name = url_parts[3]
         gcs_filename = "/".join(url_parts[4:])
         original_filename = url_parts[-1]
@@ -280,7 +307,7 @@ async def edit_image_from_url(
             user_id=current_user.id,
             gcs_bucket=bucket_name,
             gcs_filename=gcs_filename,
-            gcs_public_url=image_url,
+            gcs_public_url=image_url.split("?")[0],
             original_filename=original_filename,
             content_type=f"image/{image_format}",
             size_bytes=0,
@@ -289,16 +316,17 @@ async def edit_image_from_url(
         )
 
         db.add(source_image_record)
-        await db.flush()
+        # Commit ngay: bộ đếm ảnh khóa hàng users tới khi commit, không giữ
+        # khóa đó trong lúc tải ảnh và gọi OpenAI
+        await db.commit()
 
-        async with aiohttp.ClientSession() as session:
-            async with session.get(image_url) as response:
-                if response.status != 200:
-                    raise HTTPException(
-                        status_code=400,
-                        detail=f"Không thể tải ảnh từ URL: {response.status}",
-                    )
-                image_data = await response.read()
+        try:
+            image_data = await blob_cache.read(image_url)
+        except BlobCacheError as e:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Không thể tải ảnh từ URL: {e.status_code}",
+            )
 
         source_image_record.size_bytes = len(image_data)
         image_file = io.BytesIO(image_data)
@@ -374,11 +402,29 @@ async def edit_image_from_url(
         raise e
 
 
+@router.delete("/history", response_model=DeleteImagesResponse)
+async def delete_images(
+    payload: DeleteImagesRequest,
+    db: DbSession,
+    current_user: User = Depends(get_current_user),
+):
+    """Xóa nhiều ảnh trong lịch sử cùng lúc; id không tồn tại trả về trong not_found_ids."""
+    try:
+        return await ImageHistoryService.delete_images(
+            db=db,
+            image_ids=payload.image_ids,
+            user_id=current_user.id,
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error deleting images: {str(e)}")
+
+
 @router.delete("/history/{image_id}", response_model=dict)
 async def delete_image(
     image_id: int,
     db: DbSession,
     current_user: User = Depends(get_current_user),
+    image_service: ImageService = Depends(get_image_service),
 ):
     try:
         result = await ImageHistoryService.delete_image_with_sources(
@@ -7,15 +7,22 @@ from api.v1.schemas.video import (
     VideoResponse,
 )
 from fastapi import APIRouter, BackgroundTasks, File, HTTPException, Depends, UploadFile
-import fal_client
 import httpx
+from api.v1.services.archiver import artifact_archiver
+from api.v1.services.auth import get_current_user
+from api.v1.services.job_poller import job_poller
+from api.v1.services.video_jobs import video_job_store
+from api.v1.services.video_scheduler import video_scheduler
+from api.v1.services.video_worker import video_worker
+from core.clients import get_video_storage
 from core.config import settings
+from core.google_cloud import VideoStorage
+from core.http_clients import http_clients
+from models.user import User
 
 
 router = APIRouter()
 
-request_states = {}
-
 # SAMPLE_VIDEO_URLS = [
 #     "https://v3.fal.media/files/lion/DDHlO3zS6d9QvQTZqC6L0_output.mp4",
 #     "https://v3.fal.media/files/kangaroo/IkMxgPpvf3jZ5UKfrlnEY_output.mp4",
@@ -26,12 +33,16 @@ request_states = {}
 
 @router.post("/video", response_model=VideoResponse, status_code=202)
 async def generate_video(
-    request: GenerateVideoRequest, background_tasks: BackgroundTasks
+    request: GenerateVideoRequest,
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user),
 ):
     request_id = str(uuid.uuid4())
-    request_states[request_id] = {"status": "pending"}
+    await video_job_store.create(request_id, request, user_id=current_user.id)
 
-    background_tasks.add_task(process_video_request, request, request_id)
+    background_tasks.add_task(
+        video_worker.process, request, request_id, current_user.id
+    )
 
     return VideoResponse(request_id=request_id, status="pending")
 
@@ -62,47 +73,32 @@ async def generate_video(
 #         }
 
 
-async def process_video_request(request: GenerateVideoRequest, request_id: str):
-    try:
-        handler = await fal_client.submit_async(
-            "fal-ai/kling-video/v2/master/image-to-video",
-            arguments={
-                "prompt": request.prompt,
-                "image_url": str(request.image_url),
-                "duration": request.duration,
-                "aspect_ratio": request.aspect_ratio,
-                "negative_prompt": request.negative_prompt,
-                "cfg_scale": request.cfg_scale,
-            },
-        )
-
-        request_states[request_id]["status"] = "processing"
-        result = await handler.get()
-
-        if "video" in result and "url" in result["video"]:
-            request_states[request_id] = {
-                "status": "completed",
-                "video_url": result["video"]["url"],
-            }
-        else:
-            request_states[request_id] = {
-                "status": "failed",
-                "error": "No video URL in response",
-            }
-    except Exception as e:
-        request_states[request_id] = {"status": "failed", "error": str(e)}
-
-
 @router.get("/status/{request_id}", response_model=VideoResponse)
-async def check_status(request_id: str):
-    if request_id not in request_states:
+async def check_status(
+    request_id: str,
+    current_user: User = Depends(get_current_user),
+    video_storage: VideoStorage = Depends(get_video_storage),
+):
+    job = await video_job_store.get(request_id)
+    if job is None or (job.user_id is not None and job.user_id != current_user.id):
         raise HTTPException(status_code=404, detail="Request not found")
 
-    state = request_states[request_id]
-    response = VideoResponse(request_id=request_id, status=state["status"])
+    response = VideoResponse(request_id=request_id, status=job.status)
 
-    if state["status"] == "completed" and "video_url" in state:
-        response.video_url = state["video_url"]
+    if job.status == "completed" and job.video_url:
+        response.video_url = job.video_url
+        if job.gcs_filename and settings.GCS_DELIVERY_MODE == "signed":
+            response.video_url = (
+                await video_storage.generate_signed_url(
+                    job.gcs_filename, expiration=settings.GCS_SIGNED_URL_TTL
+                )
+                or job.video_url
+            )
+    elif job.status == "pending":
+        position = video_scheduler.position(request_id)
+        if position is not None:
+            response.queue_position = position
+            response.eta_seconds = video_scheduler.eta_seconds(position)
 
     return response
 
@@ -146,13 +142,13 @@ async def call_leonardo_api(
 
 
 async def get_http_client():
-    async with httpx.AsyncClient(timeout=60.0) as client:
-        yield client
+    return http_clients.get("leonardo")
 
 
 @router.post("/text-to-video", response_model=GenerationLeonardoResponse)
 async def generate_text_to_video(
     request: VideoGenerationRequest,
+    current_user: User = Depends(get_current_user),
     client: httpx.AsyncClient = Depends(get_http_client),
 ):
     payload = {
@@ -187,39 +183,20 @@ async def generate_text_to_video(
             status_code=500, detail="Failed to get generation ID from Leonardo.ai"
         )
 
+    # Video được lưu vào bucket khi generation hoàn tất, trên bất kỳ worker nào
+    await artifact_archiver.expect("leonardo", generation_id, user_id=current_user.id)
+
     return GenerationLeonardoResponse(generation_id=generation_id, status="pending")
 
 
 @router.get("/leonardo-status/{generation_id}")
 async def get_generation_status(
-    generation_id: str, client: httpx.AsyncClient = Depends(get_http_client)
+    generation_id: str,
 ):
-    endpoint = f"generations/{generation_id}"
-    response = await call_leonardo_api(client, endpoint)
-
-    if "error" in response:
-        raise HTTPException(
-            status_code=response.get("status_code", 500), detail=response["error"]
-        )
-
-    generation_status = response.get("generations_by_pk", {}).get("status", "UNKNOWN")
-
-    result = {
-        "id": generation_id,
-        "status": generation_status,
-    }
-
-    if generation_status == "COMPLETE":
-        generated_items = response.get("generations_by_pk", {}).get(
-            "generated_images", []
-        )
-        if generated_items:
-            result["video_url"] = generated_items[0].get("motionMP4URL")
-
-    elif generation_status == "FAILED":
-        result["error"] = "Generation failed"
-
-    return result
+    try:
+        return await job_poller.get("leonardo", generation_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.post("/upload-to-leonardo", response_model=dict)
@@ -256,6 +233,7 @@ async def upload_to_leonardo(
 @router.post("/image-to-video", response_model=GenerationLeonardoResponse)
 async def generate_image_to_video(
     request: ImageToVideoRequest,
+    current_user: User = Depends(get_current_user),
     client: httpx.AsyncClient = Depends(get_http_client),
 ):
     payload = {
@@ -278,4 +256,7 @@ async def generate_image_to_video(
             status_code=500, detail="Failed to get generation ID from Leonardo.ai"
         )
 
+    # Video được lưu vào bucket khi generation hoàn tất, trên bất kỳ worker nào
+    await artifact_archiver.expect("leonardo", generation_id, user_id=current_user.id)
+
     return GenerationLeonardoResponse(generation_id=generation_id, status="pending")
@@ -0,0 +1,40 @@
+from fastapi import APIRouter
+
+from api.v1.services.archiver import artifact_archiver
+from api.v1.services.auth import user_cache
+from api.v1.services.auto_segment import segmentation_cache
+from api.v1.services.gcs_outbox import gcs_purger
+from api.v1.services.gcs_reconciler import bucket_reconciler
+from api.v1.services.image_counters import image_counter_reconciler
+from api.v1.services.job_poller import job_poller
+from api.v1.services.video_jobs import video_job_store
+from api.v1.services.video_scheduler import video_scheduler
+from core.blob_cache import blob_cache
+from core.events import job_events
+from core.executors import executor_stats
+from core.google_cloud import signed_url_cache
+from core.http_clients import http_clients
+from core.startup import startup_timer
+
+router = APIRouter()
+
+
+@router.get("/", response_model=dict)
+async def get_metrics():
+    return {
+        "executors": executor_stats(),
+        "blob_cache": blob_cache.stats(),
+        "signed_url_cache": signed_url_cache.stats(),
+        "http_pools": http_clients.stats(),
+        "startup": startup_timer.stats(),
+        "video_jobs": video_job_store.stats(),
+        "video_scheduler": video_scheduler.stats(),
+        "job_events": job_events.stats(),
+        "job_poller": job_poller.stats(),
+        "archiver": artifact_archiver.stats(),
+        "auth_cache": user_cache.stats(),
+        "image_counters": image_counter_reconciler.stats(),
+        "gcs_purger": gcs_purger.stats(),
+        "bucket_reconciler": bucket_reconciler.stats(),
+        "segmentation_cache": segmentation_cache.stats(),
+    }
@@ -8,22 +8,22 @@ from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile
 from openai import AsyncOpenAI, OpenAIError
 
 from api.v1.schemas.generate_image import ImageResponse
+from api.v1.services.archiver import artifact_archiver
+from api.v1.services.auth import get_current_user
+from api.v1.services.gcs_reconciler import UNTRACKED_IMAGE_FOLDER
 from api.v1.services.image import ImageService, prepare_openai_params
+from api.v1.services.job_poller import job_poller
 from api.v1.services.leonardo import LeonardoService
-from core.config import settings
+from core.clients import (
+    get_image_service,
+    get_image_storage,
+    get_leonardo_service,
+    get_openai_client,
+)
 from core.google_cloud import ImageStorage
+from models.user import User
 
-client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
 router = APIRouter()
-image_service = ImageService(
-    openai_api_key=settings.OPENAI_API_KEY,
-    bucket_name=settings.GCS_BUCKET_NAME,
-    credentials_path=settings.GCS_CREDENTIALS_PATH,
-)
-
-image_storage = ImageStorage(
-    bucket_name=settings.GCS_BUCKET_NAME, credentials_path=settings.GCS_CREDENTIALS_PATH
-)
 
 
 class PromptInput(GeneralModel):
@@ -59,6 +59,7 @@ async def generate_prompt_with_files(
     prompt: str = Form(...),
     images: List[UploadFile] = File([]),
     model: Optional[str] = Form("gpt-4.1"),
+    client: AsyncOpenAI = Depends(get_openai_client),
 ):
     try:
         content = [{"type": "text", "text": prompt}]
@@ -106,6 +107,8 @@ async def edit_image(
     output_compression: Optional[int] = Form(None),
     quality: Optional[str] = Form(None),
     image: UploadFile = File(...),
+    image_service: ImageService = Depends(get_image_service),
+    image_storage: ImageStorage = Depends(get_image_storage),
 ):
     try:
         image_data = await image.read()
@@ -131,9 +134,12 @@ async def edit_image(
         )
         upload_file.headers = {"content-type": f"image/{output_format}"}
 
-        gcs_info = await image_storage.upload_image(upload_file)
+        # Ảnh edit không có bản ghi Image: không ghi vào prefix được đối soát
+        gcs_info = await image_storage.upload_image(
+            upload_file, folder=UNTRACKED_IMAGE_FOLDER
+        )
         result = {
-            "image_url": gcs_info["url"],
+            "image_url": await image_storage.delivery_url(gcs_info["path"]),
             "format": output_format,
         }
 
@@ -157,6 +163,8 @@ async def megre_imanges(
     output_compression: Optional[int] = Form(None),
     quality: Optional[str] = Form(None),
     images: List[UploadFile] = File(...),
+    image_service: ImageService = Depends(get_image_service),
+    image_storage: ImageStorage = Depends(get_image_storage),
 ):
     try:
         if not images or len(images) == 0:
@@ -188,9 +196,12 @@ async def megre_imanges(
         )
         upload_file.headers = {"content-type": f"image/{output_format}"}
 
-        gcs_info = await image_storage.upload_image(upload_file)
+        # Ảnh edit không có bản ghi Image: không ghi vào prefix được đối soát
+        gcs_info = await image_storage.upload_image(
+            upload_file, folder=UNTRACKED_IMAGE_FOLDER
+        )
         result = {
-            "image_url": gcs_info["url"],
+            "image_url": await image_storage.delivery_url(gcs_info["path"]),
             "format": output_format,
         }
 
@@ -205,13 +216,10 @@ async def megre_imanges(
         raise e
 
 
-async def get_leonardo_service():
-    return LeonardoService(api_key=settings.LEONARDO_API_KEY)
-
-
 @router.post("/upscale-from-gcs", response_model=UpscaleFromGcsResponse)
 async def upscale_from_gcs(
     request: UpscaleFromGcsRequest,
+    current_user: User = Depends(get_current_user),
     leonardo_service: LeonardoService = Depends(get_leonardo_service),
 ):
     try:
@@ -226,6 +234,13 @@ async def upscale_from_gcs(
         result = await leonardo_service.upscale_from_gcs(
             gcs_url=request.gcs_url, upscale_params=upscale_params
         )
+        # Ảnh upscale được lưu vào bucket và lịch sử của user khi variation hoàn tất
+        await artifact_archiver.expect(
+            "variation",
+            result["variation_id"],
+            user_id=current_user.id,
+            source_url=request.gcs_url,
+        )
 
         return result
     except Exception as e:
@@ -233,34 +248,9 @@ async def upscale_from_gcs(
 
 
 @router.get("/upscale/variations/{variation_id}", response_model=VariationResponse)
-async def get_variation_result(
-    variation_id: str, leonardo_service: LeonardoService = Depends(get_leonardo_service)
-):
+async def get_variation_result(variation_id: str):
     try:
-        result = await leonardo_service.get_variation(variation_id)
-        generated_image_variation_generic = result.get(
-            "generated_image_variation_generic", {}
-        )
-
-        if not generated_image_variation_generic:
-            return {
-                "id": variation_id,
-                "status": "PENDING",
-                "created_at": "",
-                "generated_images": "",
-            }
-
-        variation_data = generated_image_variation_generic[0]
-        url = variation_data.get("url", "")
-
-        response = {
-            "id": variation_data.get("id", ""),
-            "status": variation_data.get("status", "PENDING"),
-            "created_at": variation_data.get("createdAt", ""),
-            "generated_images": url if isinstance(url, str) else "",
-        }
-
-        return response
+        return await job_poller.get("variation", variation_id)
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Error getting variation: {str(e)}"
@@ -1,29 +1,38 @@
 from typing import Dict, Optional
-from api.v1.schemas.video import VideoResponse
-from fastapi import APIRouter, Depends, File, Form, UploadFile, Path, HTTPException
+from fastapi import (
+    APIRouter,
+    Depends,
+    File,
+    Form,
+    UploadFile,
+    Path,
+    HTTPException,
+    Query,
+    Request,
+)
 
 from api.v1.schemas.upload import (
     DeleteImageRequest,
     ImageUploadResponse,
+    VideoResponse,
     VideoUrlRequest,
 )
+from api.v1.services.gcs_reconciler import (
+    UNTRACKED_IMAGE_FOLDER,
+    UNTRACKED_VIDEO_FOLDER,
+    is_tracked_folder,
+)
+from core.clients import get_image_storage, get_video_storage
 from core.google_cloud import ImageStorage, VideoStorage
-from core.config import settings
 
 router = APIRouter()
 
 
-def get_image_storage():
-    return ImageStorage(
-        bucket_name=settings.GCS_BUCKET_NAME,
-        credentials_path=settings.GCS_CREDENTIALS_PATH,
-    )
-
-
-video_storage = VideoStorage(
-    bucket_name=settings.GCS_BUCKET_NAME,
-    credentials_path=settings.GCS_CREDENTIALS_PATH,
-)
+def _check_folder(folder: str) -> None:
+    # Upload không tạo bản ghi, nên không được ghi vào prefix mà bucket
+    # reconciler coi object thiếu bản ghi là mồ côi
+    if is_tracked_folder(folder):
+        raise ValueError(f"Không được upload vào thư mục {folder}")
 
 
 @router.post("/upload", response_model=ImageUploadResponse, status_code=201)
@@ -33,7 +42,9 @@ async def upload_image(
     storage: ImageStorage = Depends(get_image_storage),
 ):
     try:
-        result = await storage.upload_image(file=file, custom_filename=custom_filename)
+        result = await storage.upload_image(
+            file=file, folder=UNTRACKED_IMAGE_FOLDER, custom_filename=custom_filename
+        )
         return result
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -42,7 +53,7 @@ async def upload_image(
 
 
 @router.delete("/images", status_code=204)
-def delete_image(
+async def delete_image(
     request: DeleteImageRequest,
     storage: ImageStorage = Depends(get_image_storage),
 ):
@@ -52,7 +63,7 @@ def delete_image(
         if image_url.startswith("image_data_learning/"):
             image_path = image_url.replace("image_data_learning/", "")
 
-        success = storage.delete_image(image_path=image_path)
+        success = await storage.delete_image(image_path=image_path)
         if not success:
             raise HTTPException(
                 status_code=404, detail="Không tìm thấy ảnh hoặc xóa thất bại"
@@ -65,9 +76,11 @@ def delete_image(
 @router.post("/upload-video", response_model=VideoResponse)
 async def upload_video(
     file: UploadFile = File(...),
-    folder: str = Form("videos_generated"),
+    folder: str = Form(UNTRACKED_VIDEO_FOLDER),
+    video_storage: VideoStorage = Depends(get_video_storage),
 ):
     try:
+        _check_folder(folder)
         result = await video_storage.upload_video(
             file=file,
             folder=folder,
@@ -79,9 +92,39 @@ async def upload_video(
         raise HTTPException(status_code=500, detail=f"Lỗi khi upload video: {str(e)}")
 
 
+@router.put("/upload-video/stream", response_model=VideoResponse)
+async def upload_video_stream(
+    request: Request,
+    filename: Optional[str] = Query(None),
+    folder: str = Query(UNTRACKED_VIDEO_FOLDER),
+    video_storage: VideoStorage = Depends(get_video_storage),
+):
+    """
+    Upload video dạng raw body (không multipart): body được đọc theo từng chunk
+    và đẩy thẳng vào một phiên resumable upload của GCS.
+    """
+    try:
+        _check_folder(folder)
+        result = await video_storage.upload_video_stream(
+            chunks=request.stream(),
+            original_filename=filename,
+            content_type=request.headers.get("content-type"),
+            folder=folder,
+        )
+        return result
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Lỗi khi upload video: {str(e)}")
+
+
 @router.post("/from-url", response_model=VideoResponse)
-async def save_video_from_url(request: VideoUrlRequest):
+async def save_video_from_url(
+    request: VideoUrlRequest,
+    video_storage: VideoStorage = Depends(get_video_storage),
+):
     try:
+        _check_folder(request.folder or "")
         result = await video_storage.save_video_from_url(
             video_url=request.video_url,
             folder=request.folder,
@@ -0,0 +1,72 @@
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException, Query, Request
+
+from api.v1.services.job_poller import job_poller
+from api.v1.services.provider_jobs import provider_job_store
+from api.v1.services.video_jobs import video_job_store
+from api.v1.services.video_worker import video_worker
+from api.v1.services.webhooks import parse_fal_webhook, parse_leonardo_webhook
+from core.config import settings
+from core.security import verify_bearer_secret, verify_webhook_token
+
+router = APIRouter()
+
+
+async def _read_json(request: Request) -> dict:
+    try:
+        body = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid JSON body")
+    if not isinstance(body, dict):
+        raise HTTPException(status_code=400, detail="Invalid JSON body")
+    return body
+
+
+@router.post("/fal/{request_id}")
+async def fal_webhook(request_id: str, request: Request, token: str = Query("")):
+    """
+    fal gọi URL này khi video job kết thúc. URL chứa token HMAC của request_id
+    nên chỉ đúng job đã đăng ký mới được cập nhật.
+    """
+    if not verify_webhook_token(request_id, token):
+        raise HTTPException(status_code=401, detail="Invalid webhook token")
+
+    body = await _read_json(request)
+    fal_request_id, result, error = parse_fal_webhook(body)
+
+    job = await video_job_store.get(request_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Request not found")
+    if job.is_finished:
+        # fal có thể gửi lại webhook, job đã xong thì bỏ qua
+        return {"status": "ignored"}
+    if (
+        fal_request_id
+        and job.kling_request_id
+        and fal_request_id != job.kling_request_id
+    ):
+        raise HTTPException(status_code=400, detail="Request id mismatch")
+
+    await video_worker.complete(request_id, result, error)
+    return {"status": "ok"}
+
+
+@router.post("/leonardo")
+async def leonardo_webhook(
+    request: Request, authorization: Optional[str] = Header(None)
+):
+    """Leonardo gửi kết quả generation/variation kèm API key webhook trong header."""
+    if not verify_bearer_secret(authorization, settings.LEONARDO_WEBHOOK_SECRET):
+        raise HTTPException(status_code=401, detail="Invalid webhook secret")
+
+    body = await _read_json(request)
+    try:
+        kind, job_id, state = parse_leonardo_webhook(body)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Lưu trước để các worker khác cũng thấy kết quả (webhook chỉ tới một worker)
+    await provider_job_store.save_final(kind, job_id, state)
+    job_poller.resolve(kind, job_id, state)
+    return {"status": "ok"}
@@ -1,5 +1,7 @@
 from datetime import datetime
 from typing import List, Optional
+from pydantic import Field
+
 from api.v1.schemas.base import GeneralModel
 
 
@@ -48,7 +50,19 @@ class ImageHistoryResponse(GeneralModel):
 
 class ImageHistoryPaginatedResponse(GeneralModel):
     items: List[ImageHistoryResponse]
-    total: int
+    # None khi gọi với include_total=false
+    total: Optional[int]
     page: int
     size: int
-    pages: int
+    pages: Optional[int]
+    next_cursor: Optional[str] = None
+
+
+class DeleteImagesRequest(GeneralModel):
+    image_ids: List[int] = Field(..., min_length=1, max_length=500)
+
+
+class DeleteImagesResponse(GeneralModel):
+    deleted_ids: List[int]
+    not_found_ids: List[int]
+    deleted_source_count: int
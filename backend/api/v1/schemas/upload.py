@@ -23,7 +23,7 @@ class VideoResponse(GeneralModel):
     url: str
     public_url: str
     metadata: Dict
-    upload_time: str
+    upload_time: Optional[str] = None
 
 
 class VideoUrlRequest(GeneralModel):
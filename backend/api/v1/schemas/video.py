@@ -28,6 +28,8 @@ class VideoResponse(GeneralModel):
     request_id: str
     status: str
     video_url: Optional[str] = None
+    queue_position: Optional[int] = None
+    eta_seconds: Optional[float] = None
 
 
 class VideoGenerationRequest(GeneralModel):
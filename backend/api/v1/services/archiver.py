@@ -0,0 +1,357 @@
+import asyncio
+import json
+import logging
+import os
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from sqlalchemy import select
+
+from api.v1.services.job_poller import job_poller
+from api.v1.services.provider_jobs import provider_job_store
+from api.v1.services.video_jobs import video_job_store
+from core.clients import clients
+from core.config import settings
+from core.database import Database
+from models.user import Image
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ArchiveTask:
+    kind: str
+    job_id: str
+    source_url: str
+    # Trạng thái cuối của job Leonardo, sẽ được thay URL bằng URL trong bucket
+    state: Dict[str, Any] = field(default_factory=dict)
+    attempts: int = 0
+
+
+# Sao chép file kết quả và ghi lại kết quả; trả về số byte đã lưu
+Handler = Callable[[ArchiveTask], Awaitable[int]]
+
+
+class ArtifactArchiver:
+    """
+    Sao chép kết quả đã xong của provider (video fal/Kling, video motion của
+    Leonardo, ảnh upscale) từ CDN của provider vào bucket của mình, để client
+    nhận URL ổn định thay vì URL sẽ hết hạn.
+
+    Task đi qua một hàng đợi giới hạn, do số worker cố định xử lý; bản sao lỗi
+    được thử lại với backoff lũy thừa, tối đa max_attempts lần. Video job ghi
+    URL của provider trước khi lưu, còn job Leonardo có bản ghi provider_jobs
+    kèm chủ sở hữu ngay lúc submit (xem expect()), nên task bị mất do restart
+    hay hàng đợi đầy được lần rescan định kỳ trên bất kỳ worker nào tìm lại.
+    Bản sao được ghi vào đường dẫn suy ra từ job id và được đánh dấu bằng
+    update có điều kiện, nên job do hai worker cùng xử lý chỉ được lưu một lần.
+    """
+
+    def __init__(
+        self,
+        concurrency: int,
+        queue_size: int,
+        max_attempts: int,
+        retry_delay: float,
+        rescan_interval: float,
+    ):
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.rescan_interval = rescan_interval
+
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._handlers: Dict[str, Handler] = {}
+        # Loại job Leonardo được lưu khi hoàn tất -> trường chứa URL kết quả
+        self._url_fields: Dict[str, str] = {}
+        self._watches: Dict[tuple, asyncio.Task] = {}
+        self._pending: Set[tuple] = set()
+        self._workers: Set[asyncio.Task] = set()
+        self._retries: Set[asyncio.Task] = set()
+        self._rescan_task: Optional[asyncio.Task] = None
+
+        self._archived = 0
+        self._retried = 0
+        self._failed = 0
+        self._dropped = 0
+        self._bytes = 0
+
+    def register(self, kind: str, handler: Handler) -> None:
+        self._handlers[kind] = handler
+
+    def archive_on_completion(self, kind: str, url_field: str) -> None:
+        """Lưu state[url_field] của mọi job loại này khi job hoàn tất."""
+        self._url_fields[kind] = url_field
+        job_poller.add_listener(
+            kind, lambda job_id, state: self._on_poll_complete(kind, job_id, state)
+        )
+
+    async def expect(
+        self, kind: str, job_id: str, user_id: Optional[int] = None, **context: Any
+    ) -> None:
+        """Ghi lại người tạo job và tiếp tục poll job tới khi xong."""
+        await provider_job_store.create(kind, job_id, user_id=user_id, context=context)
+        self._watch(kind, job_id)
+
+    def _watch(self, kind: str, job_id: str) -> None:
+        # Có waiter thì poller không bỏ theo dõi job sau idle_timeout
+        key = (kind, job_id)
+        if key in self._watches:
+            return
+        watch = asyncio.create_task(self._wait_quietly(kind, job_id))
+        self._watches[key] = watch
+        watch.add_done_callback(lambda _: self._watches.pop(key, None))
+
+    async def _wait_quietly(self, kind: str, job_id: str) -> None:
+        try:
+            await job_poller.wait(kind, job_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Lần rescan sau sẽ nhận lại job
+            logger.warning(f"Chờ {kind} {job_id} lỗi: {str(e)}")
+
+    def submit(
+        self,
+        kind: str,
+        job_id: str,
+        source_url: str,
+        state: Optional[Dict[str, Any]] = None,
+    ) -> bool:
+        """Đưa bản sao vào hàng đợi; False nếu đã có trong hàng đợi hay hàng đợi đầy."""
+        key = (kind, job_id)
+        if key in self._pending:
+            return False
+        task = ArchiveTask(
+            kind=kind, job_id=job_id, source_url=source_url, state=state or {}
+        )
+        return self._enqueue(task)
+
+    def _enqueue(self, task: ArchiveTask) -> bool:
+        try:
+            self._queue.put_nowait(task)
+        except asyncio.QueueFull:
+            self._dropped += 1
+            logger.warning(f"Hàng đợi lưu trữ đầy, bỏ {task.kind} {task.job_id}")
+            return False
+        self._pending.add((task.kind, task.job_id))
+        return True
+
+    async def _worker(self) -> None:
+        while True:
+            task = await self._queue.get()
+            try:
+                await self._run(task)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, task: ArchiveTask) -> None:
+        key = (task.kind, task.job_id)
+        task.attempts += 1
+        try:
+            size = await self._handlers[task.kind](task)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if task.attempts >= self.max_attempts:
+                self._pending.discard(key)
+                self._failed += 1
+                logger.error(
+                    f"Lưu {task.kind} {task.job_id} lỗi sau "
+                    f"{task.attempts} lần thử: {str(e)}"
+                )
+                return
+            self._retried += 1
+            delay = self.retry_delay * 2 ** (task.attempts - 1)
+            logger.warning(
+                f"Lưu {task.kind} {task.job_id} lỗi, thử lại sau {delay}s: {str(e)}"
+            )
+            retry = asyncio.create_task(self._retry_later(task, delay))
+            self._retries.add(retry)
+            retry.add_done_callback(self._retries.discard)
+            return
+
+        self._pending.discard(key)
+        self._archived += 1
+        self._bytes += size
+
+    async def _retry_later(self, task: ArchiveTask, delay: float) -> None:
+        await asyncio.sleep(delay)
+        self._pending.discard((task.kind, task.job_id))
+        self._enqueue(task)
+
+    def _on_poll_complete(self, kind: str, job_id: str, state: Dict[str, Any]) -> None:
+        source_url = state.get(self._url_fields[kind])
+        if state.get("status") == "COMPLETE" and source_url:
+            self.submit(kind, job_id, source_url, state)
+
+    async def rescan(self) -> None:
+        """Đưa lại vào hàng đợi các job bị mất bản sao (restart, hàng đợi đầy...)."""
+        # Job mới xong nhiều khả năng vẫn đang chờ trong hàng đợi của worker đó
+        for request_id, source_url in await video_job_store.list_unarchived(
+            older_than=self.rescan_interval
+        ):
+            self.submit("video", request_id, source_url)
+
+        for job in await provider_job_store.list_unarchived(
+            self._url_fields, older_than=self.rescan_interval
+        ):
+            state = json.loads(job.state) if job.state else None
+            source_url = state and state.get(self._url_fields[job.kind])
+            if state is None:
+                # Chưa biết kết quả: poll ở worker này tới khi xong
+                self._watch(job.kind, job.job_id)
+            elif state.get("status") == "COMPLETE" and source_url:
+                self.submit(job.kind, job.job_id, source_url, state)
+            else:
+                # Xong nhưng không có kết quả: không có gì để lưu
+                async with Database.get_session() as db:
+                    await provider_job_store.mark_archived(
+                        db, job.kind, job.job_id, state
+                    )
+                    await db.commit()
+
+    async def _rescan_loop(self) -> None:
+        while True:
+            try:
+                await self.rescan()
+            except Exception as e:
+                logger.error(f"Rescan lưu trữ lỗi: {str(e)}")
+            await asyncio.sleep(self.rescan_interval)
+
+    def start(self) -> None:
+        if self._workers:
+            return
+        for _ in range(self.concurrency):
+            worker = asyncio.create_task(self._worker())
+            self._workers.add(worker)
+        self._rescan_task = asyncio.create_task(self._rescan_loop())
+
+    async def stop(self) -> None:
+        tasks = [*self._workers, *self._retries, *self._watches.values()]
+        if self._rescan_task is not None:
+            tasks.append(self._rescan_task)
+            self._rescan_task = None
+        self._workers.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": len(self._workers),
+            "queued": self._queue.qsize(),
+            "pending": len(self._pending),
+            "watching": len(self._watches),
+            "archived": self._archived,
+            "archived_bytes": self._bytes,
+            "retried": self._retried,
+            "failed": self._failed,
+            "dropped": self._dropped,
+        }
+
+
+artifact_archiver = ArtifactArchiver(
+    concurrency=settings.ARCHIVE_CONCURRENCY,
+    queue_size=settings.ARCHIVE_QUEUE_SIZE,
+    max_attempts=settings.ARCHIVE_MAX_ATTEMPTS,
+    retry_delay=settings.ARCHIVE_RETRY_DELAY,
+    rescan_interval=settings.ARCHIVE_RESCAN_INTERVAL,
+)
+
+
+async def _archive_video(task: ArchiveTask) -> int:
+    result = await clients.video_storage.save_video_from_url(
+        task.source_url,
+        folder="videos_generated",
+        custom_filename=f"{task.job_id}.mp4",
+    )
+    await video_job_store.update(
+        task.job_id,
+        video_url=result["url"],
+        gcs_filename=result["path"],
+        archived_at=datetime.utcnow(),
+    )
+    return result["size"]
+
+
+async def _archive_leonardo_video(task: ArchiveTask) -> int:
+    # URL trong bucket thay URL CDN trong trạng thái mà /leonardo-status trả
+    # về, trên mọi worker qua provider_jobs
+    job = await provider_job_store.get("leonardo", task.job_id)
+    if job is not None and job.archived_at is not None:
+        return 0
+    result = await clients.video_storage.save_video_from_url(
+        task.source_url,
+        folder="leonardo_videos",
+        custom_filename=f"{task.job_id}.mp4",
+    )
+    fields = {"video_url": result["url"], "provider_video_url": task.source_url}
+    async with Database.get_session() as db:
+        await provider_job_store.mark_archived(
+            db, "leonardo", task.job_id, {**task.state, **fields}
+        )
+        await db.commit()
+    job_poller.amend("leonardo", task.job_id, **fields)
+    return result["size"]
+
+
+async def _archive_variation(task: ArchiveTask) -> int:
+    job = await provider_job_store.get("variation", task.job_id)
+    if job is None or job.archived_at is not None:
+        # Không được tạo qua /upscale (không có chủ sở hữu) hoặc đã lưu rồi
+        return 0
+    context = json.loads(job.context or "{}")
+
+    image_storage = clients.image_storage
+    # Cùng một đường dẫn cho mọi lần thử: lần thử lại ghi đè, không sinh thêm bản sao
+    ext = os.path.splitext(task.source_url.split("?")[0])[1].lower() or ".jpg"
+    result = await image_storage.save_image_from_url(
+        task.source_url,
+        folder="images_generated",
+        custom_filename=f"{task.job_id}{ext}",
+    )
+    generated_images = await image_storage.delivery_url(result["path"])
+
+    async with Database.get_session() as db:
+        if not await provider_job_store.mark_archived(
+            db,
+            "variation",
+            task.job_id,
+            {**task.state, "generated_images": generated_images},
+        ):
+            return 0
+        new_image = Image(
+            user_id=job.user_id,
+            gcs_bucket=image_storage.bucket_name,
+            gcs_filename=result["path"],
+            gcs_public_url=result["public_url"],
+            original_filename=result["filename"],
+            content_type=result["content_type"],
+            size_bytes=result["size"],
+            format=result["content_type"].split("/")[-1],
+            model="leonardo-universal-upscaler",
+            provider_url=task.source_url,
+            is_source=False,
+        )
+        source_url = context.get("source_url")
+        if source_url:
+            source = await db.scalar(
+                select(Image).where(Image.gcs_public_url == source_url.split("?")[0])
+            )
+            if source is not None:
+                new_image.source_images.append(source)
+        db.add(new_image)
+        await db.commit()
+
+    job_poller.amend("variation", task.job_id, generated_images=generated_images)
+    return result["size"]
+
+
+artifact_archiver.register("video", _archive_video)
+artifact_archiver.register("leonardo", _archive_leonardo_video)
+artifact_archiver.register("variation", _archive_variation)
+artifact_archiver.archive_on_completion("leonardo", "video_url")
+# Ảnh upscale thành bản ghi Image thuộc về user đã yêu cầu upscale
+artifact_archiver.archive_on_completion("variation", "generated_images")
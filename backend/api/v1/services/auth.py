@@ -1,17 +1,105 @@
-from fastapi import Depends, HTTPException, status
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Set, Tuple
+
+from fastapi import Depends, HTTPException, Query, status
+from fastapi.security import HTTPAuthorizationCredentials
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from api.v1.schemas.auth import RegisterRequest
-from core.database import get_db
+from core.config import settings
+from core.database import Database
 from core.security import (
-    get_password_hash,
-    verify_password,
+    decode_events_token,
+    decode_token_str,
+    get_password_hash_async,
+    verify_password_async,
     security_auth,
-    verify_token,
 )
 from models.user import User
 
+# Các cột được giữ trong snapshot; User dựng lại từ cache không gắn với session
+_SNAPSHOT_FIELDS = (
+    "id",
+    "email",
+    "first_name",
+    "last_name",
+    "hashed_password",
+    "created_at",
+    "updated_at",
+)
+
+
+class UserCache:
+    """
+    Cache token → snapshot của user đã xác thực, để request có token hợp lệ
+    không phải query bảng users mỗi lần. Mỗi entry sống tối đa ttl giây và
+    không quá thời hạn của token; invalidate(email) xóa mọi token của user.
+    """
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self._tokens_by_email: Dict[str, Set[str]] = {}
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+
+    def get(self, token: str) -> Optional[User]:
+        cached = self._entries.get(token)
+        if cached is not None and cached[1] > time.time():
+            self._entries.move_to_end(token)
+            self._hits += 1
+            return User(**cached[0])
+        if cached is not None:
+            self._remove(token)
+        self._misses += 1
+        return None
+
+    def put(
+        self, token: str, user: User, token_expires_at: Optional[float] = None
+    ) -> None:
+        snapshot = {name: getattr(user, name) for name in _SNAPSHOT_FIELDS}
+        expires_at = time.time() + self.ttl
+        if token_expires_at is not None:
+            expires_at = min(expires_at, token_expires_at)
+        self._entries[token] = (snapshot, expires_at)
+        self._entries.move_to_end(token)
+        self._tokens_by_email.setdefault(user.email, set()).add(token)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def invalidate(self, email: str) -> None:
+        for token in self._tokens_by_email.pop(email, set()):
+            self._entries.pop(token, None)
+        self._invalidations += 1
+
+    def _remove(self, token: str) -> None:
+        snapshot, _ = self._entries.pop(token)
+        tokens = self._tokens_by_email.get(snapshot["email"])
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_email[snapshot["email"]]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._hits + self._misses
+        return {
+            "entries": len(self._entries),
+            "users": len(self._tokens_by_email),
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self._invalidations,
+        }
+
+
+user_cache = UserCache(
+    ttl=settings.AUTH_CACHE_TTL, max_entries=settings.AUTH_CACHE_MAX_ENTRIES
+)
+
 
 async def get_user(db: AsyncSession, email: str):
     user = await db.scalar(select(User).where(User.email == email))
@@ -22,7 +110,7 @@ async def authenticate_user(db: AsyncSession, email: str, password: str):
     user = await get_user(db, email)
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    if not await verify_password_async(password, user.hashed_password):
         return False
 
     return user
@@ -31,7 +119,7 @@ async def authenticate_user(db: AsyncSession, email: str, password: str):
 async def create_user(db: AsyncSession, payload: RegisterRequest):
     db_user = User(
         email=payload.email,
-        hashed_password=get_password_hash(payload.password),
+        hashed_password=await get_password_hash_async(payload.password),
         first_name=payload.first_name,
         last_name=payload.last_name,
     )
@@ -39,27 +127,54 @@ async def create_user(db: AsyncSession, payload: RegisterRequest):
     db.add(db_user)
     await db.commit()
     await db.refresh(db_user)
+    user_cache.invalidate(db_user.email)
 
     return db_user
 
 
 async def get_current_user(
-    db: AsyncSession = Depends(get_db), token: str = Depends(security_auth)
+    token: HTTPAuthorizationCredentials = Depends(security_auth),
 ):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    user = user_cache.get(token.credentials)
+    if user is not None:
+        return user
+
     try:
-        email = verify_token(token)
-        if email is None:
-            raise credentials_exception
+        payload = decode_token_str(token.credentials)
     except Exception:
         raise credentials_exception
 
-    user = await get_user(db, email)
+    # Session riêng, trả connection về pool ngay sau khi query
+    async with Database.get_session() as db:
+        user = await get_user(db, payload["sub"])
     if user is None:
         raise credentials_exception
 
+    user_cache.put(token.credentials, user, payload.get("exp"))
+    return user
+
+
+async def get_events_user(token: str = Query(...)) -> User:
+    """
+    Xác thực stream SSE bằng token ngắn hạn trên query string, vì EventSource
+    của trình duyệt không gửi được header Authorization.
+    """
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+    )
+    try:
+        payload = decode_events_token(token)
+    except Exception:
+        raise credentials_exception
+
+    async with Database.get_session() as db:
+        user = await get_user(db, payload["sub"])
+    if user is None:
+        raise credentials_exception
     return user
@@ -1,6 +1,23 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
 from fastapi import HTTPException
 import fal_client
 
+from core.blob_cache import BlobCache, blob_cache, disk_executor
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Task hủy request fal khi người dùng đã bỏ kết quả; giữ tham chiếu tới khi xong
+_cancellations: Set[asyncio.Task] = set()
+
 
 async def process_image_with_sam(
     image_url: str, prompts=None, box_prompts=None, output_format="png"
@@ -15,10 +32,305 @@ async def process_image_with_sam(
 
         result = await fal_client.submit_async("fal-ai/sam2/image", request_payload)
 
-        final_result = await result.get()
+        try:
+            final_result = await result.get()
+        except asyncio.CancelledError:
+            # Kết quả không còn ai chờ, hủy luôn request trên fal
+            task = asyncio.create_task(result.cancel())
+            _cancellations.add(task)
+            task.add_done_callback(_cancellations.discard)
+            raise
 
         return final_result
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Lỗi khi xử lý ảnh với SAM2: {str(e)}"
         )
+
+
+def _normalize_prompts(prompts: Optional[List[Dict[str, Any]]]) -> List[str]:
+    # Thứ tự và điểm trùng không đổi kết quả SAM2, nên coi prompts là một tập
+    return sorted({json.dumps(prompt, sort_keys=True) for prompt in prompts or []})
+
+
+def segmentation_key(
+    image_url: str, prompts=None, box_prompts=None, output_format: str = "png"
+) -> str:
+    """
+    Hash của ảnh (đường dẫn object, bỏ query string của signed URL) và tập
+    prompt đã chuẩn hóa: cùng một yêu cầu luôn ra cùng một key.
+    """
+    canonical = json.dumps(
+        {
+            "image": BlobCache.cache_key(image_url or ""),
+            "prompts": _normalize_prompts(prompts),
+            "box_prompts": _normalize_prompts(box_prompts),
+            "output_format": output_format,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class SegmentationCache:
+    """
+    Cache kết quả SAM2 theo segmentation_key, LRU tối đa max_entries, mỗi
+    entry sống ttl giây (URL kết quả trên fal không tồn tại mãi). Các yêu cầu
+    giống nhau đang chạy dùng chung một lời gọi fal; lời gọi chỉ bị hủy khi
+    mọi yêu cầu đang chờ nó đều đã bị hủy. Lỗi không được cache.
+    """
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        # key -> [task gọi fal, số yêu cầu đang chờ]
+        self._inflight: Dict[str, List[Any]] = {}
+
+        self._hits = 0
+        self._shared = 0
+        self._misses = 0
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        cached = self._entries.get(key)
+        if cached is not None and cached[1] > time.time():
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return cached[0]
+        if cached is not None:
+            del self._entries[key]
+        return None
+
+    def put(self, key: str, result: Dict[str, Any]) -> None:
+        self._entries[key] = (result, time.time() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get_or_compute(
+        self, key: str, compute: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+
+        inflight = self._inflight.get(key)
+        if inflight is None:
+            self._misses += 1
+            task = asyncio.ensure_future(compute())
+            inflight = self._inflight[key] = [task, 0]
+            task.add_done_callback(lambda done: self._on_computed(key, done))
+        else:
+            self._shared += 1
+
+        task = inflight[0]
+        inflight[1] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            inflight[1] -= 1
+            if inflight[1] == 0:
+                # Bỏ khỏi _inflight ngay: yêu cầu tới trước khi done-callback
+                # chạy phải gọi fal lại, không chờ task đã hủy
+                if self._inflight.get(key) is inflight:
+                    del self._inflight[key]
+                task.cancel()
+            raise
+
+    def _on_computed(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key, [None])[0] is task:
+            del self._inflight[key]
+        if not task.cancelled() and task.exception() is None:
+            self.put(key, task.result())
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._hits + self._shared + self._misses
+        return {
+            "entries": len(self._entries),
+            "inflight": len(self._inflight),
+            "hits": self._hits,
+            "shared": self._shared,
+            "misses": self._misses,
+            "hit_rate": round((self._hits + self._shared) / lookups, 4)
+            if lookups
+            else 0.0,
+        }
+
+
+segmentation_cache = SegmentationCache(
+    ttl=settings.SEGMENT_CACHE_TTL, max_entries=settings.SEGMENT_CACHE_MAX_ENTRIES
+)
+
+
+def _in_own_bucket(key: str) -> bool:
+    bucket, _, path = key.partition("/")
+    return bucket == settings.GCS_BUCKET_NAME and ".." not in path.split("/")
+
+
+class SegmentSession:
+    """
+    Xử lý message SAM2 của một kết nối WebSocket ngoài vòng nhận message.
+
+    Mỗi message được gán seq (dùng "seq" client gửi lên nếu có) và mọi phản hồi
+    của nó đều kèm seq đó. update_prompt theo kiểu latest-wins: message mới hủy
+    task update_prompt trước (đang chờ debounce hoặc đang gọi SAM2) và báo
+    "cancelled" cho seq cũ, nên click liên tục chỉ tốn một lần gọi SAM2.
+    process_image chạy song song, tối đa max_concurrency lời gọi SAM2 cùng lúc.
+    Kết quả đã có trong segmentation_cache được trả ngay, không debounce.
+
+    Khi stage_images bật, process_image đầu tiên của mỗi ảnh trong bucket của
+    mình upload ảnh (lấy qua blob_cache) lên storage của fal ở nền; các lời gọi
+    sau trong phiên dùng URL trên fal thay vì để fal tải lại ảnh từ bucket mỗi
+    lần click. Chưa upload xong, upload lỗi hoặc URL ngoài bucket thì vẫn dùng
+    URL gốc.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[Dict[str, Any]], Awaitable[None]],
+        max_concurrency: int,
+        debounce: float,
+        stage_images: bool = False,
+    ):
+        self._send = send
+        self._send_lock = asyncio.Lock()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.debounce = debounce
+        self.stage_images = stage_images
+        # Đường dẫn object -> task upload ảnh lên fal (trả về URL trên fal)
+        self._staged: Dict[str, asyncio.Task] = {}
+
+        self._seq = 0
+        self._tasks: Set[asyncio.Task] = set()
+        self._prompt_task: Optional[Tuple[Any, asyncio.Task]] = None
+
+    def next_seq(self, message: Dict[str, Any]) -> Any:
+        self._seq += 1
+        return message.get("seq", self._seq)
+
+    async def send(self, data: Dict[str, Any], seq: Any = None) -> None:
+        if seq is not None:
+            data = {**data, "seq": seq}
+        # Các task cùng gửi trên một socket, không để frame chen nhau
+        async with self._send_lock:
+            await self._send(data)
+
+    async def submit(self, action: str, message: Dict[str, Any], seq: Any) -> None:
+        if action == "update_prompt":
+            if self._prompt_task is not None:
+                old_seq, old_task = self._prompt_task
+                if not old_task.done():
+                    old_task.cancel()
+                    await self.send(
+                        {"status": "cancelled", "message": "Đã có prompt mới hơn"},
+                        old_seq,
+                    )
+            task = self._spawn(
+                self._segment(
+                    message, seq, "Đang cập nhật với prompt mới...", self.debounce
+                )
+            )
+            self._prompt_task = (seq, task)
+        else:
+            if self.stage_images and message.get("image_url"):
+                self._stage(message["image_url"])
+            self._spawn(self._segment(message, seq, "Đang xử lý ảnh...", 0))
+
+    def _stage(self, image_url: str) -> None:
+        key = BlobCache.cache_key(image_url)
+        # WebSocket không xác thực: chỉ tải ảnh trong bucket của mình, URL khác
+        # được chuyển nguyên cho fal
+        if not _in_own_bucket(key):
+            return
+        if key not in self._staged:
+            self._staged[key] = self._spawn(self._upload_to_fal(image_url))
+
+    async def _upload_to_fal(self, image_url: str) -> str:
+        entry = await blob_cache.fetch(image_url)
+        data = await disk_executor.run(blob_cache.read_bytes, entry)
+        return await fal_client.upload_async(
+            data, entry.content_type, file_name=os.path.basename(entry.key)
+        )
+
+    def _fal_image_url(self, image_url: Optional[str]) -> Optional[str]:
+        staged = self._staged.get(BlobCache.cache_key(image_url or ""))
+        if staged is None or not staged.done() or staged.cancelled():
+            return image_url
+        if staged.exception() is not None:
+            return image_url
+        return staged.result()
+
+    def _spawn(self, coro: Awaitable[None]) -> asyncio.Task:
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._on_done)
+        return task
+
+    def _on_done(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Task segmentation lỗi: {str(task.exception())}")
+
+    async def _segment(
+        self,
+        message: Dict[str, Any],
+        seq: Any,
+        processing_message: str,
+        debounce: float,
+    ) -> None:
+        image_url = message.get("image_url")
+        prompts = message.get("prompts")
+        box_prompts = message.get("box_prompts", [])
+        key = segmentation_key(image_url, prompts, box_prompts)
+
+        result = segmentation_cache.get(key)
+        if result is not None:
+            await self._send_result(result, image_url, seq)
+            return
+
+        await self.send({"status": "processing", "message": processing_message}, seq)
+        try:
+            if debounce:
+                await asyncio.sleep(debounce)
+            async with self._semaphore:
+                fal_image_url = self._fal_image_url(image_url)
+                result = await segmentation_cache.get_or_compute(
+                    key,
+                    lambda: process_image_with_sam(fal_image_url, prompts, box_prompts),
+                )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await self.send({"status": "error", "message": f"Lỗi: {str(e)}"}, seq)
+            return
+
+        await self._send_result(result, image_url, seq)
+
+    async def _send_result(
+        self, result: Dict[str, Any], image_url: Optional[str], seq: Any
+    ) -> None:
+        result_image_url = result.get("image", {}).get("url", "")
+        if result_image_url:
+            await self.send(
+                {
+                    "status": "success",
+                    "result": {
+                        "image_url": result_image_url,
+                        "original_image_url": image_url,
+                    },
+                },
+                seq,
+            )
+        else:
+            await self.send(
+                {"status": "error", "message": "Không nhận được URL ảnh kết quả"},
+                seq,
+            )
+
+    async def aclose(self) -> None:
+        """Hủy mọi task còn chạy và bỏ các ảnh đã stage khi client ngắt kết nối."""
+        self._staged.clear()
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,179 @@
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.clients import clients
+from core.config import settings
+from core.database import Database
+from core.google_cloud import ImageStorage
+from models.user import GcsDeletion
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_gcs_deletions(
+    db: AsyncSession, objects: Iterable[Tuple[str, str]]
+) -> None:
+    """
+    Ghi các object (bucket, path) cần xóa vào outbox trong transaction hiện
+    tại của db. File chỉ bị xóa khi transaction commit, và chắc chắn sẽ bị xóa.
+    """
+    db.add_all(
+        GcsDeletion(gcs_bucket=bucket, gcs_filename=path) for bucket, path in objects
+    )
+
+
+class GcsDeletionPurger:
+    """
+    Xóa dần các object trong outbox gcs_deletions.
+
+    Mỗi lượt lấy một lô bản ghi đến hạn (FOR UPDATE SKIP LOCKED để nhiều worker
+    không lấy trùng), gia hạn lease rồi commit ngay, sau đó xóa trên GCS theo
+    batch song song. Xóa xong (hoặc object đã không còn) thì bỏ bản ghi; lỗi
+    thì thử lại với backoff tăng dần, không bao giờ bỏ cuộc.
+    """
+
+    def __init__(
+        self,
+        interval: float,
+        batch_size: int,
+        lease_seconds: float,
+        max_backoff: float,
+    ):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+        self.max_backoff = max_backoff
+
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+        self._purged = 0
+        self._failed = 0
+        self._runs = 0
+
+    def notify(self) -> None:
+        """Đánh thức purger ngay sau khi có bản ghi mới được commit."""
+        self._wakeup.set()
+
+    async def purge_once(self) -> int:
+        now = datetime.utcnow()
+        async with Database.get_session() as db:
+            rows = (
+                await db.execute(
+                    select(
+                        GcsDeletion.id,
+                        GcsDeletion.gcs_bucket,
+                        GcsDeletion.gcs_filename,
+                        GcsDeletion.attempts,
+                    )
+                    .where(GcsDeletion.next_attempt_at <= now)
+                    .order_by(GcsDeletion.id)
+                    .limit(self.batch_size)
+                    .with_for_update(skip_locked=True)
+                )
+            ).all()
+            if not rows:
+                return 0
+            await db.execute(
+                update(GcsDeletion)
+                .where(GcsDeletion.id.in_([row.id for row in rows]))
+                .values(next_attempt_at=now + timedelta(seconds=self.lease_seconds))
+            )
+            await db.commit()
+
+        by_bucket: Dict[str, List[Any]] = defaultdict(list)
+        for row in rows:
+            by_bucket[row.gcs_bucket].append(row)
+
+        failed = set()
+        for bucket, bucket_rows in by_bucket.items():
+            storage = self._storage(bucket)
+            failed_paths = set(
+                await storage.delete_images(
+                    [row.gcs_filename for row in bucket_rows]
+                )
+            )
+            failed.update(
+                row.id for row in bucket_rows if row.gcs_filename in failed_paths
+            )
+
+        async with Database.get_session() as db:
+            done_ids = [row.id for row in rows if row.id not in failed]
+            if done_ids:
+                await db.execute(
+                    delete(GcsDeletion).where(GcsDeletion.id.in_(done_ids))
+                )
+            for row in rows:
+                if row.id in failed:
+                    backoff = min(self.interval * 2 ** row.attempts, self.max_backoff)
+                    await db.execute(
+                        update(GcsDeletion)
+                        .where(GcsDeletion.id == row.id)
+                        .values(
+                            attempts=row.attempts + 1,
+                            next_attempt_at=datetime.utcnow()
+                            + timedelta(seconds=backoff),
+                            last_error="GCS delete failed",
+                        )
+                    )
+            await db.commit()
+
+        self._purged += len(rows) - len(failed)
+        self._failed += len(failed)
+        if failed:
+            logger.warning(f"Không xóa được {len(failed)} object GCS, sẽ thử lại")
+        return len(rows)
+
+    @staticmethod
+    def _storage(bucket: str) -> ImageStorage:
+        storage = clients.image_storage
+        if storage.bucket_name == bucket:
+            return storage
+        return ImageStorage(bucket_name=bucket, client=clients.gcs)
+
+    async def _loop(self) -> None:
+        while True:
+            self._wakeup.clear()
+            try:
+                purged = await self.purge_once()
+                self._runs += 1
+            except Exception as e:
+                logger.error(f"Xóa object GCS từ outbox lỗi: {str(e)}")
+                purged = 0
+            # Còn đầy lô thì chạy tiếp ngay, không thì chờ lượt sau hoặc notify()
+            if purged < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "runs": self._runs,
+            "purged": self._purged,
+            "failed_attempts": self._failed,
+        }
+
+
+gcs_purger = GcsDeletionPurger(
+    interval=settings.GCS_PURGE_INTERVAL,
+    batch_size=settings.GCS_PURGE_BATCH_SIZE,
+    lease_seconds=settings.GCS_PURGE_LEASE_SECONDS,
+    max_backoff=settings.GCS_PURGE_MAX_BACKOFF,
+)
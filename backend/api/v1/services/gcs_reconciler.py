@@ -0,0 +1,289 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from sqlalchemy import select, text
+
+from api.v1.services.gcs_outbox import enqueue_gcs_deletions, gcs_purger
+from core.clients import clients
+from core.config import settings
+from core.database import Database
+from core.google_cloud import gcs_executor
+from models.user import GcsDeletion, Image, VideoRequest
+
+logger = logging.getLogger(__name__)
+
+# Chỉ các prefix do app tự ghi và có bảng theo dõi mới được đối soát/xóa: mọi
+# object ghi vào đây phải có bản ghi, object không có bản ghi dùng prefix riêng
+# (UNTRACKED_*), nếu không sẽ bị coi là mồ côi
+TRACKED_PREFIXES = {
+    "images_generated/": (Image.gcs_filename, Image.gcs_bucket),
+    "videos_generated/": (VideoRequest.gcs_filename, None),
+}
+
+# Ảnh/video ghi vào bucket mà không tạo bản ghi (upload trực tiếp, ảnh edit)
+UNTRACKED_IMAGE_FOLDER = "images_uploaded"
+UNTRACKED_VIDEO_FOLDER = "videos_uploaded"
+
+
+def is_tracked_folder(folder: str) -> bool:
+    path = f"{folder.strip('/')}/"
+    return any(path.startswith(prefix) for prefix in TRACKED_PREFIXES)
+
+# (tên object, kích thước, thời điểm tạo)
+BlobInfo = Tuple[str, int, Optional[datetime]]
+
+
+async def merge_sorted(
+    blobs: AsyncIterator[BlobInfo], names: AsyncIterator[str]
+) -> AsyncIterator[Tuple[Optional[BlobInfo], Optional[str]]]:
+    """
+    Merge-join hai luồng đã sắp theo thứ tự byte: yield (blob, None) cho object
+    không có bản ghi, (None, name) cho bản ghi không có object. Chỉ giữ một
+    phần tử của mỗi bên trong bộ nhớ.
+    """
+    blob = await anext(blobs, None)
+    name = await anext(names, None)
+    while blob is not None or name is not None:
+        if name is None or (blob is not None and blob[0] < name):
+            yield blob, None
+            blob = await anext(blobs, None)
+        elif blob is None or name < blob[0]:
+            yield None, name
+            previous, name = name, await anext(names, None)
+            while name is not None and name == previous:
+                name = await anext(names, None)
+        else:
+            previous = name
+            blob = await anext(blobs, None)
+            name = await anext(names, None)
+            # video_requests.gcs_filename không unique
+            while name is not None and name == previous:
+                name = await anext(names, None)
+
+
+class BucketReconciler:
+    """
+    Định kỳ đối soát object trong bucket với các bản ghi trỏ tới chúng.
+
+    Với mỗi prefix trong TRACKED_PREFIXES, list_blobs được đọc từng trang
+    (giới hạn số trang/giây) và cột gcs_filename được stream từ MySQL theo thứ
+    tự byte (collation utf8mb4_bin, giống thứ tự của GCS), rồi merge-join nên
+    bộ nhớ không phụ thuộc số object. Object mới hơn grace_period bị bỏ qua
+    vì có thể đang upload dở trước khi bản ghi được tạo.
+
+    Mặc định chỉ báo cáo. Khi bật delete_orphans, object mồ côi được kiểm tra
+    lại bằng lookup theo tên (tránh race với ảnh vừa tạo) rồi đưa vào outbox
+    gcs_deletions, tối đa max_deletes object mỗi lượt. Bản ghi thiếu object
+    chỉ được báo cáo, không bao giờ tự xóa.
+
+    Chế độ xóa chỉ an toàn khi mọi object trong TRACKED_PREFIXES đều có bản
+    ghi. Các luồng ghi không tạo bản ghi (POST /upload, /upload-video, ảnh
+    edit của picture-ads) nay dùng prefix riêng, nhưng object do bản cũ ghi
+    vào images_generated/ và videos_generated/ vẫn nằm đó: phải dời chúng (xem
+    báo cáo orphan_samples) trước khi bật delete_orphans.
+    """
+
+    def __init__(
+        self,
+        interval: float,
+        grace_period: float,
+        page_size: int,
+        pages_per_second: float,
+        batch_size: int,
+        max_deletes: int,
+        delete_orphans: bool,
+        sample_size: int = 20,
+    ):
+        self.interval = interval
+        self.grace_period = grace_period
+        self.page_size = page_size
+        self.pages_per_second = pages_per_second
+        self.batch_size = batch_size
+        self.max_deletes = max_deletes
+        self.delete_orphans = delete_orphans
+        self.sample_size = sample_size
+        self._task: Optional[asyncio.Task] = None
+
+        self._runs = 0
+        self._skipped_runs = 0
+        self._deleted = 0
+        self._last_report: Dict[str, Any] = {}
+
+    async def _iter_blobs(self, prefix: str) -> AsyncIterator[BlobInfo]:
+        storage = clients.image_storage
+        pages = storage.client.list_blobs(
+            storage.bucket_name,
+            prefix=prefix,
+            page_size=self.page_size,
+            fields="items(name,size,timeCreated),nextPageToken",
+        ).pages
+
+        def next_page() -> Optional[List[BlobInfo]]:
+            page = next(pages, None)
+            if page is None:
+                return None
+            return [(blob.name, blob.size or 0, blob.time_created) for blob in page]
+
+        delay = 1 / self.pages_per_second if self.pages_per_second > 0 else 0
+        while True:
+            page = await gcs_executor.run(next_page)
+            if page is None:
+                return
+            for blob in page:
+                yield blob
+            await asyncio.sleep(delay)
+
+    async def _iter_names(self, prefix: str) -> AsyncIterator[str]:
+        column, bucket_column = TRACKED_PREFIXES[prefix]
+        query = select(column).where(column.startswith(prefix, autoescape=True))
+        if bucket_column is not None:
+            query = query.where(bucket_column == clients.image_storage.bucket_name)
+        query = query.order_by(column.collate("utf8mb4_bin"))
+
+        async with Database.get_session() as db:
+            result = await db.stream(
+                query.execution_options(yield_per=self.batch_size)
+            )
+            async for name in result.scalars():
+                yield name
+
+    async def _delete(self, prefix: str, names: List[str]) -> int:
+        """Đưa các object mồ côi vào outbox sau khi kiểm tra lại, trả về số object."""
+        column, _ = TRACKED_PREFIXES[prefix]
+        bucket = clients.image_storage.bucket_name
+        async with Database.get_session() as db:
+            referenced = set(
+                (await db.execute(select(column).where(column.in_(names)))).scalars()
+            )
+            queued = set(
+                (
+                    await db.execute(
+                        select(GcsDeletion.gcs_filename).where(
+                            GcsDeletion.gcs_bucket == bucket,
+                            GcsDeletion.gcs_filename.in_(names),
+                        )
+                    )
+                ).scalars()
+            )
+            orphans = [name for name in names if name not in referenced | queued]
+            if orphans:
+                enqueue_gcs_deletions(db, [(bucket, name) for name in orphans])
+                await db.commit()
+        if orphans:
+            gcs_purger.notify()
+        return len(orphans)
+
+    async def reconcile_prefix(self, prefix: str) -> Dict[str, Any]:
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.grace_period)
+        report: Dict[str, Any] = {
+            "objects_orphaned": 0,
+            "bytes_orphaned": 0,
+            "records_missing": 0,
+            "deleted": 0,
+            "orphan_samples": [],
+            "missing_samples": [],
+        }
+        pending: List[str] = []
+        budget = self.max_deletes if self.delete_orphans else 0
+
+        async for blob, name in merge_sorted(
+            self._iter_blobs(prefix), self._iter_names(prefix)
+        ):
+            if name is not None:
+                report["records_missing"] += 1
+                if len(report["missing_samples"]) < self.sample_size:
+                    report["missing_samples"].append(name)
+                continue
+
+            blob_name, size, created = blob
+            if blob_name.endswith("/") or (created is not None and created > cutoff):
+                continue
+            report["objects_orphaned"] += 1
+            report["bytes_orphaned"] += size
+            if len(report["orphan_samples"]) < self.sample_size:
+                report["orphan_samples"].append(blob_name)
+
+            if budget > len(pending):
+                pending.append(blob_name)
+                if len(pending) >= self.batch_size:
+                    deleted = await self._delete(prefix, pending)
+                    report["deleted"] += deleted
+                    budget -= len(pending)
+                    pending = []
+
+        if pending:
+            report["deleted"] += await self._delete(prefix, pending)
+        return report
+
+    async def reconcile(self) -> Optional[Dict[str, Any]]:
+        """Chạy một lượt trên mọi prefix; None nếu worker khác đang chạy."""
+        async with Database.get_session() as lock_db:
+            # Lock theo connection: nhiều worker/instance chỉ một nơi đối soát
+            got_lock = await lock_db.scalar(
+                text("SELECT GET_LOCK('gcs_reconcile', 0)")
+            )
+            if not got_lock:
+                self._skipped_runs += 1
+                return None
+            try:
+                reports = {}
+                for prefix in TRACKED_PREFIXES:
+                    report = await self.reconcile_prefix(prefix)
+                    reports[prefix] = report
+                    self._deleted += report["deleted"]
+                    if report["objects_orphaned"] or report["records_missing"]:
+                        logger.warning(
+                            f"Đối soát {prefix}: {report['objects_orphaned']} object "
+                            f"mồ côi ({report['bytes_orphaned']} bytes, đã xóa "
+                            f"{report['deleted']}), {report['records_missing']} "
+                            f"bản ghi thiếu object"
+                        )
+            finally:
+                await lock_db.execute(text("SELECT RELEASE_LOCK('gcs_reconcile')"))
+
+        self._runs += 1
+        self._last_report = {
+            "finished_at": datetime.utcnow().isoformat(),
+            "prefixes": reports,
+        }
+        return reports
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.reconcile()
+            except Exception as e:
+                logger.error(f"Đối soát bucket GCS lỗi: {str(e)}")
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "runs": self._runs,
+            "skipped_runs": self._skipped_runs,
+            "deleted": self._deleted,
+            "delete_enabled": self.delete_orphans,
+            "last_report": self._last_report,
+        }
+
+
+bucket_reconciler = BucketReconciler(
+    interval=settings.GCS_RECONCILE_INTERVAL,
+    grace_period=settings.GCS_RECONCILE_GRACE_PERIOD,
+    page_size=settings.GCS_RECONCILE_PAGE_SIZE,
+    pages_per_second=settings.GCS_RECONCILE_PAGES_PER_SECOND,
+    batch_size=settings.GCS_RECONCILE_BATCH_SIZE,
+    max_deletes=settings.GCS_RECONCILE_MAX_DELETES,
+    delete_orphans=settings.GCS_RECONCILE_DELETE,
+)
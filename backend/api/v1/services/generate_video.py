@@ -1,8 +1,9 @@
-import aiohttp
 import fal_client
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 import logging
 
+from core.http_clients import http_clients
+
 logger = logging.getLogger(__name__)
 
 
@@ -19,6 +20,7 @@ class KlingService:
         aspect_ratio: str = "16:9",
         negative_prompt: str = "blur, distort, and low quality",
         cfg_scale: float = 0.5,
+        webhook_url: Optional[str] = None,
     ) -> dict:
         try:
             arguments = {
@@ -31,7 +33,9 @@ class KlingService:
             }
 
             handler = await fal_client.submit_async(
-                KlingService.MODEL_ENDPOINT, arguments=arguments
+                KlingService.MODEL_ENDPOINT,
+                arguments=arguments,
+                webhook_url=webhook_url,
             )
 
             return {"request_id": handler.request_id, "status": "submitted"}
@@ -75,12 +79,11 @@ class KlingService:
     @staticmethod
     async def download_video(video_url: str) -> bytes:
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(video_url) as response:
-                    if response.status != 200:
-                        raise Exception(f"Failed to download video: {response.status}")
+            response = await http_clients.for_url(video_url).get(video_url)
+            if response.status_code != 200:
+                raise Exception(f"Failed to download video: {response.status_code}")
 
-                    return await response.read()
+            return response.content
         except Exception as e:
             logger.error(f"Error downloading video from {video_url}: {str(e)}")
             raise
@@ -1,23 +1,40 @@
 import io
+import logging
 import uuid
+from collections import Counter
 from typing import Optional, Dict, Any, List, Tuple
 
 from fastapi import UploadFile, HTTPException
 from openai import OpenAIError, AsyncOpenAI
 
+from api.v1.services.gcs_outbox import enqueue_gcs_deletions, gcs_purger
+from api.v1.services.image_counters import get_image_count
 from core.google_cloud import ImageStorage
-from models.user import Image, image_sources
+from core.http_clients import http_clients
+from helpers.pagingation import decode_cursor, encode_cursor
+from models.user import Image, image_counter_update, image_sources
 from sqlalchemy.ext.asyncio import AsyncSession
 
 
-from sqlalchemy import select, func, and_
+from sqlalchemy import delete, exists, select, and_, or_
 from sqlalchemy.orm import selectinload
 
+logger = logging.getLogger(__name__)
+
 
 class ImageService:
-    def __init__(self, openai_api_key: str, bucket_name: str, credentials_path: str):
-        self.client = AsyncOpenAI(api_key=openai_api_key)
-        self.image_storage = ImageStorage(
+    def __init__(
+        self,
+        openai_api_key: str,
+        bucket_name: str,
+        credentials_path: str,
+        image_storage: Optional[ImageStorage] = None,
+        client: Optional[AsyncOpenAI] = None,
+    ):
+        self.client = client or AsyncOpenAI(
+            api_key=openai_api_key, http_client=http_clients.get("openai")
+        )
+        self.image_storage = image_storage or ImageStorage(
             bucket_name=bucket_name, credentials_path=credentials_path
         )
         self.bucket_name = bucket_name
@@ -91,12 +108,15 @@ class ImageService:
             )
 
     async def delete_image_from_gcs(self, image: Image, db: AsyncSession) -> None:
+        """Xóa bản ghi ảnh; file trên GCS được gcs_purger xóa sau qua outbox."""
         try:
-            await self.image_storage.delete_image(image.gcs_filename)
+            enqueue_gcs_deletions(db, [(image.gcs_bucket, image.gcs_filename)])
             await db.delete(image)
             await db.commit()
+            gcs_purger.notify()
         except Exception as e:
-            print(f"Error deleting image from GCS: {str(e)}")
+            await db.rollback()
+            logger.error(f"Error deleting image {image.id}: {str(e)}")
 
     async def process_and_store_image(
         self,
@@ -144,7 +164,8 @@ class ImageService:
             await db.commit()
             await db.refresh(new_image)
 
-            return {"image_url": gcs_info["public_url"], "format": output_format}
+            image_url = await self.image_storage.delivery_url(gcs_info["path"])
+            return {"image_url": image_url, "format": output_format}
         except Exception as e:
             raise HTTPException(
                 status_code=500, detail=f"Error processing and storing image: {str(e)}"
@@ -191,35 +212,75 @@ class ImageHistoryService:
         page: int = 1,
         size: int = 10,
         is_source: bool = False,
-    ) -> Tuple[List[Image], int]:
-        offset = (page - 1) * size
+        cursor: Optional[str] = None,
+        include_total: bool = True,
+    ) -> Tuple[List[Image], Optional[int], Optional[str]]:
+        """
+        Trả về (ảnh, tổng số hoặc None, cursor trang sau hoặc None).
+
+        Có cursor thì đọc tiếp sau (created_at, id) của cursor (keyset), chi phí
+        không phụ thuộc độ sâu; không có cursor thì giữ cách phân trang theo page.
+        Cả hai đều đi theo index (user_id, is_source, created_at, id).
+        """
         query = (
             select(Image)
             .where(and_(Image.user_id == user_id, Image.is_source == is_source))
-            .order_by(Image.created_at.desc())
-            .offset(offset)
-            .limit(size)
+            .order_by(Image.created_at.desc(), Image.id.desc())
+            .limit(size + 1)
         )
+        if cursor:
+            created_at, image_id = decode_cursor(cursor)
+            query = query.where(
+                or_(
+                    Image.created_at < created_at,
+                    and_(Image.created_at == created_at, Image.id < image_id),
+                )
+            )
+        else:
+            query = query.offset((page - 1) * size)
 
         if not is_source:
             query = query.options(selectinload(Image.source_images))
 
         result = await db.execute(query)
-        images = result.scalars().all()
+        images = list(result.scalars().all())
 
-        count_query = select(func.count()).where(
-            and_(Image.user_id == user_id, Image.is_source == is_source)
-        )
-        result = await db.execute(count_query)
-        total_count = result.scalar()
+        # Đọc dư một dòng để biết còn trang sau hay không
+        next_cursor = None
+        if len(images) > size:
+            images = images[:size]
+            next_cursor = encode_cursor(images[-1].created_at, images[-1].id)
 
-        return images, total_count
+        total_count = None
+        if include_total:
+            total_count = await get_image_count(db, user_id, is_source)
+
+        return images, total_count, next_cursor
+
+    @staticmethod
+    async def sign_history_urls(
+        images: List[Image], image_storage: ImageStorage
+    ) -> Dict[str, str]:
+        """Ký một lần toàn bộ URL (ảnh + ảnh nguồn) của một trang lịch sử."""
+        paths = []
+        for image in images:
+            paths.append(image.gcs_filename)
+            paths.extend(source.gcs_filename for source in image.source_images)
+        return await image_storage.generate_signed_urls(paths)
 
     @staticmethod
     def format_image_history_response(
-        images: List[Image], total: int, page: int, size: int
+        images: List[Image],
+        total: Optional[int],
+        page: int,
+        size: int,
+        signed_urls: Optional[Dict[str, str]] = None,
+        next_cursor: Optional[str] = None,
     ) -> Dict[str, Any]:
-        pages = (total + size - 1) // size if total > 0 else 0
+        pages = None
+        if total is not None:
+            pages = (total + size - 1) // size if total > 0 else 0
+        signed_urls = signed_urls or {}
 
         formatted_images = []
         for image in images:
@@ -228,7 +289,9 @@ class ImageHistoryService:
                 source_images.append(
                     {
                         "id": source.id,
-                        "gcs_public_url": source.gcs_public_url,
+                        "gcs_public_url": signed_urls.get(
+                            source.gcs_filename, source.gcs_public_url
+                        ),
                         "original_filename": source.original_filename,
                         "format": source.format,
                         "content_type": source.content_type,
@@ -239,7 +302,9 @@ class ImageHistoryService:
             formatted_images.append(
                 {
                     "id": image.id,
-                    "gcs_public_url": image.gcs_public_url,
+                    "gcs_public_url": signed_urls.get(
+                        image.gcs_filename, image.gcs_public_url
+                    ),
                     "format": image.format,
                     "prompt": image.prompt,
                     "model": image.model,
@@ -254,103 +319,119 @@ class ImageHistoryService:
             "page": page,
             "size": size,
             "pages": pages,
+            "next_cursor": next_cursor,
         }
 
     @staticmethod
-    async def delete_image_with_sources(
+    async def delete_images(
         db: AsyncSession,
-        image_storage,
-        image_id: int,
+        image_ids: List[int],
         user_id: int,
     ) -> Dict[str, Any]:
-        try:
-            query = (
-                select(Image)
-                .where(and_(Image.id == image_id, Image.user_id == user_id))
-                .options(selectinload(Image.source_images))
+        """
+        Xóa nhiều ảnh của user cùng các ảnh nguồn không còn được ảnh nào khác
+        dùng tới. Ảnh nguồn mồ côi được xác định bằng một query tập hợp, mọi
+        bản ghi được xóa trong một transaction, cùng transaction đó ghi các
+        file GCS cần xóa vào outbox để gcs_purger xử lý.
+        """
+        image_ids = list(dict.fromkeys(image_ids))
+        # Khóa các hàng sẽ xóa: lượt xóa chồng lên phải chờ rồi đọc lại, không
+        # trừ bộ đếm và ghi outbox lần hai cho cùng một ảnh
+        rows = (
+            await db.execute(
+                select(Image.id, Image.gcs_bucket, Image.gcs_filename, Image.is_source)
+                .where(Image.id.in_(image_ids), Image.user_id == user_id)
+                .with_for_update()
             )
+        ).all()
+        deleted_ids = [row.id for row in rows]
+        if not deleted_ids:
+            return {
+                "deleted_ids": [],
+                "not_found_ids": image_ids,
+                "deleted_source_count": 0,
+            }
 
-            result = await db.execute(query)
-            image = result.scalar_one_or_none()
-
-            if not image:
-                raise HTTPException(
-                    status_code=404,
-                    detail="Image not found or you don't have permission to delete it",
+        # Ảnh nguồn của các ảnh bị xóa mà không còn liên kết nào từ ảnh khác
+        links = image_sources.alias("links")
+        other_links = image_sources.alias("other_links")
+        orphan_rows = (
+            await db.execute(
+                select(Image.id, Image.gcs_bucket, Image.gcs_filename, Image.is_source)
+                .join(links, links.c.source_image_id == Image.id)
+                .where(
+                    links.c.generated_image_id.in_(deleted_ids),
+                    Image.user_id == user_id,
+                    Image.id.not_in(deleted_ids),
+                    ~exists().where(
+                        other_links.c.source_image_id == Image.id,
+                        other_links.c.generated_image_id.not_in(deleted_ids),
+                    ),
                 )
+                .distinct()
+                .with_for_update()
+            )
+        ).all()
 
-            related_source_images = []
-            if not image.is_source and image.source_images:
-                related_source_images = list(image.source_images)
-
-            if not image.is_source:
-                try:
-                    await db.execute(
-                        f"""
-                        DELETE FROM image_sources 
-                        WHERE generated_image_id = {image_id}
-                        """
-                    )
-                except Exception as e:
-                    print(f"Error deleting from image_sources table: {str(e)}")
-
-            try:
-                image_storage.delete_image(image.gcs_filename)
-                print(f"Successfully deleted image file: {image.gcs_filename}")
-            except Exception as e:
-                print(f"Warning: Failed to delete image file from storage: {str(e)}")
-
-            # 3. Xóa bản ghi ảnh chính từ database
-            await db.delete(image)
-            await db.flush()  # Flush để cập nhật thay đổi ngay lập tức
-
-            # 4. Xóa các ảnh nguồn nếu có
-            deleted_source_count = 0
-            for source_image in related_source_images:
-                try:
-                    # Kiểm tra xem ảnh nguồn có được sử dụng bởi ảnh khác không
-                    check_query = (
-                        select(func.count())
-                        .select_from(image_sources)
-                        .where(image_sources.c.source_image_id == source_image.id)
+        all_rows = [*rows, *orphan_rows]
+        all_ids = [row.id for row in all_rows]
+        try:
+            await db.execute(
+                delete(image_sources).where(
+                    or_(
+                        image_sources.c.generated_image_id.in_(all_ids),
+                        image_sources.c.source_image_id.in_(all_ids),
                     )
-                    source_usage_count = await db.scalar(check_query)
-
-                    # Chỉ xóa ảnh nguồn nếu không được sử dụng bởi ảnh khác
-                    if source_usage_count == 0:
-                        try:
-                            image_storage.delete_image(source_image.gcs_filename)
-                            print(
-                                f"Successfully deleted source image file: {source_image.gcs_filename}"
-                            )
-                        except Exception as e:
-                            print(
-                                f"Warning: Failed to delete source image file from storage: {str(e)}"
-                            )
-
-                        await db.delete(source_image)
-                        deleted_source_count += 1
-                    else:
-                        print(
-                            f"Source image {source_image.id} is still referenced by other images, not deleting"
-                        )
-                except Exception as e:
-                    print(f"Error processing source image {source_image.id}: {str(e)}")
-
-            # 5. Commit tất cả thay đổi
+                )
+            )
+            await db.execute(delete(Image).where(Image.id.in_(all_ids)))
+            # Xóa bằng Core không qua ORM nên tự cập nhật bộ đếm ảnh
+            removed = Counter(bool(row.is_source) for row in all_rows)
+            for is_source, count in removed.items():
+                await db.execute(image_counter_update(user_id, is_source, -count))
+            enqueue_gcs_deletions(
+                db, [(row.gcs_bucket, row.gcs_filename) for row in all_rows]
+            )
             await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+        gcs_purger.notify()
 
-            return {
-                "success": True,
-                "message": "Image deleted successfully along with related source images",
-                "image_id": image_id,
-                "deleted_source_count": deleted_source_count,
-            }
+        found = set(deleted_ids)
+        return {
+            "deleted_ids": deleted_ids,
+            "not_found_ids": [i for i in image_ids if i not in found],
+            "deleted_source_count": len(orphan_rows),
+        }
 
+    @staticmethod
+    async def delete_image_with_sources(
+        db: AsyncSession,
+        image_storage,
+        image_id: int,
+        user_id: int,
+    ) -> Dict[str, Any]:
+        try:
+            result = await ImageHistoryService.delete_images(
+                db=db,
+                image_ids=[image_id],
+                user_id=user_id,
+            )
         except Exception as e:
-            await db.rollback()
-            if isinstance(e, HTTPException):
-                raise e
             raise HTTPException(
                 status_code=500, detail=f"Error deleting image: {str(e)}"
             )
+
+        if not result["deleted_ids"]:
+            raise HTTPException(
+                status_code=404,
+                detail="Image not found or you don't have permission to delete it",
+            )
+
+        return {
+            "success": True,
+            "message": "Image deleted successfully along with related source images",
+            "image_id": image_id,
+            "deleted_source_count": result["deleted_source_count"],
+        }
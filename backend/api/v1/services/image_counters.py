@@ -0,0 +1,125 @@
+import asyncio
+import logging
+from typing import Any, Dict, Optional
+
+from sqlalchemy import and_, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.config import settings
+from core.database import Database
+from models.user import Image, User
+
+logger = logging.getLogger(__name__)
+
+
+async def get_image_count(db: AsyncSession, user_id: int, is_source: bool) -> int:
+    """Tổng số ảnh của user, đọc từ bộ đếm trên users (một lookup theo khóa chính)."""
+    column = User.source_image_count if is_source else User.image_count
+    return await db.scalar(select(column).where(User.id == user_id)) or 0
+
+
+class ImageCounterReconciler:
+    """
+    Định kỳ so bộ đếm trên users với số ảnh thực tế và sửa các user bị lệch
+    (vd: ảnh bị xóa tay trong DB). Duyệt users theo từng lô id để mỗi lần
+    chỉ quét index images của một nhóm nhỏ user.
+    """
+
+    def __init__(self, interval: float, batch_size: int):
+        self.interval = interval
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+
+        self._runs = 0
+        self._checked = 0
+        self._fixed = 0
+
+    async def reconcile(self) -> int:
+        """Chạy một lượt trên toàn bộ users, trả về số user đã sửa."""
+        fixed = 0
+        last_id = 0
+        while True:
+            async with Database.get_session() as db:
+                rows = (
+                    await db.execute(
+                        select(
+                            User.id,
+                            User.image_count,
+                            User.source_image_count,
+                            self._count(False),
+                            self._count(True),
+                        )
+                        .where(User.id > last_id)
+                        .order_by(User.id)
+                        .limit(self.batch_size)
+                    )
+                ).all()
+                if not rows:
+                    break
+
+                for user_id, image_count, source_count, actual, actual_source in rows:
+                    if image_count == actual and source_count == actual_source:
+                        continue
+                    logger.warning(
+                        f"Bộ đếm ảnh của user {user_id} bị lệch: "
+                        f"{image_count}/{source_count} != {actual}/{actual_source}"
+                    )
+                    # Đếm lại ngay trong câu UPDATE để không ghi đè thay đổi mới hơn
+                    await db.execute(
+                        update(User)
+                        .where(User.id == user_id)
+                        .values(
+                            image_count=self._count(False),
+                            source_image_count=self._count(True),
+                            updated_at=User.updated_at,
+                        )
+                    )
+                    fixed += 1
+                await db.commit()
+
+            self._checked += len(rows)
+            last_id = rows[-1][0]
+
+        self._runs += 1
+        self._fixed += fixed
+        return fixed
+
+    @staticmethod
+    def _count(is_source: bool):
+        return (
+            select(func.count())
+            .select_from(Image)
+            .where(and_(Image.user_id == User.id, Image.is_source == is_source))
+            .scalar_subquery()
+        )
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.reconcile()
+            except Exception as e:
+                logger.error(f"Đối soát bộ đếm ảnh lỗi: {str(e)}")
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "runs": self._runs,
+            "checked_users": self._checked,
+            "fixed_users": self._fixed,
+        }
+
+
+image_counter_reconciler = ImageCounterReconciler(
+    interval=settings.IMAGE_COUNTER_RECONCILE_INTERVAL,
+    batch_size=settings.IMAGE_COUNTER_RECONCILE_BATCH,
+)
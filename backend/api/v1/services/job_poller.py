@@ -0,0 +1,485 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+
+import fal_client
+
+from api.v1.services.generate_video import KlingService
+from api.v1.services.leonardo import LEONARDO_FINAL_STATUSES
+from api.v1.services.provider_jobs import ProviderJobStore, provider_job_store
+from core.clients import clients
+from core.config import settings
+from core.events import job_events
+
+logger = logging.getLogger(__name__)
+
+JobKey = Tuple[str, str]
+
+# updated_at chỉ chính xác tới giây và lấy lúc câu lệnh chạy chứ không phải lúc
+# commit: đọc lùi lại một chút so với mốc đã thấy
+SYNC_OVERLAP = timedelta(seconds=5)
+
+
+@dataclass
+class PollTarget:
+    name: str
+    check: Callable[[str], Awaitable[Dict[str, Any]]]
+    is_final: Callable[[Dict[str, Any]], bool]
+    # Ước lượng ban đầu thời gian một job chạy; được hiệu chỉnh theo các job đã xong
+    typical_seconds: float
+    # Topic trên event bus để publish các thay đổi trạng thái
+    topic: Optional[str] = None
+    # Provider báo kết quả qua webhook: chỉ poll dự phòng, mỗi khoảng này một lần
+    push_fallback: Optional[float] = None
+    # Trạng thái cuối của loại job này cũng được lưu trong store dùng chung
+    shared: bool = False
+
+
+@dataclass
+class _TrackedJob:
+    kind: str
+    job_id: str
+    first_seen: float
+    next_due: float
+    interval: float
+    last_access: float
+    final: asyncio.Future
+    state: Optional[Dict[str, Any]] = None
+    inflight: Optional[asyncio.Future] = None
+    waiters: int = 0
+    errors: int = 0
+    # Lần cuối provider trả lời; lỗi chỉ làm fail job khi đã quá lâu sau mốc này
+    last_ok: float = 0.0
+
+
+@dataclass
+class _KindStats:
+    checks: int = 0
+    errors: int = 0
+    hits: int = 0
+    coalesced: int = 0
+    completed: int = 0
+    synced: int = 0
+
+
+class JobPoller:
+    """
+    Một poller nền duy nhất cho mọi job bên ngoài đang chờ (generation/
+    variation của Leonardo, request của fal).
+
+    Mỗi id được kiểm tra theo lịch riêng: thưa khi job còn mới, dày nhất
+    (min_interval) quanh thời gian hoàn tất thường gặp của provider (EWMA của
+    các job đã xong) và giãn dần sau đó. Các lượt kiểm tra tới hạn được chạy
+    cùng lúc mỗi tick, giới hạn số lời gọi đồng thời, và các lượt hỏi cùng một
+    id dùng chung một lời gọi upstream. Endpoint status đọc trạng thái đã cache
+    qua get(); tác vụ nền chờ bằng wait(). Id không ai hỏi tới trong
+    idle_timeout giây bị bỏ theo dõi.
+
+    Lượt kiểm tra lỗi được thử lại với backoff tới max_interval; job chỉ bị bỏ
+    (và các waiter nhận lỗi) khi provider không trả lời suốt give_up_after
+    giây, lâu hơn hẳn SLA của provider, nên provider gián đoạn không làm fail
+    một job đã trả tiền mà vẫn đang chạy.
+
+    Với các loại job shared, trạng thái cuối do bất kỳ worker nào ghi (kết quả
+    webhook, trạng thái đã thay bằng URL trong bucket) nằm trong store. Mỗi
+    worker đọc các thay đổi ở đó bằng một query mỗi sync_interval, nên endpoint
+    status ở worker khác thôi trả PENDING hay URL của provider sau vài giây, và
+    job chỉ được hỏi tới sau khi đã xong được trả lời từ store.
+    """
+
+    def __init__(
+        self,
+        min_interval: float,
+        max_interval: float,
+        tick: float,
+        concurrency: int,
+        idle_timeout: float,
+        give_up_after: float,
+        sync_interval: float,
+        store: Optional[ProviderJobStore] = None,
+        max_finished: int = 10000,
+    ):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.tick = tick
+        self.idle_timeout = idle_timeout
+        self.give_up_after = give_up_after
+        self.sync_interval = sync_interval
+        self.store = store
+        self.max_finished = max_finished
+
+        self._targets: Dict[str, PollTarget] = {}
+        self._typical: Dict[str, float] = {}
+        self._stats: Dict[str, _KindStats] = {}
+        self._jobs: Dict[JobKey, _TrackedJob] = {}
+        self._finished: "OrderedDict[JobKey, Dict[str, Any]]" = OrderedDict()
+        self._listeners: Dict[str, list] = {}
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._task: Optional[asyncio.Task] = None
+        self._checks: Set[asyncio.Task] = set()
+        self._sync_task: Optional[asyncio.Task] = None
+        self._next_sync = 0.0
+        self._synced_until: Optional[datetime] = None
+
+    def register(self, target: PollTarget) -> None:
+        self._targets[target.name] = target
+        self._typical[target.name] = target.typical_seconds
+        self._stats[target.name] = _KindStats()
+
+    def add_listener(
+        self, kind: str, callback: Callable[[str, Dict[str, Any]], None]
+    ) -> None:
+        """Gọi callback(job_id, state) mỗi khi một job loại này tới trạng thái cuối."""
+        self._listeners.setdefault(kind, []).append(callback)
+
+    def amend(self, kind: str, job_id: str, **fields: Any) -> None:
+        """Sửa trạng thái cuối của job đã xong (vd: thay bằng URL đã lưu vào bucket)."""
+        state = self._finished.get((kind, job_id))
+        if state is not None:
+            self._replace_final(kind, job_id, {**state, **fields})
+
+    def _replace_final(self, kind: str, job_id: str, state: Dict[str, Any]) -> None:
+        self._finished[(kind, job_id)] = state
+        topic = self._targets[kind].topic
+        if topic:
+            job_events.publish(topic, job_id, state, final=True)
+
+    def _remember(self, kind: str, job_id: str, state: Dict[str, Any]) -> None:
+        self._finished[(kind, job_id)] = state
+        while len(self._finished) > self.max_finished:
+            self._finished.popitem(last=False)
+
+    async def _load_shared(self, kind: str, job_id: str) -> Optional[Dict[str, Any]]:
+        """Trạng thái cuối trong store của job mà worker này không theo dõi."""
+        target = self._targets[kind]
+        if not target.shared or self.store is None or (kind, job_id) in self._jobs:
+            return None
+        try:
+            state = await self.store.get_final(kind, job_id)
+        except Exception as e:
+            logger.warning(f"Đọc trạng thái đã lưu của {kind} {job_id} lỗi: {str(e)}")
+            return None
+        if state is None or not target.is_final(state):
+            return None
+        self._remember(kind, job_id, state)
+        return state
+
+    async def get(self, kind: str, job_id: str) -> Dict[str, Any]:
+        """Trạng thái hiện tại của job; chỉ gọi upstream khi cache đã tới hạn."""
+        key = (kind, job_id)
+        finished = self._finished.get(key)
+        if finished is not None:
+            self._stats[kind].hits += 1
+            return finished
+        stored = await self._load_shared(kind, job_id)
+        if stored is not None:
+            return stored
+
+        job = self._track(kind, job_id)
+        if job.state is not None and time.monotonic() < job.next_due:
+            self._stats[kind].hits += 1
+            return job.state
+        return await self._check(job)
+
+    async def wait(self, kind: str, job_id: str) -> Dict[str, Any]:
+        """Chờ tới khi job tới trạng thái cuối và trả về trạng thái đó."""
+        finished = self._finished.get((kind, job_id))
+        if finished is None:
+            finished = await self._load_shared(kind, job_id)
+        if finished is not None:
+            return finished
+
+        job = self._track(kind, job_id)
+        job.waiters += 1
+        try:
+            return await asyncio.shield(job.final)
+        finally:
+            job.waiters -= 1
+            job.last_access = time.monotonic()
+
+    def _track(self, kind: str, job_id: str) -> _TrackedJob:
+        key = (kind, job_id)
+        now = time.monotonic()
+        job = self._jobs.get(key)
+        if job is None:
+            push_fallback = self._targets[kind].push_fallback
+            job = _TrackedJob(
+                kind=kind,
+                job_id=job_id,
+                first_seen=now,
+                next_due=now + push_fallback if push_fallback else now,
+                interval=push_fallback or self.min_interval,
+                last_access=now,
+                last_ok=now,
+                final=asyncio.get_running_loop().create_future(),
+            )
+            self._jobs[key] = job
+        job.last_access = now
+        return job
+
+    async def _check(self, job: _TrackedJob) -> Dict[str, Any]:
+        if job.inflight is not None:
+            self._stats[job.kind].coalesced += 1
+            return await asyncio.shield(job.inflight)
+
+        job.inflight = asyncio.get_running_loop().create_future()
+        try:
+            async with self._semaphore:
+                state = await self._run_check(job)
+            job.inflight.set_result(state)
+            return state
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                job.inflight.cancel()
+            else:
+                job.inflight.set_exception(e)
+                job.inflight.exception()
+            raise
+        finally:
+            job.inflight = None
+
+    async def _run_check(self, job: _TrackedJob) -> Dict[str, Any]:
+        target = self._targets[job.kind]
+        stats = self._stats[job.kind]
+        stats.checks += 1
+        try:
+            state = await target.check(job.job_id)
+        except Exception as e:
+            stats.errors += 1
+            job.errors += 1
+            job.interval = min(job.interval * 2, self.max_interval)
+            now = time.monotonic()
+            job.next_due = now + job.interval
+            if now - job.last_ok >= self.give_up_after:
+                logger.error(
+                    f"Bỏ theo dõi {job.kind} {job.job_id}: không có phản hồi sau "
+                    f"{now - job.last_ok:.0f}s ({job.errors} lần kiểm tra lỗi)"
+                )
+                self._drop(job)
+                if not job.final.done():
+                    job.final.set_exception(e)
+                    job.final.exception()
+            raise
+
+        job.errors = 0
+        job.last_ok = time.monotonic()
+        if target.is_final(state):
+            self._complete(job, state)
+        else:
+            if state != job.state and target.topic:
+                job_events.publish(target.topic, job.job_id, state)
+            job.state = state
+            self._schedule(job)
+        return state
+
+    def resolve(self, kind: str, job_id: str, state: Dict[str, Any]) -> None:
+        """Trạng thái cuối do provider đẩy về (webhook): không poll thêm."""
+        if (kind, job_id) in self._finished:
+            return
+        job = self._jobs.get((kind, job_id))
+        if job is None:
+            job = self._track(kind, job_id)
+        self._complete(job, state)
+
+    def _complete(self, job: _TrackedJob, state: Dict[str, Any]) -> None:
+        target = self._targets[job.kind]
+        if target.topic:
+            job_events.publish(target.topic, job.job_id, state, final=True)
+
+        self._stats[job.kind].completed += 1
+        elapsed = time.monotonic() - job.first_seen
+        self._typical[job.kind] = 0.8 * self._typical[job.kind] + 0.2 * elapsed
+        job.state = state
+        self._remember(job.kind, job.job_id, state)
+        self._drop(job)
+        if not job.final.done():
+            job.final.set_result(state)
+
+        for callback in self._listeners.get(job.kind, ()):
+            try:
+                callback(job.job_id, state)
+            except Exception as e:
+                logger.error(f"Listener của {job.kind} {job.job_id} lỗi: {str(e)}")
+
+    async def _sync_store(self) -> None:
+        """Áp dụng trạng thái cuối do worker khác lưu (webhook, URL trong bucket)."""
+        kinds = [name for name, target in self._targets.items() if target.shared]
+        try:
+            if self._synced_until is None:
+                self._synced_until = await self.store.latest_change()
+                return
+            changes = await self.store.changed_since(
+                kinds, self._synced_until - SYNC_OVERLAP
+            )
+        except Exception as e:
+            logger.warning(f"Đọc trạng thái job dùng chung lỗi: {str(e)}")
+            return
+
+        for kind, job_id, state, updated_at in changes:
+            self._synced_until = max(self._synced_until, updated_at)
+            key = (kind, job_id)
+            if key in self._finished:
+                if self._finished[key] != state:
+                    self._stats[kind].synced += 1
+                    self._replace_final(kind, job_id, state)
+            elif key in self._jobs:
+                self._stats[kind].synced += 1
+                self.resolve(kind, job_id, state)
+
+    def _schedule(self, job: _TrackedJob) -> None:
+        now = time.monotonic()
+        push_fallback = self._targets[job.kind].push_fallback
+        if push_fallback:
+            job.next_due = now + push_fallback
+            return
+
+        age = now - job.first_seen
+        typical = self._typical[job.kind]
+        if age < 0.5 * typical:
+            interval = typical * 0.25
+        elif age < 1.5 * typical:
+            interval = self.min_interval
+        else:
+            interval = job.interval * 1.5
+        job.interval = max(self.min_interval, min(interval, self.max_interval))
+        job.next_due = now + job.interval
+
+    def _drop(self, job: _TrackedJob) -> None:
+        self._jobs.pop((job.kind, job.job_id), None)
+
+    async def _poll_due(self, job: _TrackedJob) -> None:
+        try:
+            await self._check(job)
+        except Exception as e:
+            logger.warning(f"Poll {job.kind} {job.job_id} lỗi: {str(e)}")
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.tick)
+            now = time.monotonic()
+            for job in list(self._jobs.values()):
+                if (
+                    job.waiters == 0
+                    and now - job.last_access > self.idle_timeout
+                    and not job_events.has_subscribers(
+                        self._targets[job.kind].topic, job.job_id
+                    )
+                ):
+                    self._drop(job)
+                    job.final.cancel()
+                    continue
+                if job.inflight is None and now >= job.next_due:
+                    task = asyncio.create_task(self._poll_due(job))
+                    self._checks.add(task)
+                    task.add_done_callback(self._checks.discard)
+
+            if (
+                self.store is not None
+                and now >= self._next_sync
+                and (self._sync_task is None or self._sync_task.done())
+            ):
+                self._next_sync = now + self.sync_interval
+                self._sync_task = asyncio.create_task(self._sync_store())
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        tasks = list(self._checks)
+        if self._sync_task is not None:
+            tasks.append(self._sync_task)
+            self._sync_task = None
+        if self._task is not None:
+            tasks.append(self._task)
+            self._task = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        result = {}
+        for name, stats in self._stats.items():
+            result[name] = {
+                "tracked": sum(1 for key in self._jobs if key[0] == name),
+                "typical_seconds": round(self._typical[name], 1),
+                "checks": stats.checks,
+                "errors": stats.errors,
+                "cache_hits": stats.hits,
+                "coalesced": stats.coalesced,
+                "completed": stats.completed,
+                "synced": stats.synced,
+            }
+        return result
+
+
+async def _check_leonardo_generation(generation_id: str) -> Dict[str, Any]:
+    return await clients.leonardo_service.get_generation_status(generation_id)
+
+
+async def _check_leonardo_variation(variation_id: str) -> Dict[str, Any]:
+    return await clients.leonardo_service.get_variation_status(variation_id)
+
+
+async def _check_fal_request(request_id: str) -> Dict[str, Any]:
+    status = await KlingService.check_status(request_id)
+    if isinstance(status, fal_client.Completed):
+        return {"status": "completed"}
+    if isinstance(status, fal_client.Queued):
+        return {"status": "queued", "position": status.position}
+    return {"status": "in_progress"}
+
+
+def _leonardo_final(state: Dict[str, Any]) -> bool:
+    return state["status"] in LEONARDO_FINAL_STATUSES
+
+
+# Khi đã cấu hình webhook Leonardo, poll chỉ là dự phòng cho webhook bị mất
+_leonardo_push_fallback = (
+    settings.WEBHOOK_FALLBACK_AFTER if settings.LEONARDO_WEBHOOK_SECRET else None
+)
+
+job_poller = JobPoller(
+    min_interval=settings.POLLER_MIN_INTERVAL,
+    max_interval=settings.POLLER_MAX_INTERVAL,
+    tick=settings.POLLER_TICK,
+    concurrency=settings.POLLER_CONCURRENCY,
+    idle_timeout=settings.POLLER_IDLE_TIMEOUT,
+    give_up_after=settings.POLLER_GIVE_UP_AFTER,
+    sync_interval=settings.WEBHOOK_SYNC_INTERVAL,
+    store=provider_job_store,
+)
+job_poller.register(
+    PollTarget(
+        name="leonardo",
+        check=_check_leonardo_generation,
+        is_final=_leonardo_final,
+        typical_seconds=120.0,
+        topic="leonardo",
+        push_fallback=_leonardo_push_fallback,
+        shared=True,
+    )
+)
+job_poller.register(
+    PollTarget(
+        name="variation",
+        check=_check_leonardo_variation,
+        is_final=_leonardo_final,
+        typical_seconds=60.0,
+        topic="variation",
+        push_fallback=_leonardo_push_fallback,
+        shared=True,
+    )
+)
+job_poller.register(
+    PollTarget(
+        name="fal",
+        check=_check_fal_request,
+        is_final=lambda state: state["status"] == "completed",
+        typical_seconds=settings.VIDEO_JOB_ESTIMATED_SECONDS,
+    )
+)
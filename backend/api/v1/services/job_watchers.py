@@ -0,0 +1,50 @@
+import asyncio
+import logging
+
+from api.v1.services.job_poller import job_poller
+from api.v1.services.video_jobs import video_job_store
+from api.v1.services.video_scheduler import video_scheduler
+from core.config import settings
+from core.events import job_events
+
+logger = logging.getLogger(__name__)
+
+
+async def watch_video(request_id: str) -> None:
+    """
+    Video jobs are published by the worker that runs them; this covers jobs
+    running on another worker by re-reading the shared job store.
+    """
+    while True:
+        job = await video_job_store.get(request_id)
+        if job is None:
+            return
+        event = job.to_event()
+        position = video_scheduler.position(request_id)
+        if position is not None:
+            event["queue_position"] = position
+            event["eta_seconds"] = video_scheduler.eta_seconds(position)
+        job_events.publish("video", request_id, event, final=job.is_finished)
+        if job.is_finished:
+            return
+        await asyncio.sleep(settings.JOB_WATCH_INTERVAL)
+
+
+def _watch_polled(kind: str):
+    """Leonardo jobs are polled by job_poller, which publishes every change."""
+
+    async def watch(job_id: str) -> None:
+        try:
+            await job_poller.wait(kind, job_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Stopped watching {kind} {job_id}: {str(e)}")
+
+    return watch
+
+
+def register_job_watchers() -> None:
+    job_events.register_watcher("video", watch_video)
+    job_events.register_watcher("leonardo", _watch_polled("leonardo"))
+    job_events.register_watcher("variation", _watch_polled("variation"))
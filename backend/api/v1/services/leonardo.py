@@ -1,9 +1,12 @@
 import json
 import httpx
-import tempfile
-import os
 from typing import Dict, Any
 
+from core.blob_cache import BlobCacheError, blob_cache
+from core.http_clients import http_clients
+
+LEONARDO_FINAL_STATUSES = ("COMPLETE", "FAILED")
+
 
 class LeonardoService:
     def __init__(self, api_key: str):
@@ -15,111 +18,154 @@ class LeonardoService:
             "authorization": f"Bearer {self.api_key}",
         }
 
-    async def download_image_from_gcs(self, gcs_url: str) -> str:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(gcs_url)
-            if response.status_code != 200:
-                raise Exception(
-                    f"Failed to download image from GCS. Status: {response.status_code}"
-                )
+    @property
+    def client(self) -> httpx.AsyncClient:
+        return http_clients.get("leonardo")
 
-            file_extension = gcs_url.split(".")[-1] if "." in gcs_url else "jpg"
-            temp_file = tempfile.NamedTemporaryFile(
-                delete=False, suffix=f".{file_extension}"
+    async def download_image_from_gcs(self, gcs_url: str) -> bytes:
+        """Nội dung ảnh, qua cache đĩa dùng chung (ảnh quá lớn thì tải thẳng)."""
+        try:
+            return await blob_cache.read(gcs_url)
+        except BlobCacheError as e:
+            raise Exception(
+                f"Failed to download image from GCS. Status: {e.status_code}"
             )
-            temp_file_path = temp_file.name
-
-            with open(temp_file_path, "wb") as f:
-                f.write(response.content)
-
-            return temp_file_path
 
     async def get_presigned_url(self, extension: str = "jpg") -> Dict[str, Any]:
         url = f"{self.base_url}/init-image"
         payload = {"extension": extension}
 
-        async with httpx.AsyncClient() as client:
-            response = await client.post(url, json=payload, headers=self.headers)
-            if response.status_code != 200:
-                raise Exception(
-                    f"Failed to get presigned URL. Status: {response.status_code}, Response: {response.text}"
-                )
+        response = await self.client.post(url, json=payload, headers=self.headers)
+        if response.status_code != 200:
+            raise Exception(
+                f"Failed to get presigned URL. Status: {response.status_code}, Response: {response.text}"
+            )
 
-            return response.json()
+        return response.json()
 
     async def upload_image_to_presigned_url(
-        self, presigned_url: str, fields: Dict[str, str], file_path: str
+        self, presigned_url: str, fields: Dict[str, str], content: bytes, file_name: str
     ) -> int:
-        files = {"file": open(file_path, "rb")}
+        files = {"file": (file_name, content)}
 
-        async with httpx.AsyncClient() as client:
-            response = await client.post(presigned_url, data=fields, files=files)
-            return response.status_code
+        client = http_clients.for_url(presigned_url)
+        response = await client.post(presigned_url, data=fields, files=files)
+        return response.status_code
 
     async def create_universal_upscaler(self, params: Dict[str, Any]) -> Dict[str, Any]:
         url = f"{self.base_url}/variations/universal-upscaler"
 
-        async with httpx.AsyncClient() as client:
-            response = await client.post(url, json=params, headers=self.headers)
-            if response.status_code != 200:
-                raise Exception(
-                    f"Failed to create upscale. Status: {response.status_code}, Response: {response.text}"
-                )
+        response = await self.client.post(url, json=params, headers=self.headers)
+        if response.status_code != 200:
+            raise Exception(
+                f"Failed to create upscale. Status: {response.status_code}, Response: {response.text}"
+            )
 
-            return response.json()
+        return response.json()
 
     async def get_variation(self, variation_id: str) -> Dict[str, Any]:
         url = f"{self.base_url}/variations/{variation_id}"
 
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, headers=self.headers)
-            if response.status_code != 200:
-                raise Exception(
-                    f"Failed to get variation. Status: {response.status_code}, Response: {response.text}"
-                )
+        response = await self.client.get(url, headers=self.headers)
+        if response.status_code != 200:
+            raise Exception(
+                f"Failed to get variation. Status: {response.status_code}, Response: {response.text}"
+            )
 
-            return response.json()
+        return response.json()
+
+    async def get_generation(self, generation_id: str) -> Dict[str, Any]:
+        url = f"{self.base_url}/generations/{generation_id}"
+
+        response = await self.client.get(url, headers=self.headers)
+        if response.status_code != 200:
+            raise Exception(
+                f"Failed to get generation. Status: {response.status_code}, Response: {response.text}"
+            )
+
+        return response.json()
+
+    async def get_generation_status(self, generation_id: str) -> Dict[str, Any]:
+        """Trạng thái motion video generation ở dạng trả về cho client."""
+        response = await self.get_generation(generation_id)
+        generation = response.get("generations_by_pk") or {}
+        generation_status = generation.get("status", "UNKNOWN")
+
+        result = {
+            "id": generation_id,
+            "status": generation_status,
+        }
+
+        if generation_status == "COMPLETE":
+            generated_items = generation.get("generated_images", [])
+            if generated_items:
+                result["video_url"] = generated_items[0].get("motionMP4URL")
+
+        elif generation_status == "FAILED":
+            result["error"] = "Generation failed"
+
+        return result
+
+    async def get_variation_status(self, variation_id: str) -> Dict[str, Any]:
+        """Trạng thái upscale variation ở dạng trả về cho client."""
+        result = await self.get_variation(variation_id)
+        generated_image_variation_generic = result.get(
+            "generated_image_variation_generic", {}
+        )
+
+        if not generated_image_variation_generic:
+            return {
+                "id": variation_id,
+                "status": "PENDING",
+                "created_at": "",
+                "generated_images": "",
+            }
+
+        variation_data = generated_image_variation_generic[0]
+        url = variation_data.get("url", "")
+
+        return {
+            "id": variation_data.get("id", ""),
+            "status": variation_data.get("status", "PENDING"),
+            "created_at": variation_data.get("createdAt", ""),
+            "generated_images": url if isinstance(url, str) else "",
+        }
 
     async def upscale_from_gcs(
         self, gcs_url: str, upscale_params: Dict[str, Any]
     ) -> Dict[str, Any]:
         try:
-            temp_file_path = await self.download_image_from_gcs(gcs_url)
-            try:
-                file_extension = os.path.basename(temp_file_path).split(".")[-1]
-                init_image_result = await self.get_presigned_url(
-                    extension=file_extension
-                )
-                presigned_url = init_image_result["uploadInitImage"]["url"]
-                fields = json.loads(init_image_result["uploadInitImage"]["fields"])
-                image_id = init_image_result["uploadInitImage"]["id"]
-                status_code = await self.upload_image_to_presigned_url(
-                    presigned_url=presigned_url, fields=fields, file_path=temp_file_path
+            # Đọc hết nội dung trước: file trong cache có thể bị evict trước khi upload
+            content = await self.download_image_from_gcs(gcs_url)
+            file_name = gcs_url.split("?")[0].split("/")[-1]
+            file_extension = file_name.split(".")[-1] if "." in file_name else "jpg"
+            init_image_result = await self.get_presigned_url(extension=file_extension)
+            presigned_url = init_image_result["uploadInitImage"]["url"]
+            fields = json.loads(init_image_result["uploadInitImage"]["fields"])
+            image_id = init_image_result["uploadInitImage"]["id"]
+            status_code = await self.upload_image_to_presigned_url(
+                presigned_url=presigned_url,
+                fields=fields,
+                content=content,
+                file_name=file_name,
+            )
+
+            if status_code != 204:
+                raise Exception(
+                    f"Failed to upload image to Leonardo. Status: {status_code}"
                 )
 
-                if status_code != 204:
-                    raise Exception(
-                        f"Failed to upload image to Leonardo. Status: {status_code}"
-                    )
-
-                upscale_params["initImageId"] = image_id
-                upscale_result = await self.create_universal_upscaler(upscale_params)
-
-                variation_id = upscale_result["universalUpscaler"]["id"]
-
-                return {
-                    "status": "PENDING",
-                    "message": "Upscale process initiated successfully",
-                    "variation_id": variation_id,
-                    "init_image_id": image_id,
-                }
-            finally:
-                try:
-                    os.unlink(temp_file_path)
-                except Exception as e:
-                    print(
-                        f"Warning: Failed to delete temporary file {temp_file_path}: {str(e)}"
-                    )
+            upscale_params["initImageId"] = image_id
+            upscale_result = await self.create_universal_upscaler(upscale_params)
+
+            variation_id = upscale_result["universalUpscaler"]["id"]
+
+            return {
+                "status": "PENDING",
+                "message": "Upscale process initiated successfully",
+                "variation_id": variation_id,
+                "init_image_id": image_id,
+            }
 
         except Exception as e:
             raise Exception(f"Error in upscale_from_gcs: {str(e)}")
@@ -0,0 +1,165 @@
+import json
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, func, or_, select, text, update
+from sqlalchemy.dialects.mysql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.config import settings
+from core.database import Database
+from models.user import ProviderJob
+
+logger = logging.getLogger(__name__)
+
+# (kind, job_id, trạng thái cuối, updated_at của bản ghi)
+StateChange = Tuple[str, str, Dict[str, Any], datetime]
+
+
+def _db_seconds_ago(seconds: float):
+    # created_at/updated_at do database ghi theo giờ của nó, nên mốc so sánh
+    # cũng phải tính trên database thay vì từ utcnow() của Python
+    return func.date_sub(func.now(), text(f"INTERVAL {int(seconds)} SECOND"))
+
+
+class ProviderJobStore:
+    """
+    Job bên provider do app gửi đi, lưu trong bảng provider_jobs.
+
+    Bản ghi được tạo lúc submit với chủ sở hữu và ngữ cảnh, nên worker nào
+    thấy job hoàn tất cũng lưu được kết quả, kể cả sau khi worker đã submit
+    bị restart. Webhook chỉ tới một worker; worker đó ghi trạng thái cuối vào
+    đây, và các worker khác đọc các thay đổi (cả URL đã lưu vào bucket) theo
+    updated_at thay vì chờ tới lần poll dự phòng. Bản ghi đã xong cũ hơn
+    retention giây được xóa dần mỗi lần ghi.
+    """
+
+    def __init__(self, retention: float):
+        self.retention = retention
+
+    async def create(
+        self,
+        kind: str,
+        job_id: str,
+        user_id: Optional[int] = None,
+        context: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        async with Database.get_session() as db:
+            await db.execute(
+                insert(ProviderJob)
+                .values(
+                    kind=kind,
+                    job_id=job_id,
+                    user_id=user_id,
+                    context=json.dumps(context or {}),
+                )
+                .prefix_with("IGNORE")
+            )
+            await db.commit()
+
+    async def get(self, kind: str, job_id: str) -> Optional[ProviderJob]:
+        async with Database.get_session() as db:
+            return await db.get(ProviderJob, (kind, job_id))
+
+    async def get_final(self, kind: str, job_id: str) -> Optional[Dict[str, Any]]:
+        job = await self.get(kind, job_id)
+        if job is None or job.state is None:
+            return None
+        return json.loads(job.state)
+
+    async def save_final(self, kind: str, job_id: str, state: Dict[str, Any]) -> None:
+        now = datetime.utcnow()
+        values = {
+            "state": json.dumps(state),
+            "finished_at": now,
+            # ON DUPLICATE KEY UPDATE không áp dụng onupdate của cột
+            "updated_at": func.now(),
+        }
+        async with Database.get_session() as db:
+            # Provider có thể gửi lại webhook: ghi đè thay vì lỗi trùng khóa
+            await db.execute(
+                insert(ProviderJob)
+                .values(kind=kind, job_id=job_id, **values)
+                .on_duplicate_key_update(**values)
+            )
+            # Job chưa xong vẫn cần chủ sở hữu và ngữ cảnh để lưu kết quả
+            await db.execute(
+                delete(ProviderJob).where(
+                    ProviderJob.created_at < _db_seconds_ago(self.retention),
+                    or_(
+                        ProviderJob.archived_at.is_not(None),
+                        ProviderJob.finished_at.is_not(None),
+                    ),
+                )
+            )
+            await db.commit()
+
+    async def mark_archived(
+        self, db: AsyncSession, kind: str, job_id: str, state: Dict[str, Any]
+    ) -> bool:
+        """
+        Ghi trạng thái cuối (đã thay URL provider bằng URL trong bucket) và đánh
+        dấu đã lưu, trong transaction của db. False nếu worker khác đã làm trước.
+        """
+        now = datetime.utcnow()
+        result = await db.execute(
+            update(ProviderJob)
+            .where(
+                ProviderJob.kind == kind,
+                ProviderJob.job_id == job_id,
+                ProviderJob.archived_at.is_(None),
+            )
+            .values(
+                state=json.dumps(state),
+                finished_at=func.coalesce(ProviderJob.finished_at, now),
+                archived_at=now,
+            )
+        )
+        return result.rowcount > 0
+
+    async def latest_change(self) -> Optional[datetime]:
+        """Mốc updated_at mới nhất, để bắt đầu đọc thay đổi từ đó."""
+        async with Database.get_session() as db:
+            return await db.scalar(select(func.max(ProviderJob.updated_at)))
+
+    async def changed_since(
+        self, kinds: Iterable[str], since: datetime
+    ) -> List[StateChange]:
+        """Các trạng thái cuối được ghi từ mốc since."""
+        async with Database.get_session() as db:
+            rows = await db.execute(
+                select(
+                    ProviderJob.kind,
+                    ProviderJob.job_id,
+                    ProviderJob.state,
+                    ProviderJob.updated_at,
+                ).where(
+                    ProviderJob.kind.in_(list(kinds)),
+                    ProviderJob.state.is_not(None),
+                    ProviderJob.updated_at >= since,
+                )
+            )
+            return [
+                (kind, job_id, json.loads(state), updated_at)
+                for kind, job_id, state, updated_at in rows
+            ]
+
+    async def list_unarchived(
+        self, kinds: Iterable[str], older_than: float, limit: int = 100
+    ) -> List[ProviderJob]:
+        """Job submit trước older_than giây mà kết quả chưa được lưu vào bucket."""
+        async with Database.get_session() as db:
+            result = await db.execute(
+                select(ProviderJob)
+                .where(
+                    ProviderJob.kind.in_(list(kinds)),
+                    ProviderJob.archived_at.is_(None),
+                    ProviderJob.created_at < _db_seconds_ago(older_than),
+                )
+                .limit(limit)
+            )
+            return list(result.scalars())
+
+
+provider_job_store = ProviderJobStore(retention=settings.PROVIDER_JOB_RETENTION)
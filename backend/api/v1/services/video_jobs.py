@@ -0,0 +1,357 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from sqlalchemy import or_, select, update
+
+from api.v1.schemas.video import GenerateVideoRequest
+from core.config import settings
+from core.database import Database
+from core.events import job_events
+from models.user import VideoRequest
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ("completed", "failed")
+
+
+@dataclass
+class VideoJob:
+    request_id: str
+    status: str
+    user_id: Optional[int] = None
+    video_url: Optional[str] = None
+    error_message: Optional[str] = None
+    kling_request_id: Optional[str] = None
+    gcs_filename: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    # Thời điểm (monotonic) bản chụp được đọc từ / ghi xuống database
+    cached_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in TERMINAL_STATUSES
+
+    def to_event(self) -> Dict[str, Any]:
+        return {
+            "request_id": self.request_id,
+            "status": self.status,
+            "video_url": self.video_url,
+            "error": self.error_message,
+        }
+
+    @classmethod
+    def from_row(cls, row: VideoRequest) -> "VideoJob":
+        return cls(
+            request_id=row.id,
+            status=row.status,
+            user_id=row.user_id,
+            video_url=row.video_url,
+            error_message=row.error_message,
+            kling_request_id=row.kling_request_id,
+            gcs_filename=row.gcs_filename,
+            created_at=row.created_at,
+            updated_at=row.updated_at,
+        )
+
+
+class VideoJobStore:
+    """
+    Job tạo video, lưu trong bảng video_requests.
+
+    Lượt đọc được phục vụ từ một cache nhỏ trong bộ nhớ: job đã xong không đổi
+    nữa nên được giữ finished_ttl giây, job chưa xong được đọc lại từ database
+    sau active_ttl giây để thấy trạng thái do worker khác ghi. Các chuyển trạng
+    thái trung gian được gộp theo job và ghi trong một transaction mỗi
+    flush_interval giây; chuyển sang trạng thái cuối được ghi ngay.
+    """
+
+    def __init__(
+        self,
+        finished_ttl: float,
+        active_ttl: float,
+        max_entries: int,
+        flush_interval: float,
+    ):
+        self.finished_ttl = finished_ttl
+        self.active_ttl = active_ttl
+        self.max_entries = max_entries
+        self.flush_interval = flush_interval
+
+        self._cache: "OrderedDict[str, VideoJob]" = OrderedDict()
+        self._dirty: Dict[str, Dict[str, Any]] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+
+        self._hits = 0
+        self._misses = 0
+        self._writes = 0
+        self._coalesced = 0
+
+    async def create(
+        self,
+        request_id: str,
+        request: GenerateVideoRequest,
+        user_id: Optional[int] = None,
+    ) -> VideoJob:
+        row = VideoRequest(
+            id=request_id,
+            user_id=user_id,
+            status="pending",
+            prompt=request.prompt,
+            image_url=str(request.image_url),
+            duration=request.duration.value,
+            aspect_ratio=request.aspect_ratio.value,
+            negative_prompt=request.negative_prompt,
+            cfg_scale=request.cfg_scale,
+        )
+        async with Database.get_session() as db:
+            db.add(row)
+            await db.commit()
+
+        job = VideoJob.from_row(row)
+        self._put(job)
+        return job
+
+    async def get(self, request_id: str) -> Optional[VideoJob]:
+        job = self._cache.get(request_id)
+        if job is not None:
+            ttl = self.finished_ttl if job.is_finished else self.active_ttl
+            # Job còn thay đổi chưa ghi thuộc worker này, nên cache là bản mới nhất
+            if request_id in self._dirty or time.monotonic() - job.cached_at < ttl:
+                self._cache.move_to_end(request_id)
+                self._hits += 1
+                return job
+
+        self._misses += 1
+        async with Database.get_session() as db:
+            row = await db.get(VideoRequest, request_id)
+        if row is None:
+            return None
+
+        job = VideoJob.from_row(row)
+        self._put(job)
+        return job
+
+    async def update(self, request_id: str, **fields: Any) -> None:
+        """
+        Ghi nhận một lần chuyển trạng thái. Các trường được áp dụng ngay vào job
+        trong cache; trạng thái trung gian được ghi ở lần flush định kỳ kế tiếp.
+        Trạng thái cuối được ghi ngay; ghi lỗi thì flush định kỳ thử lại, lỗi
+        không truyền ra người gọi. Job đã xong không bao giờ đổi trạng thái nữa
+        (xem thêm flush()).
+        """
+        job = self._cache.get(request_id)
+        if job is None:
+            # Đọc job từ database: event gửi đi phải có đủ trạng thái, kể cả khi
+            # chỉ cập nhật video_url. Đọc lỗi thì vẫn ghi cập nhật, chỉ bỏ event
+            try:
+                job = await self.get(request_id)
+            except Exception as e:
+                logger.warning(f"Đọc video job {request_id} lỗi: {str(e)}")
+        if (
+            job is not None
+            and job.is_finished
+            and fields.get("status", job.status) != job.status
+        ):
+            logger.warning(
+                f"Bỏ qua {fields['status']} cho video job {request_id}: "
+                f"đã {job.status}"
+            )
+            return
+        if job is not None:
+            for name, value in fields.items():
+                if name == "id":
+                    continue
+                if hasattr(job, name):
+                    setattr(job, name, value)
+            job.cached_at = time.monotonic()
+            if "status" in fields or "video_url" in fields:
+                job_events.publish(
+                    "video", request_id, job.to_event(), final=job.is_finished
+                )
+
+        pending = self._dirty.setdefault(request_id, {})
+        if pending:
+            self._coalesced += 1
+        pending.update(fields)
+
+        if fields.get("status") in TERMINAL_STATUSES:
+            try:
+                await self.flush()
+                return
+            except Exception:
+                # Đã log lỗi và trả batch về _dirty; flush định kỳ sẽ thử lại
+                pass
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+                return
+            except Exception:
+                # Đã log lỗi; batch vẫn chưa ghi và sẽ được thử lại
+                continue
+
+    async def flush(self) -> None:
+        async with self._flush_lock:
+            if not self._dirty:
+                return
+            batch, self._dirty = self._dirty, {}
+            try:
+                refused = []
+                async with Database.get_session() as db:
+                    for request_id, values in batch.items():
+                        query = update(VideoRequest).where(
+                            VideoRequest.id == request_id
+                        )
+                        if "status" in values:
+                            # Worker khác có thể đã kết thúc job
+                            query = query.where(
+                                VideoRequest.status.not_in(TERMINAL_STATUSES)
+                            )
+                        result = await db.execute(query.values(**values))
+                        if "status" in values and result.rowcount == 0:
+                            refused.append(request_id)
+                    await db.commit()
+                self._writes += len(batch) - len(refused)
+                for request_id in refused:
+                    logger.warning(
+                        f"Video job {request_id} đã kết thúc, bỏ cập nhật"
+                    )
+                    # Đọc lại trạng thái cuối ở lần get() kế tiếp
+                    self._cache.pop(request_id, None)
+            except Exception as e:
+                logger.error(f"Ghi cập nhật video job lỗi: {str(e)}")
+                # Giữ các giá trị mới hơn tới trong lúc batch này đang được ghi
+                for request_id, values in batch.items():
+                    self._dirty[request_id] = {
+                        **values,
+                        **self._dirty.get(request_id, {}),
+                    }
+                raise
+
+    async def touch(self, request_id: str) -> bool:
+        """
+        Heartbeat: đánh dấu job vẫn thuộc một worker còn sống. Trả về False khi
+        job đã kết thúc (hoặc không còn).
+        """
+        async with Database.get_session() as db:
+            result = await db.execute(
+                update(VideoRequest)
+                .where(
+                    VideoRequest.id == request_id,
+                    VideoRequest.status.not_in(TERMINAL_STATUSES),
+                )
+                .values(updated_at=datetime.utcnow())
+            )
+            await db.commit()
+        return result.rowcount == 1
+
+    async def claim(self, request_id: str, stale_after: float) -> bool:
+        """
+        Nhận lại job chưa xong mà worker sở hữu đã ngừng gửi heartbeat. Update
+        có điều kiện chỉ thành công ở đúng một worker.
+        """
+        now = datetime.utcnow()
+        async with Database.get_session() as db:
+            result = await db.execute(
+                update(VideoRequest)
+                .where(
+                    VideoRequest.id == request_id,
+                    VideoRequest.status.not_in(TERMINAL_STATUSES),
+                    or_(
+                        VideoRequest.updated_at.is_(None),
+                        VideoRequest.updated_at < now - timedelta(seconds=stale_after),
+                    ),
+                )
+                .values(updated_at=now)
+            )
+            await db.commit()
+        return result.rowcount == 1
+
+    async def list_unfinished(self) -> list:
+        async with Database.get_session() as db:
+            result = await db.execute(
+                select(VideoRequest).where(
+                    VideoRequest.status.not_in(TERMINAL_STATUSES)
+                )
+            )
+            return [VideoJob.from_row(row) for row in result.scalars()]
+
+    async def list_unarchived(self, older_than: float, limit: int = 100) -> list:
+        """Job đã xong mà video vẫn chỉ nằm trên CDN của provider."""
+        async with Database.get_session() as db:
+            result = await db.execute(
+                select(VideoRequest)
+                .where(
+                    VideoRequest.status == "completed",
+                    VideoRequest.provider_video_url.is_not(None),
+                    VideoRequest.archived_at.is_(None),
+                    VideoRequest.updated_at
+                    < datetime.utcnow() - timedelta(seconds=older_than),
+                )
+                .limit(limit)
+            )
+            return [
+                (row.id, row.provider_video_url) for row in result.scalars()
+            ]
+
+    def _put(self, job: VideoJob) -> None:
+        job.cached_at = time.monotonic()
+        self._cache[job.request_id] = job
+        self._cache.move_to_end(job.request_id)
+        self._evict()
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        expired = [
+            request_id
+            for request_id, job in self._cache.items()
+            if job.is_finished
+            and request_id not in self._dirty
+            and now - job.cached_at >= self.finished_ttl
+        ]
+        for request_id in expired:
+            del self._cache[request_id]
+
+        if len(self._cache) > self.max_entries:
+            for request_id in list(self._cache):
+                if len(self._cache) <= self.max_entries:
+                    break
+                if request_id not in self._dirty:
+                    del self._cache[request_id]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "cached": len(self._cache),
+            "dirty": len(self._dirty),
+            "hits": self._hits,
+            "misses": self._misses,
+            "writes": self._writes,
+            "coalesced": self._coalesced,
+        }
+
+    async def aclose(self) -> None:
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_task.cancel()
+        try:
+            await self.flush()
+        except Exception:
+            pass
+
+
+video_job_store = VideoJobStore(
+    finished_ttl=settings.VIDEO_JOB_CACHE_TTL,
+    active_ttl=settings.VIDEO_JOB_ACTIVE_TTL,
+    max_entries=settings.VIDEO_JOB_CACHE_MAX_ENTRIES,
+    flush_interval=settings.VIDEO_JOB_FLUSH_INTERVAL,
+)
@@ -0,0 +1,164 @@
+import asyncio
+import heapq
+import itertools
+import math
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional
+
+from core.config import settings
+
+
+@dataclass(order=True)
+class _Ticket:
+    priority: int
+    seq: int
+    request_id: str = field(compare=False)
+    user_id: Optional[int] = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+
+
+class FairScheduler:
+    """
+    Kiểm soát số video job gửi sang fal.
+
+    Tối đa max_in_flight job chạy cùng lúc bên provider. Job đang chờ được cấp
+    slot xoay vòng giữa các user, nên một user xếp nhiều render không làm các
+    user khác phải chờ mãi; trong cùng một user, video ngắn hơn đi trước. Slot
+    được giữ từ lúc submit tới khi lấy được kết quả.
+    """
+
+    def __init__(self, max_in_flight: int, default_job_seconds: float):
+        self.max_in_flight = max_in_flight
+        self._avg_job_seconds = default_job_seconds
+
+        self._queues: Dict[Optional[int], List[_Ticket]] = {}
+        self._users: Deque[Optional[int]] = deque()
+        self._tickets: Dict[str, _Ticket] = {}
+        self._running: Dict[str, float] = {}
+        self._seq = itertools.count()
+
+        self._dispatched = 0
+        self._max_queue_depth = 0
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        request_id: str,
+        user_id: Optional[int],
+        priority: int = 0,
+        queued: bool = True,
+    ):
+        """
+        Giữ một slot của provider trong suốt block. Job đã chạy bên provider
+        (tiếp tục sau restart) truyền queued=False để được tính mà không phải
+        chờ.
+        """
+        if queued:
+            await self.acquire(request_id, user_id, priority)
+        else:
+            self._running[request_id] = asyncio.get_running_loop().time()
+        try:
+            yield
+        finally:
+            self.release(request_id)
+
+    async def acquire(
+        self, request_id: str, user_id: Optional[int], priority: int = 0
+    ) -> None:
+        ticket = _Ticket(
+            priority=priority,
+            seq=next(self._seq),
+            request_id=request_id,
+            user_id=user_id,
+            future=asyncio.get_running_loop().create_future(),
+        )
+        queue = self._queues.get(user_id)
+        if queue is None:
+            queue = self._queues[user_id] = []
+            self._users.append(user_id)
+        heapq.heappush(queue, ticket)
+        self._tickets[request_id] = ticket
+        self._max_queue_depth = max(self._max_queue_depth, len(self._tickets))
+
+        self._dispatch()
+        try:
+            await ticket.future
+        except asyncio.CancelledError:
+            # _dispatch bỏ qua ticket đã hủy; slot được cấp đúng lúc hủy thì
+            # phải trả lại
+            self._tickets.pop(request_id, None)
+            if request_id in self._running:
+                self.release(request_id)
+            raise
+
+    def release(self, request_id: str) -> None:
+        started_at = self._running.pop(request_id, None)
+        if started_at is None:
+            return
+        elapsed = asyncio.get_running_loop().time() - started_at
+        self._avg_job_seconds = 0.8 * self._avg_job_seconds + 0.2 * elapsed
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        while len(self._running) < self.max_in_flight and self._users:
+            user_id = self._users.popleft()
+            queue = self._queues[user_id]
+            ticket = heapq.heappop(queue)
+            if queue:
+                self._users.append(user_id)
+            else:
+                del self._queues[user_id]
+
+            if ticket.future.done():
+                continue
+            self._tickets.pop(ticket.request_id, None)
+            self._running[ticket.request_id] = asyncio.get_running_loop().time()
+            self._dispatched += 1
+            ticket.future.set_result(None)
+
+    def position(self, request_id: str) -> Optional[int]:
+        """Số job sẽ được cấp slot trước job này, None nếu job không xếp hàng."""
+        if request_id not in self._tickets:
+            return None
+
+        users = deque(self._users)
+        queues = {user_id: sorted(self._queues[user_id]) for user_id in users}
+        offsets = dict.fromkeys(users, 0)
+        position = 0
+        while users:
+            user_id = users.popleft()
+            ticket = queues[user_id][offsets[user_id]]
+            offsets[user_id] += 1
+            if offsets[user_id] < len(queues[user_id]):
+                users.append(user_id)
+
+            if ticket.future.done():
+                continue
+            if ticket.request_id == request_id:
+                return position
+            position += 1
+        return None
+
+    def eta_seconds(self, position: int) -> float:
+        """Ước lượng thời gian chờ: hàng đợi vơi đi max_in_flight job mỗi lượt."""
+        waves = math.floor(position / self.max_in_flight) + 1
+        return round(waves * self._avg_job_seconds, 1)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_in_flight": self.max_in_flight,
+            "in_flight": len(self._running),
+            "queued": len(self._tickets),
+            "queued_users": len(self._users),
+            "max_queue_depth": self._max_queue_depth,
+            "dispatched": self._dispatched,
+            "avg_job_seconds": round(self._avg_job_seconds, 1),
+        }
+
+
+video_scheduler = FairScheduler(
+    max_in_flight=settings.VIDEO_MAX_IN_FLIGHT,
+    default_job_seconds=settings.VIDEO_JOB_ESTIMATED_SECONDS,
+)
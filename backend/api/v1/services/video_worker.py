@@ -0,0 +1,285 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Dict, Optional, Set
+
+from api.v1.schemas.video import GenerateVideoRequest
+from api.v1.services.archiver import artifact_archiver
+from api.v1.services.generate_video import KlingService
+from api.v1.services.job_poller import job_poller
+from api.v1.services.video_jobs import VideoJob, video_job_store
+from api.v1.services.video_scheduler import video_scheduler
+from api.v1.services.webhooks import fal_webhook_url, webhooks_enabled
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class VideoWorker:
+    """
+    Chạy video job Kling tới khi có kết quả.
+
+    Request id của fal được lưu ngay sau khi submit, nên vẫn lấy được kết quả
+    sau khi restart: mọi worker định kỳ tìm các job chưa xong mà worker sở hữu
+    đã ngừng heartbeat (updated_at cũ hơn stale_after), nhận lại bằng update có
+    điều kiện và tiếp tục poll fal theo request id thay vì submit lại.
+
+    Khi bật webhook, không coroutine nào chờ job: fal gọi /webhooks/fal khi
+    xong và complete() ghi lại kết quả. Job không bao giờ nhận được webhook
+    được rescan nhận lại sau webhook_fallback_after giây và poll như job được
+    tiếp tục sau restart.
+    """
+
+    def __init__(
+        self,
+        heartbeat_interval: float,
+        stale_after: float,
+        rescan_interval: float,
+        webhook_fallback_after: float,
+    ):
+        self.heartbeat_interval = heartbeat_interval
+        self.stale_after = stale_after
+        self.rescan_interval = rescan_interval
+        self.webhook_fallback_after = webhook_fallback_after
+
+        self._running: Set[str] = set()
+        # Job đang chờ webhook: vẫn giữ một slot của scheduler
+        self._detached: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self._rescan_task: Optional[asyncio.Task] = None
+
+    async def process(
+        self,
+        request: GenerateVideoRequest,
+        request_id: str,
+        user_id: Optional[int] = None,
+    ) -> None:
+        started_at = time.perf_counter()
+        webhook_url = fal_webhook_url(request_id)
+        self._running.add(request_id)
+        try:
+            # Job đang xếp hàng cũng phải heartbeat, nếu không rescan của worker
+            # khác sẽ coi là bị bỏ rơi và nhận lại trong lúc job chờ slot
+            await self._heartbeat_until(
+                request_id,
+                video_scheduler.acquire(
+                    request_id, user_id, priority=int(request.duration.value)
+                ),
+            )
+            detached = False
+            try:
+                if not await video_job_store.touch(request_id):
+                    # Đã kết thúc ở worker khác khi đang xếp hàng; không render nữa
+                    logger.warning(f"Video job {request_id} đã kết thúc khi xếp hàng")
+                    return
+                try:
+                    kling_request_id = await self._submit(request, webhook_url)
+                except Exception as e:
+                    await video_job_store.update(
+                        request_id,
+                        status="failed",
+                        error_message=str(e),
+                        processing_time=time.perf_counter() - started_at,
+                    )
+                    return
+
+                await video_job_store.update(
+                    request_id, status="processing", kling_request_id=kling_request_id
+                )
+                # Phải ghi xuống DB trước khi chờ, nếu không restart sẽ mất job
+                await video_job_store.flush()
+
+                if webhook_url is not None:
+                    self._detached.add(request_id)
+                    detached = True
+                    return
+                await self._wait_for_result(request_id, kling_request_id, started_at)
+            finally:
+                if not detached:
+                    video_scheduler.release(request_id)
+        finally:
+            self._running.discard(request_id)
+
+    async def _submit(
+        self, request: GenerateVideoRequest, webhook_url: Optional[str] = None
+    ) -> str:
+        result = await KlingService.generate_video(
+            prompt=request.prompt,
+            image_url=str(request.image_url),
+            duration=request.duration.value,
+            aspect_ratio=request.aspect_ratio.value,
+            negative_prompt=request.negative_prompt,
+            cfg_scale=request.cfg_scale,
+            webhook_url=webhook_url,
+        )
+        return result["request_id"]
+
+    async def complete(
+        self,
+        request_id: str,
+        result: Optional[Dict[str, Any]],
+        error: Optional[str] = None,
+    ) -> bool:
+        """Ghi kết quả do webhook fal đẩy về. False nếu job đã kết thúc."""
+        job = await video_job_store.get(request_id)
+        if job is None or job.is_finished:
+            return False
+
+        processing_time = (
+            (datetime.utcnow() - job.created_at).total_seconds()
+            if job.created_at
+            else None
+        )
+        await self._finish(request_id, result, error, processing_time)
+        self._release_detached(request_id)
+        return True
+
+    def _release_detached(self, request_id: str) -> None:
+        if request_id in self._detached:
+            self._detached.discard(request_id)
+            video_scheduler.release(request_id)
+
+    async def _finish(
+        self,
+        request_id: str,
+        result: Optional[Dict[str, Any]],
+        error: Optional[str],
+        processing_time: Optional[float],
+    ) -> None:
+        if result and "video" in result and "url" in result["video"]:
+            video_url = result["video"]["url"]
+            # Trả URL của provider tới khi bản sao trong bucket sẵn sàng
+            await video_job_store.update(
+                request_id,
+                status="completed",
+                video_url=video_url,
+                provider_video_url=video_url,
+                processing_time=processing_time,
+            )
+            artifact_archiver.submit("video", request_id, video_url)
+        else:
+            await video_job_store.update(
+                request_id,
+                status="failed",
+                error_message=error or "No video URL in response",
+                processing_time=processing_time,
+            )
+
+    async def _heartbeat_until(
+        self, request_id: str, awaitable: Awaitable[Any]
+    ) -> Any:
+        """Chờ awaitable, trong lúc đó heartbeat job mỗi heartbeat_interval giây."""
+        task = asyncio.ensure_future(awaitable)
+        try:
+            while True:
+                done, _ = await asyncio.wait({task}, timeout=self.heartbeat_interval)
+                if done:
+                    return task.result()
+                await video_job_store.touch(request_id)
+        finally:
+            task.cancel()
+
+    async def _wait_for_result(
+        self, request_id: str, kling_request_id: str, started_at: float
+    ) -> None:
+        try:
+            # Kiểm tra trạng thái đi qua poller dùng chung; ở đây chỉ heartbeat
+            await self._heartbeat_until(
+                request_id, job_poller.wait("fal", kling_request_id)
+            )
+            result = await KlingService.get_result(kling_request_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await self._finish(
+                request_id, None, str(e), time.perf_counter() - started_at
+            )
+            return
+
+        await self._finish(request_id, result, None, time.perf_counter() - started_at)
+
+    async def _resume(self, job: VideoJob) -> None:
+        self._running.add(job.request_id)
+        # Webhook quá hạn: worker này tự poll job
+        self._detached.discard(job.request_id)
+        try:
+            logger.info(
+                f"Tiếp tục video job {job.request_id} (fal request {job.kling_request_id})"
+            )
+            # processing_time vẫn tính từ lần submit ban đầu
+            elapsed = (
+                (datetime.utcnow() - job.created_at).total_seconds()
+                if job.created_at
+                else 0.0
+            )
+            async with video_scheduler.slot(job.request_id, job.user_id, queued=False):
+                await self._wait_for_result(
+                    job.request_id,
+                    job.kling_request_id,
+                    time.perf_counter() - elapsed,
+                )
+        finally:
+            self._running.discard(job.request_id)
+
+    async def rescan(self) -> None:
+        """Nhận lại và tiếp tục các job chưa xong của worker đã chết."""
+        await self._reap_detached()
+        for job in await video_job_store.list_unfinished():
+            if job.request_id in self._running:
+                continue
+            stale_after = self.stale_after
+            if job.kling_request_id and webhooks_enabled():
+                # Không có heartbeat khi chờ webhook; chỉ poll khi webhook quá hạn
+                stale_after = max(stale_after, self.webhook_fallback_after)
+            if not await video_job_store.claim(job.request_id, stale_after):
+                continue
+
+            if not job.kling_request_id:
+                # Chưa tới được fal nên không có gì để tiếp tục
+                await video_job_store.update(
+                    job.request_id,
+                    status="failed",
+                    error_message="Interrupted before submission",
+                )
+                continue
+
+            task = asyncio.create_task(self._resume(job))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _reap_detached(self) -> None:
+        """Trả slot của các job mà webhook đã được worker khác xử lý."""
+        for request_id in list(self._detached):
+            job = await video_job_store.get(request_id)
+            if job is None or job.is_finished:
+                self._release_detached(request_id)
+
+    async def _rescan_loop(self) -> None:
+        while True:
+            try:
+                await self.rescan()
+            except Exception as e:
+                logger.error(f"Rescan video job lỗi: {str(e)}")
+            await asyncio.sleep(self.rescan_interval)
+
+    def start(self) -> None:
+        if self._rescan_task is None or self._rescan_task.done():
+            self._rescan_task = asyncio.create_task(self._rescan_loop())
+
+    async def stop(self) -> None:
+        tasks = list(self._tasks)
+        if self._rescan_task is not None:
+            tasks.append(self._rescan_task)
+            self._rescan_task = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+video_worker = VideoWorker(
+    heartbeat_interval=settings.VIDEO_JOB_HEARTBEAT_INTERVAL,
+    stale_after=settings.VIDEO_JOB_STALE_AFTER,
+    rescan_interval=settings.VIDEO_JOB_RESCAN_INTERVAL,
+    webhook_fallback_after=settings.WEBHOOK_FALLBACK_AFTER,
+)
@@ -0,0 +1,69 @@
+from typing import Any, Dict, Optional, Tuple
+
+from core.config import settings
+from core.security import create_webhook_token
+
+
+def webhooks_enabled() -> bool:
+    return bool(settings.PUBLIC_BASE_URL and settings.WEBHOOK_SECRET)
+
+
+def fal_webhook_url(request_id: str) -> Optional[str]:
+    """URL callback đăng ký với fal cho một video job, None nếu tắt webhook."""
+    if not webhooks_enabled():
+        return None
+    base_url = settings.PUBLIC_BASE_URL.rstrip("/")
+    token = create_webhook_token(request_id)
+    return f"{base_url}/{settings.API_PREFIX}/webhooks/fal/{request_id}?token={token}"
+
+
+def parse_fal_webhook(
+    body: Dict[str, Any],
+) -> Tuple[Optional[str], Optional[Dict[str, Any]], Optional[str]]:
+    """
+    Trả về (request id của fal, kết quả, lỗi). fal gửi status "OK" kèm output
+    của model trong payload, hoặc "ERROR" kèm thông báo trong error.
+    """
+    fal_request_id = body.get("request_id") or body.get("gateway_request_id")
+    if body.get("status") == "OK" and body.get("payload") is not None:
+        return fal_request_id, body["payload"], None
+
+    error = body.get("error") or body.get("payload_error") or "Generation failed"
+    return fal_request_id, None, str(error)
+
+
+def parse_leonardo_webhook(body: Dict[str, Any]) -> Tuple[str, str, Dict[str, Any]]:
+    """
+    Trả về (loại job của poller, id, trạng thái) với trạng thái có cùng dạng
+    response của /leonardo-status và /upscale/variations.
+    """
+    data = (body.get("data") or {}).get("object") or {}
+    job_id = data.get("id")
+    if not job_id:
+        raise ValueError("Missing data.object.id")
+
+    status = data.get("status") or (
+        "FAILED" if str(body.get("type", "")).endswith("failed") else "COMPLETE"
+    )
+    images = data.get("images") or data.get("generated_images") or []
+    first = images[0] if images else {}
+
+    if "variation" in str(body.get("type", "")):
+        url = first.get("url") or data.get("url") or ""
+        return (
+            "variation",
+            job_id,
+            {
+                "id": job_id,
+                "status": status,
+                "created_at": data.get("createdAt", ""),
+                "generated_images": url if isinstance(url, str) else "",
+            },
+        )
+
+    state = {"id": job_id, "status": status}
+    if status == "COMPLETE" and first.get("motionMP4URL"):
+        state["video_url"] = first["motionMP4URL"]
+    elif status == "FAILED":
+        state["error"] = "Generation failed"
+    return "leonardo", job_id, state
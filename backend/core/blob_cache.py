@@ -0,0 +1,333 @@
+import asyncio
+import fcntl
+import hashlib
+import json
+import os
+import time
+import urllib.parse
+import uuid
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import IO, Any, Dict, Optional
+
+from core.config import settings
+from core.executors import BoundedExecutor
+from core.http_clients import http_clients
+
+disk_executor = BoundedExecutor("disk", max_workers=4)
+
+
+class BlobCacheError(Exception):
+    def __init__(self, message: str, status_code: int = 500):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+@dataclass
+class CacheEntry:
+    key: str
+    etag: str
+    path: str
+    size: int
+    content_type: str
+    validated_at: float
+
+
+class BlobCache:
+    """
+    Cache nội dung các object GCS (và URL khác) trên đĩa cục bộ.
+
+    Mỗi object được lưu theo (đường dẫn object, generation/ETag); index LRU nằm
+    trong bộ nhớ, tổng dung lượng bị giới hạn bởi max_bytes. Trong khoảng
+    fresh_seconds sau lần kiểm tra cuối, bản trên đĩa được dùng luôn; sau đó
+    cache revalidate bằng If-None-Match (304 => không tải lại).
+
+    Mỗi worker giữ flock trên một thư mục slot-<n> riêng trong directory và
+    chỉ ghi/evict file của slot đó, nên không xóa file worker khác đang phục
+    vụ. max_bytes là tổng cho cả máy, chia đều theo WEB_CONCURRENCY (số worker
+    uvicorn). Worker khởi động lại nhận lại slot trống và giữ được cache cũ.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int,
+        fresh_seconds: int,
+        max_object_bytes: int,
+        workers: int = 1,
+    ):
+        self.directory = directory
+        self.workers = max(1, workers)
+        self.max_bytes = max_bytes // self.workers
+        self.fresh_seconds = fresh_seconds
+        self.max_object_bytes = max_object_bytes
+
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._total_bytes = 0
+        self._loaded = False
+        # Hai fetch() đầu tiên không được cùng quét (và cùng claim slot)
+        self._load_lock = asyncio.Lock()
+        self._slot_dir: Optional[str] = None
+        self._slot_lock: Optional[IO] = None
+
+        self._hits = 0
+        self._revalidated = 0
+        self._misses = 0
+        self._evictions = 0
+        self._bytes_from_cache = 0
+        self._bytes_downloaded = 0
+
+    @staticmethod
+    def cache_key(url: str) -> str:
+        """Object trong bucket của mình được định danh bằng đường dẫn (bỏ query string)."""
+        parsed = urllib.parse.urlsplit(url)
+        if parsed.netloc == "storage.googleapis.com":
+            return urllib.parse.unquote(parsed.path.lstrip("/"))
+        return url
+
+    def _file_path(self, key: str, etag: str) -> str:
+        digest = hashlib.sha256(f"{key}\n{etag}".encode("utf-8")).hexdigest()
+        return os.path.join(self._slot_dir, f"{digest}.bin")
+
+    def _claim_slot(self) -> None:
+        """Giữ flock trên slot trống đầu tiên suốt đời process."""
+        os.makedirs(self.directory, exist_ok=True)
+        slot = 0
+        while True:
+            lock_file = open(os.path.join(self.directory, f"slot-{slot}.lock"), "w")
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lock_file.close()
+                slot += 1
+                continue
+            self._slot_lock = lock_file
+            self._slot_dir = os.path.join(self.directory, f"slot-{slot}")
+            os.makedirs(self._slot_dir, exist_ok=True)
+            return
+
+    def _scan_directory(self) -> list:
+        """Đọc các file .meta có sẵn để giữ cache qua các lần restart."""
+        if self._slot_dir is None:
+            self._claim_slot()
+        entries = []
+        for name in os.listdir(self._slot_dir):
+            if not name.endswith(".meta"):
+                continue
+            meta_path = os.path.join(self._slot_dir, name)
+            try:
+                with open(meta_path, "r", encoding="utf-8") as f:
+                    entry = CacheEntry(**json.load(f))
+                stat = os.stat(entry.path)
+                entries.append((stat.st_atime, entry))
+            except (OSError, ValueError, TypeError):
+                _remove_quietly(meta_path)
+
+        return [entry for _, entry in sorted(entries, key=lambda item: item[0])]
+
+    async def _load_index(self) -> None:
+        async with self._load_lock:
+            if self._loaded:
+                return
+            entries = await disk_executor.run(self._scan_directory)
+            for entry in entries:
+                if entry.key not in self._entries:
+                    self._entries[entry.key] = entry
+                    self._total_bytes += entry.size
+            self._loaded = True
+            self._evict()
+
+    async def fetch(self, url: str) -> CacheEntry:
+        """Trả về entry (file cục bộ) cho url, tải/revalidate khi cần."""
+        if not self._loaded:
+            await self._load_index()
+
+        key = self.cache_key(url)
+        entry = self._entries.get(key)
+        if entry and time.time() - entry.validated_at < self.fresh_seconds:
+            if os.path.exists(entry.path):
+                self._entries.move_to_end(key)
+                self._hits += 1
+                self._bytes_from_cache += entry.size
+                return entry
+            self._drop(key)
+
+        # Gộp các request đồng thời cho cùng một object thành một lượt tải
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            entry = await self._refresh(url, key)
+            future.set_result(entry)
+            return entry
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Tránh cảnh báo "exception was never retrieved" khi không ai chờ
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+    async def _refresh(self, url: str, key: str) -> CacheEntry:
+        entry = self._entries.get(key)
+        headers = {}
+        if entry:
+            headers["If-None-Match"] = entry.etag
+
+        client = http_clients.for_url(url)
+        async with client.stream("GET", url, headers=headers) as response:
+            if response.status_code == 304 and entry:
+                entry.validated_at = time.time()
+                self._entries.move_to_end(key)
+                self._revalidated += 1
+                self._bytes_from_cache += entry.size
+                return entry
+
+            if response.status_code != 200:
+                raise BlobCacheError(
+                    f"Không thể tải file từ URL: {url}, status: {response.status_code}",
+                    status_code=response.status_code,
+                )
+
+            self._misses += 1
+            etag = (
+                response.headers.get("etag")
+                or response.headers.get("x-goog-generation")
+                or uuid.uuid4().hex
+            )
+            content_type = response.headers.get(
+                "content-type", "application/octet-stream"
+            )
+            path = self._file_path(key, etag)
+            tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+
+            size = 0
+            f = await disk_executor.run(open, tmp_path, "wb")
+            try:
+                async for chunk in response.aiter_bytes(1024 * 1024):
+                    size += len(chunk)
+                    if size > self.max_object_bytes:
+                        raise BlobCacheError(
+                            f"File quá lớn để cache: {url}", status_code=413
+                        )
+                    await disk_executor.run(f.write, chunk)
+            except BaseException:
+                f.close()
+                _remove_quietly(tmp_path)
+                raise
+            f.close()
+
+        self._bytes_downloaded += size
+        new_entry = CacheEntry(
+            key=key,
+            etag=etag,
+            path=path,
+            size=size,
+            content_type=content_type,
+            validated_at=time.time(),
+        )
+        await disk_executor.run(self._write_files, tmp_path, new_entry)
+        self._add(new_entry)
+        return new_entry
+
+    @staticmethod
+    def _write_files(tmp_path: str, entry: CacheEntry) -> None:
+        os.replace(tmp_path, entry.path)
+        with open(f"{entry.path[:-4]}.meta", "w", encoding="utf-8") as f:
+            json.dump(asdict(entry), f)
+
+    def _add(self, entry: CacheEntry) -> None:
+        old = self._entries.get(entry.key)
+        if old is not None and old.path != entry.path:
+            self._drop(entry.key)
+        elif old is not None:
+            self._total_bytes -= old.size
+
+        self._entries[entry.key] = entry
+        self._entries.move_to_end(entry.key)
+        self._total_bytes += entry.size
+        self._evict()
+
+    def _evict(self) -> None:
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            key = next(iter(self._entries))
+            self._drop(key)
+            self._evictions += 1
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._total_bytes -= entry.size
+        _remove_quietly(entry.path)
+        _remove_quietly(f"{entry.path[:-4]}.meta")
+
+    def invalidate(self, url: str) -> None:
+        self._drop(self.cache_key(url))
+
+    def read_bytes(self, entry: CacheEntry) -> bytes:
+        with open(entry.path, "rb") as f:
+            return f.read()
+
+    async def read(self, url: str) -> bytes:
+        try:
+            entry = await self.fetch(url)
+        except BlobCacheError as e:
+            if e.status_code != 413:
+                raise
+            # Quá lớn để cache: tải thẳng như trước khi có cache
+            response = await http_clients.for_url(url).get(url)
+            if response.status_code != 200:
+                raise BlobCacheError(
+                    f"Không thể tải file từ URL: {url}, status: {response.status_code}",
+                    status_code=response.status_code,
+                )
+            return response.content
+        try:
+            return await disk_executor.run(self.read_bytes, entry)
+        except FileNotFoundError:
+            # File bị worker khác evict giữa chừng
+            self._drop(entry.key)
+            entry = await self.fetch(url)
+            return await disk_executor.run(self.read_bytes, entry)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._hits + self._revalidated + self._misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+            "slot": self._slot_dir,
+            "hits": self._hits,
+            "revalidated": self._revalidated,
+            "misses": self._misses,
+            "hit_rate": round((self._hits + self._revalidated) / lookups, 4)
+            if lookups
+            else 0.0,
+            "evictions": self._evictions,
+            "bytes_from_cache": self._bytes_from_cache,
+            "bytes_downloaded": self._bytes_downloaded,
+        }
+
+
+def _remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+blob_cache = BlobCache(
+    directory=settings.BLOB_CACHE_DIR,
+    max_bytes=settings.BLOB_CACHE_MAX_BYTES,
+    fresh_seconds=settings.BLOB_CACHE_FRESH_SECONDS,
+    max_object_bytes=settings.BLOB_CACHE_MAX_OBJECT_BYTES,
+    workers=settings.WEB_CONCURRENCY,
+)
@@ -0,0 +1,95 @@
+import logging
+from functools import cached_property
+
+from google.cloud import storage
+from openai import AsyncOpenAI
+
+from core.config import settings
+from core.http_clients import http_clients
+
+logger = logging.getLogger(__name__)
+
+
+class ClientContainer:
+    """
+    Các client dùng chung của ứng dụng (GCS, OpenAI, service...), chỉ được tạo
+    ở lần dùng đầu tiên rồi giữ lại cho các request sau; lifespan gọi close()
+    khi tắt ứng dụng.
+    """
+
+    @cached_property
+    def gcs(self) -> storage.Client:
+        if settings.GCS_CREDENTIALS_PATH:
+            return storage.Client.from_service_account_json(
+                settings.GCS_CREDENTIALS_PATH
+            )
+        return storage.Client()
+
+    @cached_property
+    def image_storage(self):
+        from core.google_cloud import ImageStorage
+
+        return ImageStorage(bucket_name=settings.GCS_BUCKET_NAME, client=self.gcs)
+
+    @cached_property
+    def video_storage(self):
+        from core.google_cloud import VideoStorage
+
+        return VideoStorage(bucket_name=settings.GCS_BUCKET_NAME, client=self.gcs)
+
+    @cached_property
+    def openai(self) -> AsyncOpenAI:
+        return AsyncOpenAI(
+            api_key=settings.OPENAI_API_KEY, http_client=http_clients.get("openai")
+        )
+
+    @cached_property
+    def image_service(self):
+        from api.v1.services.image import ImageService
+
+        return ImageService(
+            openai_api_key=settings.OPENAI_API_KEY,
+            bucket_name=settings.GCS_BUCKET_NAME,
+            credentials_path=settings.GCS_CREDENTIALS_PATH,
+            image_storage=self.image_storage,
+            client=self.openai,
+        )
+
+    @cached_property
+    def leonardo_service(self):
+        from api.v1.services.leonardo import LeonardoService
+
+        return LeonardoService(api_key=settings.LEONARDO_API_KEY)
+
+    def close(self) -> None:
+        gcs = self.__dict__.get("gcs")
+        if gcs is not None:
+            try:
+                gcs.close()
+            except Exception as e:
+                logger.warning(f"Đóng GCS client thất bại: {str(e)}")
+        # AsyncOpenAI dùng http client của registry, được đóng cùng http_clients
+        self.__dict__.clear()
+
+
+clients = ClientContainer()
+
+
+def get_image_storage():
+    return clients.image_storage
+
+
+def get_video_storage():
+    return clients.video_storage
+
+
+def get_openai_client() -> AsyncOpenAI:
+    return clients.openai
+
+
+def get_image_service():
+    return clients.image_service
+
+
+def get_leonardo_service():
+    return clients.leonardo_service
@@ -1,5 +1,6 @@
 from dotenv import load_dotenv
 import os
+from typing import Optional
 from pydantic_settings import BaseSettings
 
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../"))
@@ -25,6 +26,79 @@ class Settings(BaseSettings):
     FAL_KEY: str = os.getenv("FAL_KEY")
     LEONARDO_API_URL: str = "https://cloud.leonardo.ai/api/rest/v1"
     LEONARDO_API_KEY: str = os.getenv("LEONARDO_API_KEY")
+    GCS_IO_MAX_WORKERS: int = 16
+    GCS_UPLOAD_CHUNK_SIZE: int = 8 * 1024 * 1024  # bội số của 256 KiB
+    VIDEO_INGEST_CHUNK_SIZE: int = 1024 * 1024
+    VIDEO_INGEST_MAX_BUFFERED_CHUNKS: int = 16
+    BLOB_CACHE_DIR: str = os.path.join(BASE_DIR, ".blob_cache")
+    BLOB_CACHE_MAX_BYTES: int = 2 * 1024 * 1024 * 1024
+    BLOB_CACHE_MAX_OBJECT_BYTES: int = 50 * 1024 * 1024
+    BLOB_CACHE_FRESH_SECONDS: int = 3600
+    # Số worker uvicorn (uvicorn cũng đọc biến này cho --workers); dùng để chia
+    # BLOB_CACHE_MAX_BYTES cho từng worker
+    WEB_CONCURRENCY: int = 1
+    GCS_DELIVERY_MODE: str = "public"  # public | signed
+    GCS_SIGNED_URL_TTL: int = 3600
+    GCS_SIGNED_URL_MIN_REMAINING: int = 600
+    HTTP2_ENABLED: bool = False
+    VIDEO_JOB_CACHE_TTL: int = 300
+    VIDEO_JOB_ACTIVE_TTL: float = 2.0
+    VIDEO_JOB_CACHE_MAX_ENTRIES: int = 10000
+    VIDEO_JOB_FLUSH_INTERVAL: float = 1.0
+    VIDEO_JOB_HEARTBEAT_INTERVAL: float = 30.0
+    VIDEO_JOB_STALE_AFTER: float = 120.0
+    VIDEO_JOB_RESCAN_INTERVAL: float = 60.0
+    VIDEO_MAX_IN_FLIGHT: int = 4
+    VIDEO_JOB_ESTIMATED_SECONDS: float = 180.0
+    JOB_WATCH_INTERVAL: float = 5.0
+    SSE_KEEPALIVE_SECONDS: float = 15.0
+    SSE_TOKEN_TTL: int = 60
+    POLLER_MIN_INTERVAL: float = 2.0
+    POLLER_MAX_INTERVAL: float = 30.0
+    POLLER_TICK: float = 0.5
+    POLLER_CONCURRENCY: int = 8
+    POLLER_IDLE_TIMEOUT: float = 600.0
+    # Lỗi poll chỉ làm fail job khi provider không trả lời suốt khoảng này
+    POLLER_GIVE_UP_AFTER: float = 6 * 3600.0
+    # URL công khai của backend; để trống thì không đăng ký webhook với fal
+    PUBLIC_BASE_URL: Optional[str] = os.getenv("PUBLIC_BASE_URL")
+    WEBHOOK_SECRET: Optional[str] = os.getenv("WEBHOOK_SECRET")
+    LEONARDO_WEBHOOK_SECRET: Optional[str] = os.getenv("LEONARDO_WEBHOOK_SECRET")
+    WEBHOOK_FALLBACK_AFTER: float = 1800.0
+    # Chu kỳ đọc trạng thái job (webhook, URL đã lưu) worker khác ghi vào provider_jobs
+    WEBHOOK_SYNC_INTERVAL: float = 3.0
+    PROVIDER_JOB_RETENTION: float = 7 * 24 * 3600.0
+    ARCHIVE_CONCURRENCY: int = 4
+    ARCHIVE_QUEUE_SIZE: int = 1000
+    ARCHIVE_MAX_ATTEMPTS: int = 5
+    ARCHIVE_RETRY_DELAY: float = 10.0
+    ARCHIVE_RESCAN_INTERVAL: float = 300.0
+    # Cache user đã xác thực theo token; thay đổi ở worker khác thấy sau tối đa TTL
+    AUTH_CACHE_TTL: float = 60.0
+    AUTH_CACHE_MAX_ENTRIES: int = 10000
+    PASSWORD_HASH_MAX_WORKERS: int = 4
+    IMAGE_COUNTER_RECONCILE_INTERVAL: float = 6 * 3600.0
+    IMAGE_COUNTER_RECONCILE_BATCH: int = 500
+    GCS_PURGE_INTERVAL: float = 5.0
+    GCS_PURGE_BATCH_SIZE: int = 500
+    GCS_PURGE_LEASE_SECONDS: float = 300.0
+    GCS_PURGE_MAX_BACKOFF: float = 3600.0
+    # Đối soát bucket với DB; mặc định chỉ báo cáo, bật GCS_RECONCILE_DELETE để xóa
+    GCS_RECONCILE_INTERVAL: float = 24 * 3600.0
+    GCS_RECONCILE_GRACE_PERIOD: float = 3600.0
+    GCS_RECONCILE_PAGE_SIZE: int = 1000
+    GCS_RECONCILE_PAGES_PER_SECOND: float = 5.0
+    GCS_RECONCILE_BATCH_SIZE: int = 500
+    GCS_RECONCILE_MAX_DELETES: int = 10000
+    # Chỉ bật sau khi đã dời object không có bản ghi do bản cũ ghi vào
+    # images_generated/ và videos_generated/ (upload, ảnh edit) sang prefix riêng
+    GCS_RECONCILE_DELETE: bool = False
+    # WebSocket SAM2: số lời gọi song song mỗi kết nối, thời gian gộp các click update_prompt
+    SEGMENT_MAX_CONCURRENCY: int = 4
+    SEGMENT_PROMPT_DEBOUNCE: float = 0.15
+    SEGMENT_CACHE_TTL: float = 3600.0
+    SEGMENT_CACHE_MAX_ENTRIES: int = 5000
+    SEGMENT_STAGE_IMAGES: bool = True
 
     class Config:
         env_file = os.path.join(BASE_DIR, ".env")  # Path to the .env file
@@ -0,0 +1,141 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+EventKey = Tuple[str, str]
+Watcher = Callable[[str], Awaitable[None]]
+
+
+class Subscription:
+    """Hàng đợi sự kiện của một subscriber; chỉ giữ trạng thái mới nhất."""
+
+    def __init__(self, bus: "JobEventBus", key: EventKey):
+        self.bus = bus
+        self.key = key
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+
+    def put(self, event: Dict[str, Any]) -> None:
+        # Subscriber chậm chỉ cần trạng thái cuối cùng, bỏ bản cũ chưa đọc
+        if self._queue.full():
+            self._queue.get_nowait()
+        self._queue.put_nowait(event)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self) -> None:
+        self.bus.unsubscribe(self)
+
+
+class JobEventBus:
+    """
+    Pub/sub trạng thái job (video, leonardo, variation) trong một process.
+
+    Mỗi (topic, id) giữ lại sự kiện cuối cùng để subscriber đến sau nhận ngay
+    trạng thái hiện tại. Topic có thể đăng ký watcher: một task được chạy khi
+    id có subscriber đầu tiên và bị hủy khi subscriber cuối cùng rời đi.
+    """
+
+    def __init__(self, max_retained: int = 10000):
+        self.max_retained = max_retained
+        self._subscribers: Dict[EventKey, Set[Subscription]] = {}
+        self._last: "OrderedDict[EventKey, Dict[str, Any]]" = OrderedDict()
+        self._watchers: Dict[str, Watcher] = {}
+        self._watch_tasks: Dict[EventKey, asyncio.Task] = {}
+
+        self._published = 0
+        self._delivered = 0
+
+    def register_watcher(self, topic: str, watcher: Watcher) -> None:
+        self._watchers[topic] = watcher
+
+    def subscribe(self, topic: str, job_id: str) -> Subscription:
+        key = (topic, job_id)
+        subscription = Subscription(self, key)
+        self._subscribers.setdefault(key, set()).add(subscription)
+
+        last = self._last.get(key)
+        if last is not None:
+            subscription.put(last)
+        if not (last and last.get("final")):
+            self._start_watcher(key)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        key = subscription.key
+        subscribers = self._subscribers.get(key)
+        if subscribers is None:
+            return
+        subscribers.discard(subscription)
+        if not subscribers:
+            del self._subscribers[key]
+            task = self._watch_tasks.pop(key, None)
+            if task is not None:
+                task.cancel()
+
+    def publish(
+        self, topic: str, job_id: str, event: Dict[str, Any], final: bool = False
+    ) -> None:
+        """Gửi trạng thái mới; bỏ qua nếu giống hệt trạng thái trước đó."""
+        key = (topic, job_id)
+        event = {**event, "topic": topic, "id": job_id, "final": final}
+        if self._last.get(key) == event:
+            return
+
+        self._last[key] = event
+        self._last.move_to_end(key)
+        while len(self._last) > self.max_retained:
+            self._last.popitem(last=False)
+
+        self._published += 1
+        for subscription in self._subscribers.get(key, ()):
+            subscription.put(event)
+            self._delivered += 1
+
+    def has_subscribers(self, topic: Optional[str], job_id: str) -> bool:
+        return (topic, job_id) in self._subscribers
+
+    def last(self, topic: str, job_id: str) -> Optional[Dict[str, Any]]:
+        return self._last.get((topic, job_id))
+
+    def _start_watcher(self, key: EventKey) -> None:
+        watcher = self._watchers.get(key[0])
+        if watcher is None or key in self._watch_tasks:
+            return
+
+        task = asyncio.create_task(watcher(key[1]))
+        self._watch_tasks[key] = task
+
+        def done(task: asyncio.Task):
+            if self._watch_tasks.get(key) is task:
+                del self._watch_tasks[key]
+            if not task.cancelled() and task.exception() is not None:
+                logger.error(f"Watcher {key} lỗi: {str(task.exception())}")
+
+        task.add_done_callback(done)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "subscriptions": sum(len(s) for s in self._subscribers.values()),
+            "watched_ids": len(self._subscribers),
+            "watchers": len(self._watch_tasks),
+            "retained": len(self._last),
+            "published": self._published,
+            "delivered": self._delivered,
+        }
+
+    async def aclose(self) -> None:
+        tasks = list(self._watch_tasks.values())
+        self._watch_tasks.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+job_events = JobEventBus()
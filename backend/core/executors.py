@@ -0,0 +1,103 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class BoundedExecutor:
+    """
+    Thread pool có giới hạn để chạy các lời gọi blocking (SDK đồng bộ, I/O đĩa...)
+    ngoài event loop, kèm số liệu về hàng đợi và thời gian chạy.
+    """
+
+    def __init__(self, name: str, max_workers: int):
+        self.name = name
+        self.max_workers = max_workers
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._semaphore = asyncio.Semaphore(max_workers)
+
+        self._waiting = 0
+        self._max_waiting = 0
+        self._in_flight = 0
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._total_run = 0.0
+
+        executors[name] = self
+
+    @property
+    def pool(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix=self.name
+            )
+        return self._pool
+
+    async def run(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Chạy func(*args, **kwargs) trong pool, chờ nếu pool đang đầy."""
+        loop = asyncio.get_running_loop()
+
+        self._submitted += 1
+        self._waiting += 1
+        self._max_waiting = max(self._max_waiting, self._waiting)
+        queued_at = time.perf_counter()
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._waiting -= 1
+
+        started_at = time.perf_counter()
+        wait_time = started_at - queued_at
+        self._total_wait += wait_time
+        self._max_wait = max(self._max_wait, wait_time)
+        self._in_flight += 1
+        try:
+            return await loop.run_in_executor(
+                self.pool, partial(func, *args, **kwargs)
+            )
+        except BaseException:
+            self._failed += 1
+            raise
+        finally:
+            self._in_flight -= 1
+            self._completed += 1
+            self._total_run += time.perf_counter() - started_at
+            self._semaphore.release()
+
+    def stats(self) -> Dict[str, Any]:
+        completed = self._completed or 1
+        return {
+            "max_workers": self.max_workers,
+            "in_flight": self._in_flight,
+            "queue_depth": self._waiting,
+            "max_queue_depth": self._max_waiting,
+            "submitted": self._submitted,
+            "completed": self._completed,
+            "failed": self._failed,
+            "avg_wait_ms": round(self._total_wait / completed * 1000, 2),
+            "max_wait_ms": round(self._max_wait * 1000, 2),
+            "avg_run_ms": round(self._total_run / completed * 1000, 2),
+        }
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+executors: Dict[str, BoundedExecutor] = {}
+
+
+def executor_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: executor.stats() for name, executor in executors.items()}
+
+
+def shutdown_executors() -> None:
+    for executor in executors.values():
+        executor.shutdown()
@@ -1,24 +1,301 @@
 from datetime import datetime, timedelta
+import logging
 import mimetypes
 from google.cloud import storage
+from google.cloud.storage.batch import Batch
 from fastapi import UploadFile
-from typing import List, Optional, Dict
+from typing import (
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    List,
+    Optional,
+    Dict,
+    Tuple,
+    Union,
+)
+from collections import OrderedDict
+import base64
+import inspect
 import os
+import time
 import uuid
-import aiohttp
 import asyncio
+import httpx
+import google_crc32c
+
+from core.blob_cache import blob_cache
+from core.config import settings
+from core.executors import BoundedExecutor
+from core.http_clients import http_clients
+
+# Mọi lời gọi SDK google-cloud-storage (đồng bộ) đều chạy qua pool này
+# để không chặn event loop của uvicorn.
+gcs_executor = BoundedExecutor("gcs", max_workers=settings.GCS_IO_MAX_WORKERS)
+
+
+ProgressCallback = Callable[[int, Optional[int]], Union[None, Awaitable[None]]]
+
+
+async def _report_progress(
+    progress_callback: Optional[ProgressCallback], done: int, total: Optional[int]
+) -> None:
+    if progress_callback is None:
+        return
+    result = progress_callback(done, total)
+    if inspect.isawaitable(result):
+        await result
+
+
+async def iter_upload_file(
+    file: UploadFile, chunk_size: int = settings.GCS_UPLOAD_CHUNK_SIZE
+) -> AsyncIterator[bytes]:
+    """Đọc UploadFile theo từng chunk thay vì đọc toàn bộ vào bộ nhớ."""
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+async def pipe_chunks(
+    source: AsyncIterator[bytes], max_buffered_chunks: int
+) -> AsyncIterator[bytes]:
+    """
+    Đọc source trong một task riêng và trả lại các chunk qua hàng đợi có giới hạn.
+
+    Nhờ vậy việc đọc (vd: tải từ URL) vẫn tiếp tục trong lúc bên tiêu thụ đang
+    upload; khi hàng đợi đầy, task đọc sẽ dừng chờ (backpressure).
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max_buffered_chunks)
+    done = object()
+
+    async def produce():
+        try:
+            async for chunk in source:
+                await queue.put(chunk)
+            await queue.put(done)
+        except Exception as e:
+            await queue.put(e)
+        finally:
+            # Bị hủy giữa chừng (upload lỗi): đóng source để trả response/kết nối
+            aclose = getattr(source, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            item = await queue.get()
+            if item is done:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        producer.cancel()
+        await asyncio.gather(producer, return_exceptions=True)
+
+
+async def upload_stream_to_blob(
+    blob: storage.Blob,
+    chunks: AsyncIterator[bytes],
+    content_type: str,
+    chunk_size: int = settings.GCS_UPLOAD_CHUNK_SIZE,
+    total_size: Optional[int] = None,
+    progress_callback: Optional[ProgressCallback] = None,
+) -> Dict:
+    """
+    Ghi một luồng bytes vào blob qua một phiên resumable upload.
+
+    Mỗi chunk được gửi lên GCS ngay khi bộ đệm đủ chunk_size (bội số của 256 KiB),
+    CRC32C được tính dần trên từng chunk và đối chiếu với giá trị GCS trả về
+    sau khi hoàn tất. progress_callback (nếu có) được gọi sau mỗi lần ghi với
+    (số bytes đã gửi, total_size).
+
+    Returns:
+        Dict gồm size, crc32c (base64) và generation của object
+    """
+    checksum = google_crc32c.Checksum()
+    size = 0
+    buffer = bytearray()
+    writer = blob.open(
+        "wb", chunk_size=chunk_size, content_type=content_type, ignore_flush=True
+    )
+
+    try:
+        async for chunk in chunks:
+            if not chunk:
+                continue
+            checksum.update(chunk)
+            size += len(chunk)
+            buffer.extend(chunk)
+
+            # Gom đủ chunk_size rồi mới chuyển sang thread, tránh đổi luồng
+            # cho từng mảnh nhỏ của request body
+            if len(buffer) >= chunk_size:
+                await gcs_executor.run(writer.write, bytes(buffer))
+                buffer.clear()
+                await _report_progress(progress_callback, size, total_size)
+
+        if buffer:
+            await gcs_executor.run(writer.write, bytes(buffer))
+            buffer.clear()
+        await gcs_executor.run(writer.close)
+        await _report_progress(progress_callback, size, total_size)
+    except BaseException:
+        try:
+            await gcs_executor.run(writer.terminate)
+        except Exception:
+            pass
+        raise
+
+    crc32c = base64.b64encode(checksum.digest()).decode("utf-8")
+    await gcs_executor.run(blob.reload)
+    if blob.crc32c != crc32c:
+        await gcs_executor.run(blob.delete)
+        raise IOError(
+            f"CRC32C không khớp khi upload {blob.name}: {crc32c} != {blob.crc32c}"
+        )
+
+    return {"size": size, "crc32c": crc32c, "generation": blob.generation}
+
+
+class SignedUrlCache:
+    """
+    Cache các V4 signed URL đã ký trong process để không phải ký RSA lại
+    cho mỗi request. Một URL được dùng lại khi còn ít nhất min_remaining giây,
+    hoặc nửa thời hạn mà caller yêu cầu nếu thời hạn đó ngắn hơn.
+    """
+
+    def __init__(self, max_entries: int, min_remaining: int):
+        self.max_entries = max_entries
+        self.min_remaining = min_remaining
+        self._entries: "OrderedDict[Tuple, Tuple[str, float]]" = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, key: Tuple, expiration: float) -> Optional[str]:
+        cached = self._entries.get(key)
+        remaining = cached[1] - time.time() if cached else 0
+        # URL ký với thời hạn ngắn không bao giờ còn đủ min_remaining giây
+        if cached and remaining >= min(self.min_remaining, expiration / 2):
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return cached[0]
+        self._misses += 1
+        return None
+
+    def put(self, key: Tuple, url: str, expires_at: float) -> None:
+        self._entries[key] = (url, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict:
+        lookups = self._hits + self._misses
+        return {
+            "entries": len(self._entries),
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+signed_url_cache = SignedUrlCache(
+    max_entries=10000, min_remaining=settings.GCS_SIGNED_URL_MIN_REMAINING
+)
+
+
+def _signed_url_key(
+    bucket_name: str,
+    path: str,
+    method: str,
+    response_disposition: Optional[str],
+    expiration: int,
+) -> Tuple:
+    return (bucket_name, path, method, response_disposition, expiration)
+
+
+async def sign_blob_urls(
+    bucket: storage.Bucket,
+    paths: List[str],
+    expiration: int = settings.GCS_SIGNED_URL_TTL,
+    method: str = "GET",
+    response_disposition: Optional[str] = None,
+) -> Dict[str, str]:
+    """
+    Tạo V4 signed URL cho nhiều object một lúc. URL còn hạn lấy từ cache,
+    các URL còn thiếu được ký chung trong một lần chạy trên executor.
+    """
+    urls = {}
+    missing = []
+    for path in dict.fromkeys(paths):
+        key = _signed_url_key(
+            bucket.name, path, method, response_disposition, expiration
+        )
+        url = signed_url_cache.get(key, expiration)
+        if url:
+            urls[path] = url
+        else:
+            missing.append(path)
+
+    if missing:
+
+        def sign_all():
+            expires_at = time.time() + expiration
+            signed = {}
+            for path in missing:
+                signed[path] = bucket.blob(path).generate_signed_url(
+                    version="v4",
+                    expiration=timedelta(seconds=expiration),
+                    method=method,
+                    response_disposition=response_disposition,
+                )
+            return signed, expires_at
+
+        signed, expires_at = await gcs_executor.run(sign_all)
+        for path, url in signed.items():
+            signed_url_cache.put(
+                _signed_url_key(
+                    bucket.name, path, method, response_disposition, expiration
+                ),
+                url,
+                expires_at,
+            )
+        urls.update(signed)
+
+    return urls
+
+
+class _RecordingBatch(Batch):
+    """Batch giữ lại danh sách response mà finish() trả về khi thoát khối with."""
+
+    responses: List
+
+    def finish(self, raise_exception: bool = True) -> List:
+        self.responses = super().finish(raise_exception=raise_exception)
+        return self.responses
 
 
 class ImageStorage:
-    def __init__(self, bucket_name: str, credentials_path: Optional[str] = None):
+    def __init__(
+        self,
+        bucket_name: str,
+        credentials_path: Optional[str] = None,
+        client: Optional[storage.Client] = None,
+    ):
         """
         Khởi tạo kết nối đến Google Cloud Storage
 
         Args:
             bucket_name: Tên của bucket GCS
             credentials_path: Đường dẫn đến file credentials JSON (tùy chọn)
+            client: storage.Client dùng chung (bỏ qua credentials_path nếu có)
         """
-        if credentials_path:
+        if client is not None:
+            self.client = client
+        elif credentials_path:
             self.client = storage.Client.from_service_account_json(credentials_path)
         else:
             self.client = storage.Client()
@@ -62,7 +339,8 @@ class ImageStorage:
         blob = self.bucket.blob(full_path)
         content = await file.read()
 
-        blob.upload_from_string(
+        await gcs_executor.run(
+            blob.upload_from_string,
             content,
             content_type=file.content_type,
         )
@@ -76,7 +354,61 @@ class ImageStorage:
             "public_url": blob.public_url,
         }
 
-    def delete_image(self, image_path: str) -> bool:
+    async def save_image_from_url(
+        self,
+        image_url: str,
+        folder: str = "images_generated",
+        custom_filename: Optional[str] = None,
+        timeout: int = 60,
+    ) -> Dict:
+        """
+        Tải ảnh từ URL (vd: CDN của provider) và ghi thẳng vào GCS theo từng
+        chunk, không giữ cả file trong bộ nhớ.
+        """
+        client = http_clients.for_url(image_url)
+        async with client.stream(
+            "GET", image_url, timeout=httpx.Timeout(timeout)
+        ) as response:
+            if response.status_code != 200:
+                raise ValueError(
+                    f"Không thể tải ảnh từ URL: {image_url}, status: {response.status_code}"
+                )
+
+            content_type = response.headers.get("content-type", "").split(";")[0]
+            if not content_type.startswith("image/"):
+                content_type = mimetypes.guess_type(image_url.split("?")[0])[0] or ""
+            if not content_type.startswith("image/"):
+                raise ValueError(f"URL không phải ảnh: {image_url}")
+
+            if custom_filename:
+                filename = custom_filename
+            else:
+                ext = os.path.splitext(image_url.split("?")[0])[1].lower()
+                if not ext:
+                    ext = mimetypes.guess_extension(content_type) or ".jpg"
+                filename = f"{uuid.uuid4()}{ext}"
+
+            full_path = f"{folder}/{filename}".lstrip("/")
+            blob = self.bucket.blob(full_path)
+            blob.cache_control = "public, max-age=86400"
+
+            chunks = pipe_chunks(
+                response.aiter_bytes(settings.VIDEO_INGEST_CHUNK_SIZE),
+                max_buffered_chunks=settings.VIDEO_INGEST_MAX_BUFFERED_CHUNKS,
+            )
+            upload_info = await upload_stream_to_blob(blob, chunks, content_type)
+
+        return {
+            "filename": filename,
+            "path": full_path,
+            "size": upload_info["size"],
+            "content_type": content_type,
+            "url": f"{self.base_url}{full_path}",
+            "public_url": blob.public_url,
+            "source_url": image_url,
+        }
+
+    async def delete_image(self, image_path: str) -> bool:
         """
         Xóa ảnh từ Google Cloud Storage
 
@@ -87,12 +419,74 @@ class ImageStorage:
             True nếu xóa thành công, False nếu không tìm thấy hoặc xóa thất bại
         """
         blob = self.bucket.blob(image_path)
+        blob_cache.invalidate(f"{self.base_url}{image_path}")
         try:
-            blob.delete()
+            await gcs_executor.run(blob.delete)
             return True
         except Exception:
             return False
 
+    async def delete_images(
+        self, image_paths: List[str], batch_size: int = 100
+    ) -> List[str]:
+        """
+        Xóa nhiều ảnh: mỗi batch_size object được gửi trong một batch request
+        của GCS, các batch chạy song song trong gcs_executor.
+
+        Returns:
+            Các path xóa thất bại (object không tồn tại được coi là đã xóa)
+        """
+        for image_path in image_paths:
+            blob_cache.invalidate(f"{self.base_url}{image_path}")
+
+        def delete_batch(paths: List[str]) -> List[str]:
+            try:
+                # raise_exception=False: lỗi từng object nằm trong response
+                batch = _RecordingBatch(self.client, raise_exception=False)
+                with batch:
+                    for path in paths:
+                        self.bucket.delete_blob(path)
+            except Exception:
+                return list(paths)
+            return [
+                path
+                for path, response in zip(paths, batch.responses)
+                if response.status_code not in (200, 204, 404)
+            ]
+
+        batches = [
+            image_paths[i : i + batch_size]
+            for i in range(0, len(image_paths), batch_size)
+        ]
+        results = await asyncio.gather(
+            *(gcs_executor.run(delete_batch, paths) for paths in batches)
+        )
+        return [path for failed in results for path in failed]
+
+    async def generate_signed_url(
+        self,
+        image_path: str,
+        expiration: int = settings.GCS_SIGNED_URL_TTL,
+        response_disposition: Optional[str] = None,
+    ) -> str:
+        urls = await sign_blob_urls(
+            self.bucket,
+            [image_path],
+            expiration=expiration,
+            response_disposition=response_disposition,
+        )
+        return urls[image_path]
+
+    async def generate_signed_urls(self, image_paths: List[str]) -> Dict[str, str]:
+        """Ký hàng loạt, dùng cho cả một trang lịch sử."""
+        return await sign_blob_urls(self.bucket, image_paths)
+
+    async def delivery_url(self, image_path: str) -> str:
+        """URL trả cho client: signed URL nếu GCS_DELIVERY_MODE=signed, ngược lại URL công khai."""
+        if settings.GCS_DELIVERY_MODE == "signed":
+            return await self.generate_signed_url(image_path)
+        return self.bucket.blob(image_path).public_url
+
     def make_bucket_public(self) -> bool:
         """
         Thiết lập toàn bộ bucket cho phép đọc công khai
@@ -110,8 +504,15 @@ class ImageStorage:
 
 
 class VideoStorage:
-    def __init__(self, bucket_name: str, credentials_path: Optional[str] = None):
-        if credentials_path:
+    def __init__(
+        self,
+        bucket_name: str,
+        credentials_path: Optional[str] = None,
+        client: Optional[storage.Client] = None,
+    ):
+        if client is not None:
+            self.client = client
+        elif credentials_path:
             self.client = storage.Client.from_service_account_json(credentials_path)
         else:
             self.client = storage.Client()
@@ -119,6 +520,7 @@ class VideoStorage:
         self.bucket_name = bucket_name
         self.bucket = self.client.bucket(bucket_name)
         self.base_url = f"https://storage.googleapis.com/{bucket_name}/"
+        self.logger = logging.getLogger(__name__)
 
         self.allowed_video_types = [
             "video/mp4",
@@ -138,10 +540,34 @@ class VideoStorage:
         custom_filename: Optional[str] = None,
         metadata: Optional[Dict] = None,
     ) -> Dict:
-        content_type = file.content_type
+        return await self.upload_video_stream(
+            chunks=iter_upload_file(file),
+            original_filename=file.filename,
+            content_type=file.content_type,
+            folder=folder,
+            custom_filename=custom_filename,
+            metadata=metadata,
+        )
 
+    async def upload_video_stream(
+        self,
+        chunks: AsyncIterator[bytes],
+        original_filename: Optional[str] = None,
+        content_type: Optional[str] = None,
+        folder: str = "videos_generated",
+        custom_filename: Optional[str] = None,
+        metadata: Optional[Dict] = None,
+    ) -> Dict:
+        """
+        Upload video từ một luồng bytes bằng resumable upload của GCS.
+        Bộ nhớ dùng cho mỗi upload chỉ khoảng một chunk, không phụ thuộc kích thước file.
+        """
         if not content_type or content_type == "application/octet-stream":
-            guessed_type = mimetypes.guess_type(file.filename)[0]
+            guessed_type = (
+                mimetypes.guess_type(original_filename)[0]
+                if original_filename
+                else None
+            )
             if guessed_type:
                 content_type = guessed_type
             else:
@@ -157,7 +583,9 @@ class VideoStorage:
             filename = custom_filename
         else:
             file_extension = (
-                os.path.splitext(file.filename)[1].lower() if file.filename else ".mp4"
+                os.path.splitext(original_filename)[1].lower()
+                if original_filename
+                else ""
             )
             if not file_extension:
                 file_extension = self._get_extension_from_content_type(content_type)
@@ -166,13 +594,11 @@ class VideoStorage:
         folder = folder.rstrip("/")
         full_path = f"{folder}/{filename}"
 
-        content = await file.read()
-
         video_metadata = {
             "content-type": content_type,
             "cache-control": "public, max-age=86400",
             "uploaded-at": datetime.now().isoformat(),
-            "original-filename": file.filename,
+            "original-filename": original_filename,
         }
 
         if metadata:
@@ -182,12 +608,9 @@ class VideoStorage:
         blob.metadata = video_metadata
 
         try:
-            blob.upload_from_string(
-                content,
-                content_type=content_type,
-            )
+            upload_info = await upload_stream_to_blob(blob, chunks, content_type)
             self.logger.info(
-                f"Đã upload video: {full_path}, kích thước: {len(content)} bytes"
+                f"Đã upload video: {full_path}, kích thước: {upload_info['size']} bytes"
             )
         except Exception as e:
             self.logger.error(f"Lỗi khi upload video: {str(e)}")
@@ -196,7 +619,8 @@ class VideoStorage:
         return {
             "filename": filename,
             "path": full_path,
-            "size": len(content),
+            "size": upload_info["size"],
+            "crc32c": upload_info["crc32c"],
             "content_type": content_type,
             "url": f"{self.base_url}{full_path}",
             "public_url": blob.public_url,
@@ -211,73 +635,92 @@ class VideoStorage:
         custom_filename: Optional[str] = None,
         metadata: Optional[Dict] = None,
         timeout: int = 60,
+        progress_callback: Optional[ProgressCallback] = None,
     ) -> Dict:
+        """
+        Tải video từ URL và đẩy thẳng vào GCS trong lúc đang tải: các chunk của
+        response được chuyển qua một hàng đợi có giới hạn sang resumable upload,
+        nên bộ nhớ chỉ tốn O(chunk) và thời gian xấp xỉ max(tải về, upload).
+
+        Args:
+            timeout: Timeout kết nối / giữa hai lần đọc (giây), không giới hạn tổng thời gian
+            progress_callback: Hàm nhận (số bytes đã upload, tổng bytes nếu biết)
+        """
+        client = http_clients.for_url(video_url)
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(video_url, timeout=timeout) as response:
-                    if response.status != 200:
-                        error_msg = f"Không thể tải video từ URL: {video_url}, status: {response.status}"
-                        self.logger.error(error_msg)
-                        raise ValueError(error_msg)
-
-                    content = await response.read()
-                    content_type = response.headers.get("content-type")
-
-                    if not content_type or content_type == "application/octet-stream":
-                        content_type = mimetypes.guess_type(video_url)[0]
-
-                    if not content_type or content_type not in self.allowed_video_types:
-                        content_type = "video/mp4"
-        except asyncio.TimeoutError:
+            async with client.stream(
+                "GET", video_url, timeout=httpx.Timeout(timeout)
+            ) as response:
+                if response.status_code != 200:
+                    error_msg = f"Không thể tải video từ URL: {video_url}, status: {response.status_code}"
+                    self.logger.error(error_msg)
+                    raise ValueError(error_msg)
+
+                content_type = response.headers.get("content-type")
+
+                if not content_type or content_type == "application/octet-stream":
+                    content_type = mimetypes.guess_type(video_url)[0]
+
+                if not content_type or content_type not in self.allowed_video_types:
+                    content_type = "video/mp4"
+
+                if custom_filename:
+                    filename = custom_filename
+                else:
+                    ext = os.path.splitext(video_url.split("?")[0])[1]
+                    if not ext:
+                        ext = self._get_extension_from_content_type(content_type)
+
+                    filename = f"{uuid.uuid4()}{ext}"
+
+                folder = folder.rstrip("/")
+                full_path = f"{folder}/{filename}"
+
+                video_metadata = {
+                    "content-type": content_type,
+                    "cache-control": "public, max-age=86400",
+                    "source-url": video_url,
+                    "downloaded-at": datetime.now().isoformat(),
+                }
+
+                if metadata:
+                    video_metadata.update(metadata)
+
+                blob = self.bucket.blob(full_path)
+                blob.metadata = video_metadata
+
+                chunks = pipe_chunks(
+                    response.aiter_bytes(settings.VIDEO_INGEST_CHUNK_SIZE),
+                    max_buffered_chunks=settings.VIDEO_INGEST_MAX_BUFFERED_CHUNKS,
+                )
+                upload_info = await upload_stream_to_blob(
+                    blob,
+                    chunks,
+                    content_type,
+                    total_size=int(response.headers["content-length"])
+                    if "content-length" in response.headers
+                    else None,
+                    progress_callback=progress_callback,
+                )
+                self.logger.info(
+                    f"Đã lưu video từ URL: {video_url}, kích thước: {upload_info['size']} bytes"
+                )
+        except httpx.TimeoutException:
             error_msg = f"Timeout khi tải video từ URL: {video_url}"
             self.logger.error(error_msg)
             raise TimeoutError(error_msg)
-        except Exception as e:
-            error_msg = f"Lỗi khi tải video từ URL {video_url}: {str(e)}"
-            self.logger.error(error_msg)
+        except ValueError:
             raise
-
-        if custom_filename:
-            filename = custom_filename
-        else:
-            ext = os.path.splitext(video_url.split("?")[0])[1]
-            if not ext:
-                ext = self._get_extension_from_content_type(content_type)
-
-            filename = f"{uuid.uuid4()}{ext}"
-
-        folder = folder.rstrip("/")
-        full_path = f"{folder}/{filename}"
-
-        video_metadata = {
-            "content-type": content_type,
-            "cache-control": "public, max-age=86400",
-            "source-url": video_url,
-            "downloaded-at": datetime.now().isoformat(),
-        }
-
-        if metadata:
-            video_metadata.update(metadata)
-
-        blob = self.bucket.blob(full_path)
-        blob.metadata = video_metadata
-
-        try:
-            blob.upload_from_string(
-                content,
-                content_type=content_type,
-            )
-            self.logger.info(
-                f"Đã lưu video từ URL: {video_url}, kích thước: {len(content)} bytes"
-            )
         except Exception as e:
-            self.logger.error(f"Lỗi khi lưu video từ URL {video_url}: {str(e)}")
+            error_msg = f"Lỗi khi lưu video từ URL {video_url}: {str(e)}"
+            self.logger.error(error_msg)
             raise
 
         return {
             "filename": filename,
             "path": full_path,
-            "size": len(content),
+            "size": upload_info["size"],
+            "crc32c": upload_info["crc32c"],
             "content_type": content_type,
             "url": f"{self.base_url}{full_path}",
             "public_url": blob.public_url,
@@ -286,20 +729,21 @@ class VideoStorage:
             "download_time": datetime.now().isoformat(),
         }
 
-    def delete_video(self, video_path: str) -> bool:
+    async def delete_video(self, video_path: str) -> bool:
         blob = self.bucket.blob(video_path)
         try:
-            blob.delete()
+            await gcs_executor.run(blob.delete)
             self.logger.info(f"Đã xóa video: {video_path}")
             return True
         except Exception as e:
             self.logger.error(f"Lỗi khi xóa video {video_path}: {str(e)}")
             return False
 
-    def get_video_info(self, video_path: str) -> Optional[Dict]:
-        blob = self.bucket.blob(video_path)
+    async def get_video_info(self, video_path: str) -> Optional[Dict]:
         try:
-            if not blob.exists():
+            # get_blob tải luôn metadata (size, content_type...) trong một request
+            blob = await gcs_executor.run(self.bucket.get_blob, video_path)
+            if blob is None:
                 return None
 
             return {
@@ -316,7 +760,7 @@ class VideoStorage:
         except Exception:
             return None
 
-    def list_videos(
+    async def list_videos(
         self,
         folder: Optional[str] = None,
         prefix: Optional[str] = None,
@@ -326,9 +770,11 @@ class VideoStorage:
             folder = folder.rstrip("/")
             prefix = f"{folder}/"
 
-        blobs = list(
-            self.client.list_blobs(
-                self.bucket_name, prefix=prefix, max_results=max_results
+        blobs = await gcs_executor.run(
+            lambda: list(
+                self.client.list_blobs(
+                    self.bucket_name, prefix=prefix, max_results=max_results
+                )
             )
         )
 
@@ -357,20 +803,25 @@ class VideoStorage:
 
         return videos
 
-    def generate_signed_url(
+    async def generate_signed_url(
         self, video_path: str, expiration: int = 3600, method: str = "GET"
     ) -> Optional[str]:
         blob = self.bucket.blob(video_path)
         try:
-            if not blob.exists():
+            cached = signed_url_cache.get(
+                _signed_url_key(self.bucket_name, video_path, method, None, expiration),
+                expiration,
+            )
+            if cached:
+                return cached
+
+            if not await gcs_executor.run(blob.exists):
                 return None
 
-            url = blob.generate_signed_url(
-                version="v4",
-                expiration=timedelta(seconds=expiration),
-                method=method,
+            urls = await sign_blob_urls(
+                self.bucket, [video_path], expiration=expiration, method=method
             )
-            return url
+            return urls[video_path]
         except Exception as e:
             self.logger.error(f"Lỗi khi tạo signed URL cho {video_path}: {str(e)}")
             return None
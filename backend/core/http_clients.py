@@ -0,0 +1,205 @@
+import asyncio
+import importlib.util
+import logging
+import urllib.parse
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+
+import httpx
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ProviderConfig:
+    name: str
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 60.0
+    timeout: float = 30.0
+    follow_redirects: bool = True
+    # URL dùng để mở sẵn kết nối (DNS + TCP + TLS) khi khởi động
+    warmup_url: Optional[str] = None
+    hosts: tuple = ()
+
+
+@dataclass
+class PoolStats:
+    requests: int = 0
+    errors: int = 0
+    in_flight: int = 0
+    peak_in_flight: int = 0
+
+
+class _TrackedStream(httpx.AsyncByteStream):
+    """Bọc body của response để biết khi nào kết nối được trả lại pool."""
+
+    def __init__(self, stream: httpx.AsyncByteStream, on_close: Callable[[], None]):
+        self._stream = stream
+        self._on_close = on_close
+        self._closed = False
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            if not self._closed:
+                self._closed = True
+                self._on_close()
+
+
+class InstrumentedTransport(httpx.AsyncBaseTransport):
+    """Transport đếm số request đang giữ kết nối để tính mức sử dụng pool."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, stats: PoolStats):
+        self._transport = transport
+        self._stats = stats
+
+    def _release(self) -> None:
+        self._stats.in_flight -= 1
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        stats = self._stats
+        stats.requests += 1
+        stats.in_flight += 1
+        stats.peak_in_flight = max(stats.peak_in_flight, stats.in_flight)
+        try:
+            response = await self._transport.handle_async_request(request)
+        except BaseException:
+            stats.errors += 1
+            self._release()
+            raise
+
+        response.stream = _TrackedStream(response.stream, self._release)
+        return response
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+class HTTPClientRegistry:
+    """
+    Các httpx.AsyncClient dùng chung theo từng provider (keep-alive, giới hạn
+    kết nối riêng), được mở/đóng theo lifespan của ứng dụng.
+    """
+
+    def __init__(self, providers: Dict[str, ProviderConfig]):
+        self.providers = providers
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._stats: Dict[str, PoolStats] = {
+            name: PoolStats() for name in providers
+        }
+        self._http2 = settings.HTTP2_ENABLED and _h2_available()
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            client = self._create_client(self.providers[name])
+            self._clients[name] = client
+        return client
+
+    def for_url(self, url: str) -> httpx.AsyncClient:
+        """Chọn pool theo host của url, mặc định là pool 'fetch'."""
+        host = urllib.parse.urlsplit(url).hostname or ""
+        for name, config in self.providers.items():
+            if any(host == h or host.endswith(f".{h}") for h in config.hosts):
+                return self.get(name)
+        return self.get("fetch")
+
+    def _create_client(self, config: ProviderConfig) -> httpx.AsyncClient:
+        limits = httpx.Limits(
+            max_connections=config.max_connections,
+            max_keepalive_connections=config.max_keepalive_connections,
+            keepalive_expiry=config.keepalive_expiry,
+        )
+        transport = httpx.AsyncHTTPTransport(
+            limits=limits, http2=self._http2, retries=1
+        )
+        return httpx.AsyncClient(
+            transport=InstrumentedTransport(transport, self._stats[config.name]),
+            timeout=httpx.Timeout(config.timeout, connect=10.0),
+            follow_redirects=config.follow_redirects,
+        )
+
+    async def warm_up(self) -> None:
+        """Mở sẵn một kết nối tới mỗi provider; lỗi chỉ được ghi log."""
+
+        async def warm(config: ProviderConfig):
+            try:
+                await self.get(config.name).head(config.warmup_url, timeout=5.0)
+            except Exception as e:
+                logger.warning(f"Warm-up {config.name} thất bại: {str(e)}")
+
+        await asyncio.gather(
+            *(warm(c) for c in self.providers.values() if c.warmup_url)
+        )
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        result = {}
+        for name, config in self.providers.items():
+            stats = self._stats[name]
+            result[name] = {
+                "max_connections": config.max_connections,
+                "in_flight": stats.in_flight,
+                "peak_in_flight": stats.peak_in_flight,
+                "utilization": round(stats.in_flight / config.max_connections, 4),
+                "requests": stats.requests,
+                "errors": stats.errors,
+                "http2": self._http2,
+            }
+        return result
+
+    async def aclose(self) -> None:
+        clients = list(self._clients.values())
+        self._clients.clear()
+        await asyncio.gather(
+            *(client.aclose() for client in clients), return_exceptions=True
+        )
+
+
+def _h2_available() -> bool:
+    if importlib.util.find_spec("h2") is None:
+        logger.warning("HTTP2_ENABLED=true nhưng chưa cài gói h2, dùng HTTP/1.1")
+        return False
+    return True
+
+
+http_clients = HTTPClientRegistry(
+    {
+        "openai": ProviderConfig(
+            name="openai",
+            max_connections=50,
+            timeout=600.0,
+            warmup_url="https://api.openai.com/v1",
+            hosts=("api.openai.com",),
+        ),
+        "fal": ProviderConfig(
+            name="fal",
+            max_connections=50,
+            timeout=60.0,
+            warmup_url="https://v3.fal.media",
+            hosts=("fal.media", "fal.run", "fal.ai"),
+        ),
+        "leonardo": ProviderConfig(
+            name="leonardo",
+            max_connections=30,
+            timeout=60.0,
+            warmup_url=settings.LEONARDO_API_URL,
+            hosts=("cloud.leonardo.ai", "cdn.leonardo.ai"),
+        ),
+        "gcs": ProviderConfig(
+            name="gcs",
+            max_connections=100,
+            timeout=30.0,
+            warmup_url="https://storage.googleapis.com",
+            hosts=("storage.googleapis.com",),
+        ),
+        "fetch": ProviderConfig(name="fetch", max_connections=100, timeout=30.0),
+    }
+)
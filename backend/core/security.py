@@ -1,21 +1,37 @@
+import hashlib
+import hmac
 from datetime import datetime, timedelta, timezone
-from typing import Any
+from typing import Any, Optional
 
 from fastapi.security import HTTPBearer
 from jose import jwt, JWTError
 from passlib.context import CryptContext
 
 from core.config import settings
+from core.executors import BoundedExecutor
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security_auth = HTTPBearer()
 
+# bcrypt tốn ~250ms CPU mỗi lần; chạy trong pool riêng để login/register
+# không chặn event loop và không chiếm chỗ của các pool I/O khác
+password_executor = BoundedExecutor(
+    "password", max_workers=settings.PASSWORD_HASH_MAX_WORKERS
+)
+
 ALGORITHM = "HS256"
+# Token ngắn hạn cho EventSource (không gửi được header Authorization);
+# chỉ dùng được cho /events, không dùng thay access/refresh token
+EVENTS_TOKEN_SCOPE = "events"
 
 
-def create_token(subject: str, expires_delta: timedelta) -> str:
+def create_token(
+    subject: str, expires_delta: timedelta, scope: Optional[str] = None
+) -> str:
     expire = datetime.now(timezone.utc) + expires_delta
     to_encode = {"exp": expire, "sub": subject}
+    if scope is not None:
+        to_encode["scope"] = scope
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
@@ -28,6 +44,14 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await password_executor.run(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    return await password_executor.run(get_password_hash, password)
+
+
 def verify_token(token: str) -> str:
     try:
         payload = jwt.decode(
@@ -41,12 +65,55 @@ def verify_token(token: str) -> str:
         raise ValueError("Invalid token")
 
 
+def decode_token_str(token: str) -> dict:
+    """Giải mã và kiểm tra chữ ký/hạn của JWT, trả về payload."""
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[ALGORITHM])
+        if payload.get("sub") is None or payload.get("scope") is not None:
+            raise JWTError
+        return payload
+    except JWTError:
+        raise ValueError("Invalid token")
+
+
+def decode_events_token(token: str) -> dict:
+    """Payload của token do create_token(..., scope=EVENTS_TOKEN_SCOPE) tạo."""
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[ALGORITHM])
+        if payload.get("sub") is None or payload.get("scope") != EVENTS_TOKEN_SCOPE:
+            raise JWTError
+        return payload
+    except JWTError:
+        raise ValueError("Invalid token")
+
+
 def verify_token_str(token: str) -> str:
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
-        if email is None:
+        if email is None or payload.get("scope") is not None:
             raise JWTError
         return email
     except JWTError:
         raise ValueError("Invalid token")
+
+
+def create_webhook_token(job_id: str) -> str:
+    """Token HMAC gắn vào webhook URL của từng job."""
+    return hmac.new(
+        settings.WEBHOOK_SECRET.encode("utf-8"),
+        job_id.encode("utf-8"),
+        hashlib.sha256,
+    ).hexdigest()
+
+
+def verify_webhook_token(job_id: str, token: str) -> bool:
+    if not settings.WEBHOOK_SECRET or not token:
+        return False
+    return hmac.compare_digest(create_webhook_token(job_id), token)
+
+
+def verify_bearer_secret(authorization: str, secret: str) -> bool:
+    if not secret or not authorization:
+        return False
+    return hmac.compare_digest(authorization, f"Bearer {secret}")
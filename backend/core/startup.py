@@ -0,0 +1,47 @@
+import logging
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class StartupTimer:
+    """
+    Đo thời gian khởi động: import ứng dụng, lifespan sẵn sàng và request đầu
+    tiên được phục vụ (tính từ lúc module này được import trong main.py).
+    """
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.import_seconds: Optional[float] = None
+        self.ready_seconds: Optional[float] = None
+        self.first_request_seconds: Optional[float] = None
+
+    def _elapsed(self) -> float:
+        return round(time.perf_counter() - self.started_at, 4)
+
+    def mark_imported(self) -> None:
+        if self.import_seconds is None:
+            self.import_seconds = self._elapsed()
+
+    def mark_ready(self) -> None:
+        if self.ready_seconds is None:
+            self.ready_seconds = self._elapsed()
+            logger.info(
+                f"Khởi động: import {self.import_seconds}s, sẵn sàng sau {self.ready_seconds}s"
+            )
+
+    def mark_request(self) -> None:
+        if self.first_request_seconds is None:
+            self.first_request_seconds = self._elapsed()
+            logger.info(f"Request đầu tiên xong sau {self.first_request_seconds}s")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "import_seconds": self.import_seconds,
+            "ready_seconds": self.ready_seconds,
+            "first_request_seconds": self.first_request_seconds,
+        }
+
+
+startup_timer = StartupTimer()
@@ -1,6 +1,9 @@
+from typing import Iterable
 from uuid import uuid4
 from fastapi import Request
 from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.types import ASGIApp, Receive, Scope, Send
 
 
 class RequestIDMiddleware(BaseHTTPMiddleware):
@@ -10,3 +13,24 @@ class RequestIDMiddleware(BaseHTTPMiddleware):
         response = await call_next(request)
         response.headers["X-Request-ID"] = request_id
         return response
+
+
+class SelectiveGZipMiddleware:
+    """
+    GZipMiddleware trừ các path trong exclude_paths (so theo prefix): route
+    như /download trả byte nguyên vẹn kèm Content-Length / Content-Range,
+    nén lại sẽ làm sai các header đó.
+    """
+
+    def __init__(
+        self, app: ASGIApp, exclude_paths: Iterable[str], minimum_size: int = 500
+    ):
+        self.app = app
+        self.gzip = GZipMiddleware(app, minimum_size=minimum_size)
+        self.exclude_paths = tuple(exclude_paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and scope["path"].startswith(self.exclude_paths):
+            await self.app(scope, receive, send)
+            return
+        await self.gzip(scope, receive, send)
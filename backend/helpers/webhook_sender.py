@@ -0,0 +1,117 @@
+"""
+Gửi webhook giả lập fal/Leonardo tới server local, thay cho provider khi test.
+
+    python -m helpers.webhook_sender fal <request_id> <fal_request_id> --video-url https://...
+    python -m helpers.webhook_sender leonardo <generation_id> --video-url https://...
+    python -m helpers.webhook_sender variation <variation_id> --image-url https://...
+"""
+
+import argparse
+import asyncio
+from typing import Any, Dict, Optional
+
+import httpx
+
+from core.config import settings
+from core.security import create_webhook_token
+
+
+def fal_payload(
+    fal_request_id: str, video_url: Optional[str] = None, error: Optional[str] = None
+) -> Dict[str, Any]:
+    if video_url:
+        return {
+            "request_id": fal_request_id,
+            "status": "OK",
+            "payload": {"video": {"url": video_url}},
+        }
+    return {
+        "request_id": fal_request_id,
+        "status": "ERROR",
+        "payload": None,
+        "error": error or "Generation failed",
+    }
+
+
+def leonardo_payload(
+    job_id: str,
+    variation: bool = False,
+    url: Optional[str] = None,
+    failed: bool = False,
+) -> Dict[str, Any]:
+    image: Dict[str, Any] = {"id": f"{job_id}-0"}
+    if url:
+        image["url" if variation else "motionMP4URL"] = url
+    kind = "variation" if variation else "image_generation"
+    return {
+        "type": f"{kind}.{'failed' if failed else 'complete'}",
+        "data": {
+            "object": {
+                "id": job_id,
+                "status": "FAILED" if failed else "COMPLETE",
+                "images": [] if failed else [image],
+            }
+        },
+    }
+
+
+async def send_fal(
+    base_url: str,
+    request_id: str,
+    fal_request_id: str,
+    video_url: Optional[str] = None,
+    error: Optional[str] = None,
+) -> httpx.Response:
+    url = f"{base_url.rstrip('/')}/{settings.API_PREFIX}/webhooks/fal/{request_id}"
+    async with httpx.AsyncClient() as client:
+        return await client.post(
+            url,
+            params={"token": create_webhook_token(request_id)},
+            json=fal_payload(fal_request_id, video_url, error),
+        )
+
+
+async def send_leonardo(
+    base_url: str,
+    job_id: str,
+    variation: bool = False,
+    url: Optional[str] = None,
+    failed: bool = False,
+) -> httpx.Response:
+    endpoint = f"{base_url.rstrip('/')}/{settings.API_PREFIX}/webhooks/leonardo"
+    async with httpx.AsyncClient() as client:
+        return await client.post(
+            endpoint,
+            headers={"Authorization": f"Bearer {settings.LEONARDO_WEBHOOK_SECRET}"},
+            json=leonardo_payload(job_id, variation, url, failed),
+        )
+
+
+async def _main(args: argparse.Namespace) -> None:
+    if args.provider == "fal":
+        response = await send_fal(
+            args.base_url, args.job_id, args.fal_request_id, args.video_url, args.error
+        )
+    else:
+        response = await send_leonardo(
+            args.base_url,
+            args.job_id,
+            variation=args.provider == "variation",
+            url=args.image_url or args.video_url,
+            failed=args.error is not None,
+        )
+    print(response.status_code, response.text)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gửi webhook giả lập")
+    parser.add_argument("provider", choices=["fal", "leonardo", "variation"])
+    parser.add_argument("job_id")
+    parser.add_argument("fal_request_id", nargs="?", default="")
+    parser.add_argument(
+        "--base-url", default=settings.PUBLIC_BASE_URL or "http://localhost:8000"
+    )
+    parser.add_argument("--video-url")
+    parser.add_argument("--image-url")
+    parser.add_argument("--error")
+    asyncio.run(_main(parser.parse_args()))
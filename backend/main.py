@@ -1,17 +1,31 @@
+from core.startup import startup_timer
+
+import asyncio
 import uvicorn
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 
 from starlette.middleware.cors import CORSMiddleware
-from starlette.middleware.gzip import GZipMiddleware
 
+from core.clients import clients
 from core.config import settings
 from core.database import Database
+from core.events import job_events
+from core.executors import shutdown_executors
+from core.http_clients import http_clients
 
 from api.v1.api import router, secure_router
+from api.v1.services.archiver import artifact_archiver
+from api.v1.services.gcs_outbox import gcs_purger
+from api.v1.services.gcs_reconciler import bucket_reconciler
+from api.v1.services.image_counters import image_counter_reconciler
+from api.v1.services.job_poller import job_poller
+from api.v1.services.job_watchers import register_job_watchers
+from api.v1.services.video_jobs import video_job_store
+from api.v1.services.video_worker import video_worker
 
 from helpers.execption import setup_exception_handlers
-from helpers.middleware import RequestIDMiddleware
+from helpers.middleware import RequestIDMiddleware, SelectiveGZipMiddleware
 
 app = FastAPI()
 
@@ -19,7 +33,28 @@ app = FastAPI()
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     Database.initialize()
+    warm_up_task = asyncio.create_task(http_clients.warm_up())
+    register_job_watchers()
+    job_poller.start()
+    video_worker.start()
+    artifact_archiver.start()
+    image_counter_reconciler.start()
+    gcs_purger.start()
+    bucket_reconciler.start()
+    startup_timer.mark_ready()
     yield
+    warm_up_task.cancel()
+    await video_worker.stop()
+    await artifact_archiver.stop()
+    await image_counter_reconciler.stop()
+    await gcs_purger.stop()
+    await bucket_reconciler.stop()
+    await job_events.aclose()
+    await job_poller.stop()
+    await video_job_store.aclose()
+    clients.close()
+    await http_clients.aclose()
+    shutdown_executors()
 
 
 def init_application():
@@ -39,7 +74,10 @@ def init_application():
     )
     app.include_router(router, prefix=f"/{settings.API_PREFIX}")
     app.include_router(secure_router, prefix=f"/{settings.API_PREFIX}")
-    app.add_middleware(GZipMiddleware)
+    app.add_middleware(
+        SelectiveGZipMiddleware,
+        exclude_paths=[f"/{settings.API_PREFIX}/download"],
+    )
     setup_exception_handlers(app)
 
     return app
@@ -59,8 +97,12 @@ async def db_session_middleware(request: Request, call_next):
         raise e
     finally:
         await request.state.db.close()
+    startup_timer.mark_request()
     return response
 
 
+startup_timer.mark_imported()
+
+
 if __name__ == "__main__":
     uvicorn.run(app, host=settings.APP_HOST, port=settings.APP_PORT)
@@ -1,7 +1,11 @@
 from typing import List, Optional
 from core.database import Base
 
+from collections import Counter
+
 from sqlalchemy import (
+    event,
+    update,
     ForeignKey,
     Integer,
     String,
@@ -9,10 +13,11 @@ from sqlalchemy import (
     Column,
     Boolean,
     Float,
+    Index,
     DateTime,
     Text,
 )
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy.orm import Mapped, Session, mapped_column, relationship
 from datetime import datetime
 
 image_sources = Table(
@@ -31,6 +36,13 @@ class User(Base):
     first_name: Mapped[str] = mapped_column(String(255), nullable=False)
     last_name: Mapped[str] = mapped_column(String(255), nullable=False)
     hashed_password: Mapped[str] = mapped_column(String(255), nullable=False)
+    # Đếm sẵn số ảnh của user, cập nhật cùng transaction với insert/delete ảnh
+    image_count: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0, server_default="0"
+    )
+    source_image_count: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0, server_default="0"
+    )
 
     images: Mapped[List["Image"]] = relationship(back_populates="user")
 
@@ -50,6 +62,7 @@ class Image(Base):
     prompt: Mapped[Optional[str]] = mapped_column(String(10000), nullable=True)
     model: Mapped[Optional[str]] = mapped_column(String(100), nullable=True)
     is_source: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
+    provider_url: Mapped[Optional[str]] = mapped_column(String(1000), nullable=True)
 
     user: Mapped["User"] = relationship(back_populates="images")
 
@@ -60,14 +73,58 @@ class Image(Base):
         backref="generated_images",
     )
 
+    # Lịch sử ảnh của user: lọc theo (user_id, is_source), sắp xếp (created_at, id)
+    __table_args__ = (
+        Index(
+            "ix_images_user_source_created",
+            "user_id",
+            "is_source",
+            "created_at",
+            "id",
+        ),
+    )
+
     def __repr__(self) -> str:
         return f"<Image(id={self.id}, filename={self.gcs_filename})>"
 
 
+@event.listens_for(Session, "after_flush")
+def _update_image_counters(session: Session, flush_context) -> None:
+    """
+    Giữ users.image_count / source_image_count khớp với bảng images: mọi
+    Image được thêm/xóa qua ORM đều điều chỉnh bộ đếm trong cùng transaction.
+    Xóa hàng loạt bằng Core phải tự thực thi image_counter_update.
+    """
+    deltas: Counter = Counter()
+    for obj in session.new:
+        if isinstance(obj, Image):
+            deltas[(obj.user_id, bool(obj.is_source))] += 1
+    for obj in session.deleted:
+        if isinstance(obj, Image):
+            deltas[(obj.user_id, bool(obj.is_source))] -= 1
+
+    for (user_id, is_source), delta in deltas.items():
+        if delta and user_id is not None:
+            session.connection().execute(
+                image_counter_update(user_id, is_source, delta)
+            )
+
+
+def image_counter_update(user_id: int, is_source: bool, delta: int):
+    column = User.source_image_count if is_source else User.image_count
+    # Giữ nguyên updated_at: đây không phải thay đổi thông tin user
+    return (
+        update(User)
+        .where(User.id == user_id)
+        .values({column: column + delta, User.updated_at: User.updated_at})
+    )
+
+
 class VideoRequest(Base):
     __tablename__ = "video_requests"
 
     id = Column(String(36), primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
     status = Column(String(20), index=True)
     prompt = Column(String(10000))
     image_url = Column(String(500))
@@ -82,3 +139,48 @@ class VideoRequest(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     processing_time = Column(Float, nullable=True)
     kling_request_id = Column(String(100), nullable=True)
+    provider_video_url = Column(String(1000), nullable=True)
+    gcs_filename = Column(String(500), nullable=True)
+    archived_at = Column(DateTime, nullable=True)
+
+
+class GcsDeletion(Base):
+    """Outbox: object GCS cần xóa, ghi cùng transaction với việc xóa bản ghi."""
+
+    __tablename__ = "gcs_deletions"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    gcs_bucket: Mapped[str] = mapped_column(String(255), nullable=False)
+    gcs_filename: Mapped[str] = mapped_column(String(500), nullable=False)
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    next_attempt_at: Mapped[datetime] = mapped_column(
+        DateTime, nullable=False, default=datetime.utcnow, index=True
+    )
+    last_error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+
+
+class ProviderJob(Base):
+    """
+    Job Leonardo (generation/variation) do app gửi đi: chủ sở hữu và ngữ cảnh
+    ghi lúc submit, trạng thái cuối (từ webhook hoặc sau khi lưu kết quả vào
+    bucket) dùng chung cho mọi worker.
+    """
+
+    __tablename__ = "provider_jobs"
+
+    kind: Mapped[str] = mapped_column(String(20), primary_key=True)
+    job_id: Mapped[str] = mapped_column(String(100), primary_key=True)
+    user_id: Mapped[Optional[int]] = mapped_column(
+        ForeignKey("users.id"), nullable=True
+    )
+    context: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    state: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    finished_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime, nullable=True, index=True
+    )
+    # Kết quả đã được lưu vào bucket (hoặc job không có gì để lưu)
+    archived_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime, nullable=True, index=True
+    )
+
+    __table_args__ = (Index("ix_provider_jobs_updated_at", "updated_at"),)
@@ -0,0 +1,138 @@
+"""
+Benchmark I/O GCS: upload ảnh đồng thời tới một fake GCS chạy local và đo
+độ trễ event loop, so sánh gọi SDK google-cloud-storage thẳng trên loop
+(cách cũ) với ImageStorage qua gcs_executor.
+
+Fake GCS là HTTP server đa luồng nhận upload multipart của JSON API, giữ
+mỗi request thêm --latency giây để giả lập mạng tới GCS.
+
+Chạy từ thư mục backend (cần .env như khi chạy app):
+
+    python -m scripts.bench_gcs --uploads 32 --size 2000000 --latency 0.2
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict
+
+from fastapi import UploadFile
+from google.auth.credentials import AnonymousCredentials
+from google.cloud import storage
+from starlette.datastructures import Headers
+
+from core.google_cloud import ImageStorage, gcs_executor
+from scripts.loop_lag import LoopLagMonitor
+
+BUCKET = "bench"
+
+
+def start_fake_gcs(latency: float) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args) -> None:
+            pass
+
+        def _reply(self, status: int, body: bytes = b"") -> None:
+            time.sleep(latency)
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self) -> None:
+            size = int(self.headers.get("Content-Length") or 0)
+            self.rfile.read(size)
+            resource = {
+                "bucket": BUCKET,
+                "name": uuid.uuid4().hex,
+                "size": str(size),
+                "generation": "1",
+            }
+            self._reply(200, json.dumps(resource).encode())
+
+        def do_DELETE(self) -> None:
+            self._reply(204)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def make_upload(data: bytes) -> UploadFile:
+    return UploadFile(
+        file=io.BytesIO(data),
+        filename="bench.png",
+        headers=Headers({"content-type": "image/png"}),
+    )
+
+
+async def _inline_upload(image_storage: ImageStorage, data: bytes) -> None:
+    # Cách cũ: handler async gọi thẳng SDK đồng bộ
+    blob = image_storage.bucket.blob(f"images_uploaded/{uuid.uuid4()}.png")
+    blob.upload_from_string(data, content_type="image/png")
+
+
+async def _executor_upload(image_storage: ImageStorage, data: bytes) -> None:
+    await image_storage.upload_image(make_upload(data), folder="images_uploaded")
+
+
+async def run(
+    mode: str, image_storage: ImageStorage, uploads: int, data: bytes
+) -> Dict[str, Any]:
+    upload = _executor_upload if mode == "executor" else _inline_upload
+
+    async with LoopLagMonitor() as monitor:
+        started_at = time.perf_counter()
+        await asyncio.gather(*(upload(image_storage, data) for _ in range(uploads)))
+        elapsed = time.perf_counter() - started_at
+
+    return {
+        "mode": mode,
+        "uploads": uploads,
+        "seconds": round(elapsed, 3),
+        "uploads_per_second": round(uploads / elapsed, 2),
+        "loop_lag": monitor.summary(),
+    }
+
+
+async def main(args: argparse.Namespace) -> None:
+    server = start_fake_gcs(args.latency)
+    client = storage.Client(
+        project="bench",
+        credentials=AnonymousCredentials(),
+        client_options={"api_endpoint": f"http://127.0.0.1:{server.server_port}"},
+    )
+    image_storage = ImageStorage(bucket_name=BUCKET, client=client)
+    data = b"\0" * args.size
+
+    try:
+        reports = [
+            await run(mode, image_storage, args.uploads, data) for mode in args.modes
+        ]
+    finally:
+        gcs_executor.shutdown()
+        server.shutdown()
+    print(
+        json.dumps({"runs": reports, "gcs_executor": gcs_executor.stats()}, indent=2)
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--uploads", type=int, default=32)
+    # Dưới ngưỡng 8MB của SDK để upload luôn là một request multipart
+    parser.add_argument("--size", type=int, default=2_000_000)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument(
+        "--modes",
+        nargs="+",
+        choices=["inline", "executor"],
+        default=["inline", "executor"],
+    )
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,74 @@
+"""
+Benchmark login: thông lượng verify_password và độ trễ event loop khi có
+nhiều login cùng lúc, so sánh bcrypt chạy thẳng trên loop (cách cũ) với
+password_executor.
+
+Chạy từ thư mục backend (cần .env như khi chạy app):
+
+    python -m scripts.bench_password --logins 32
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from typing import Any, Dict
+
+from core.security import (
+    get_password_hash,
+    password_executor,
+    verify_password,
+    verify_password_async,
+)
+from scripts.loop_lag import LoopLagMonitor
+
+
+async def _inline_login(password: str, hashed: str) -> bool:
+    # Cách cũ: handler async gọi thẳng bcrypt
+    return verify_password(password, hashed)
+
+
+async def run(mode: str, logins: int, password: str, hashed: str) -> Dict[str, Any]:
+    login = verify_password_async if mode == "executor" else _inline_login
+
+    async with LoopLagMonitor() as monitor:
+        started_at = time.perf_counter()
+        results = await asyncio.gather(
+            *(login(password, hashed) for _ in range(logins))
+        )
+        elapsed = time.perf_counter() - started_at
+
+    assert all(results)
+    return {
+        "mode": mode,
+        "logins": logins,
+        "seconds": round(elapsed, 3),
+        "logins_per_second": round(logins / elapsed, 2),
+        "loop_lag": monitor.summary(),
+    }
+
+
+async def main(args: argparse.Namespace) -> None:
+    password = "benchmark-password"
+    hashed = get_password_hash(password)
+
+    reports = [await run(mode, args.logins, password, hashed) for mode in args.modes]
+    print(
+        json.dumps(
+            {"runs": reports, "password_executor": password_executor.stats()},
+            indent=2,
+        )
+    )
+    password_executor.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--logins", type=int, default=32)
+    parser.add_argument(
+        "--modes",
+        nargs="+",
+        choices=["inline", "executor"],
+        default=["inline", "executor"],
+    )
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,99 @@
+"""
+Benchmark khởi động: thời gian import main, lifespan sẵn sàng và request đầu
+tiên (số liệu của startup_timer) qua nhiều lần cold start, mỗi lần một
+process mới; kèm chi phí lấy storage client mỗi request, so sánh tạo mới từ
+file credentials (cách cũ của get_image_storage) với container clients.
+
+Chạy từ thư mục backend (cần .env như khi chạy app):
+
+    python -m scripts.bench_startup --runs 5
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+from core.config import settings
+
+# Chạy trong process con để mỗi lần đo đều là cold start
+COLD_START = """
+import json, logging
+logging.disable(logging.CRITICAL)
+import main
+from fastapi.testclient import TestClient
+with TestClient(main.app) as client:
+    client.get("/docs")
+print(json.dumps(main.startup_timer.stats()))
+"""
+
+
+def cold_start() -> Dict[str, float]:
+    output = subprocess.run(
+        [sys.executable, "-c", COLD_START],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    return {
+        "median": round(statistics.median(samples), 4),
+        "min": round(min(samples), 4),
+        "max": round(max(samples), 4),
+    }
+
+
+def time_per_call(func: Callable[[], Any], calls: int) -> float:
+    started_at = time.perf_counter()
+    for _ in range(calls):
+        func()
+    return round((time.perf_counter() - started_at) / calls * 1000, 3)
+
+
+def client_construction(calls: int) -> Dict[str, Any]:
+    from google.cloud import storage
+
+    from core.clients import clients
+    from core.google_cloud import ImageStorage
+
+    def per_request() -> ImageStorage:
+        # Cách cũ: đọc lại credentials và tạo client mới mỗi request /upload
+        client = storage.Client.from_service_account_json(
+            settings.GCS_CREDENTIALS_PATH
+        )
+        return ImageStorage(bucket_name=settings.GCS_BUCKET_NAME, client=client)
+
+    report = {
+        "calls": calls,
+        "per_request_ms": time_per_call(per_request, calls),
+        "container_ms": time_per_call(lambda: clients.image_storage, calls),
+    }
+    clients.close()
+    return report
+
+
+def main(args: argparse.Namespace) -> None:
+    runs = [cold_start() for _ in range(args.runs)]
+    report: Dict[str, Any] = {
+        "runs": args.runs,
+        "startup_seconds": {
+            field: summarize([run[field] for run in runs])
+            for field in ("import_seconds", "ready_seconds", "first_request_seconds")
+        },
+    }
+    if settings.GCS_CREDENTIALS_PATH:
+        report["image_storage"] = client_construction(args.calls)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--calls", type=int, default=50)
+    main(parser.parse_args())
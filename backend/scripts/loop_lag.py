@@ -0,0 +1,53 @@
+import asyncio
+import statistics
+import time
+from typing import Dict, List, Optional
+
+
+class LoopLagMonitor:
+    """
+    Đo độ trễ của event loop trong lúc benchmark: một task ngủ interval giây
+    liên tục và ghi lại phần thức dậy muộn hơn dự kiến. Loop bị chặn bao lâu
+    thì lag tăng bấy nhiêu.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.samples: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+        self._sleeping_since = 0.0
+
+    async def _run(self) -> None:
+        while True:
+            self._sleeping_since = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(
+                time.perf_counter() - self._sleeping_since - self.interval
+            )
+
+    async def __aenter__(self) -> "LoopLagMonitor":
+        self.samples = []
+        self._task = asyncio.create_task(self._run())
+        # Cho task chạy tới lần sleep đầu tiên trước khi bắt đầu tải
+        await asyncio.sleep(0)
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        # Nếu tải chặn loop tới tận lúc kết thúc, lần sleep đang dở chưa kịp
+        # ghi mẫu nào: tính luôn phần trễ của nó
+        late = time.perf_counter() - self._sleeping_since - self.interval
+        if late > 0:
+            self.samples.append(late)
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+
+    def summary(self) -> Dict[str, float]:
+        if not self.samples:
+            return {"samples": 0, "p50_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+        samples = sorted(self.samples)
+        return {
+            "samples": len(samples),
+            "p50_ms": round(statistics.median(samples) * 1000, 2),
+            "p99_ms": round(samples[int((len(samples) - 1) * 0.99)] * 1000, 2),
+            "max_ms": round(samples[-1] * 1000, 2),
+        }
@@ -35,6 +35,7 @@ import {
 import { useDropzone } from "react-dropzone";
 import { uploadImageService } from "@/services/upload";
 import { checkStatus, generateVideo } from "@/services/generate-video";
+import { subscribeJobEvents } from "@/services/events";
 import { useSelector } from "react-redux";
 
 const apiService = {
@@ -128,28 +129,39 @@ const ImageToVideoApp = () => {
 
   useEffect(() => {
     if (requestId && !completedRef.current) {
-      const checkVideoStatus = async () => {
-        try {
-          const data = await checkStatus(requestId);
-          setStatusData(data);
+      const handleStatus = (data) => {
+        setStatusData(data);
 
-          if (data?.status === "completed" || data?.status === "failed") {
-            completedRef.current = true;
+        if (data?.status === "completed" || data?.status === "failed") {
+          completedRef.current = true;
 
-            if (statusIntervalRef.current) {
-              clearInterval(statusIntervalRef.current);
-              statusIntervalRef.current = null;
-            }
+          if (statusIntervalRef.current) {
+            clearInterval(statusIntervalRef.current);
+            statusIntervalRef.current = null;
           }
+        }
+      };
+
+      const checkVideoStatus = async () => {
+        try {
+          handleStatus(await checkStatus(requestId));
         } catch (error) {
           console.error("Error checking status:", error);
         }
       };
 
-      checkVideoStatus();
-      statusIntervalRef.current = setInterval(checkVideoStatus, 3000);
+      // Status is pushed over SSE; polling is only the fallback
+      const unsubscribe = subscribeJobEvents("video", requestId, {
+        onEvent: handleStatus,
+        onError: () => {
+          if (completedRef.current || statusIntervalRef.current) return;
+          checkVideoStatus();
+          statusIntervalRef.current = setInterval(checkVideoStatus, 3000);
+        },
+      });
 
       return () => {
+        unsubscribe();
         if (statusIntervalRef.current) {
           clearInterval(statusIntervalRef.current);
           statusIntervalRef.current = null;
@@ -1,4 +1,4 @@
-import React, { useState, useCallback, useEffect } from "react";
+import React, { useState, useCallback, useEffect, useRef } from "react";
 import { useDropzone } from "react-dropzone";
 import { Camera } from "lucide-react";
 import { Button } from "@/components/ui/button";
@@ -7,6 +7,7 @@ import {
   checkLeonardoStatus,
   generateImageToVideo,
 } from "@/services/generate-video";
+import { subscribeJobEvents } from "@/services/events";
 
 const LeonardoImageToVideo = () => {
   const [file, setFile] = useState(null);
@@ -18,6 +19,7 @@ const LeonardoImageToVideo = () => {
   const [prompt, setPrompt] = useState("");
   const [generationId, setGenerationId] = useState(null);
   const [statusCheckInterval, setStatusCheckInterval] = useState(null);
+  const unsubscribeRef = useRef(null);
 
   const onDrop = useCallback((acceptedFiles) => {
     if (acceptedFiles && acceptedFiles.length > 0) {
@@ -75,12 +77,7 @@ const LeonardoImageToVideo = () => {
         })
       );
 
-      if (!generationResponse.ok) {
-        const errorData = await generationResponse.json();
-        throw new Error(errorData.detail || "Video generation failed");
-      }
-
-      const generationData = await generationResponse.json();
+      const generationData = generationResponse.data;
       const newGenerationId = generationData.generation_id;
 
       if (!newGenerationId) {
@@ -98,35 +95,33 @@ const LeonardoImageToVideo = () => {
     }
   };
 
-  const startStatusChecking = (id) => {
-    // Clear any existing interval
-    if (statusCheckInterval) {
-      clearInterval(statusCheckInterval);
+  const handleStatus = (id, statusData) => {
+    // Returns true once the generation is finished (either way)
+    if (statusData.status === "COMPLETE" && statusData.video_url) {
+      setUploadResult({
+        id: id,
+        video_url: statusData.video_url,
+      });
+      setIsUploading(false);
+      setIsProcessing(false);
+      return true;
+    } else if (statusData.status === "FAILED") {
+      setError("Video generation failed");
+      setIsUploading(false);
+      setIsProcessing(false);
+      return true;
     }
+    return false;
+  };
 
-    // Set new interval for status checking
+  const startPolling = (id) => {
     const interval = setInterval(async () => {
       try {
         const statusResponse = await checkLeonardoStatus(id);
 
-        if (!statusResponse.ok) {
-          throw new Error("Failed to check status");
-        }
-
-        const statusData = await statusResponse.json();
-
-        // If complete, update the result and stop checking
-        if (statusData.status === "COMPLETE" && statusData.video_url) {
-          setUploadResult({
-            id: id,
-            video_url: statusData.video_url,
-          });
-          setIsUploading(false);
-          setIsProcessing(false);
+        if (handleStatus(id, statusResponse.data)) {
           clearInterval(interval);
           setStatusCheckInterval(null);
-        } else if (statusData.status === "FAILED") {
-          throw new Error("Video generation failed");
         }
         // Otherwise continue polling
       } catch (err) {
@@ -141,6 +136,21 @@ const LeonardoImageToVideo = () => {
     setStatusCheckInterval(interval);
   };
 
+  const startStatusChecking = (id) => {
+    // Clear any existing interval / stream
+    if (statusCheckInterval) {
+      clearInterval(statusCheckInterval);
+      setStatusCheckInterval(null);
+    }
+    unsubscribeRef.current?.();
+
+    // Status is pushed over SSE; fall back to polling if the stream fails
+    unsubscribeRef.current = subscribeJobEvents("leonardo", id, {
+      onEvent: (statusData) => handleStatus(id, statusData),
+      onError: () => startPolling(id),
+    });
+  };
+
   // Clean up interval on component unmount
   useEffect(() => {
     return () => {
@@ -150,6 +160,10 @@ const LeonardoImageToVideo = () => {
     };
   }, [statusCheckInterval]);
 
+  useEffect(() => {
+    return () => unsubscribeRef.current?.();
+  }, []);
+
   const clearUpload = () => {
     setFile(null);
     setPreview(null);
@@ -163,6 +177,8 @@ const LeonardoImageToVideo = () => {
       clearInterval(statusCheckInterval);
       setStatusCheckInterval(null);
     }
+    unsubscribeRef.current?.();
+    unsubscribeRef.current = null;
 
     // Revoke the object URL to avoid memory leaks
     if (preview) {
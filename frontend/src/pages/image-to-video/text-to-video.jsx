@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from "react";
+import React, { useState, useEffect, useRef } from "react";
 import {
   Card,
   CardContent,
@@ -31,6 +31,7 @@ import {
   checkLeonardoStatus,
   generateTextToVideo,
 } from "@/services/generate-video";
+import { subscribeJobEvents } from "@/services/events";
 import {
   dimensionOptions,
   vibeOptions,
@@ -55,6 +56,8 @@ const LeonardoTextToVideo = () => {
   const [generationId, setGenerationId] = useState("");
   const [error, setError] = useState("");
   const [pollingInterval, setPollingInterval] = useState(null);
+  const pollingIntervalRef = useRef(null);
+  const unsubscribeRef = useRef(null);
 
   const handleDimensionChange = (value) => {
     const selected = dimensionOptions.find((option) => option.name === value);
@@ -94,38 +97,63 @@ const LeonardoTextToVideo = () => {
     };
   }, [pollingInterval]);
 
+  useEffect(() => {
+    return () => unsubscribeRef.current?.();
+  }, []);
+
+  const stopStatusChecking = () => {
+    unsubscribeRef.current?.();
+    unsubscribeRef.current = null;
+    if (pollingIntervalRef.current) {
+      clearInterval(pollingIntervalRef.current);
+      pollingIntervalRef.current = null;
+    }
+    setPollingInterval(null);
+  };
+
+  // Apply a status payload (from SSE or polling)
+  const handleStatus = (data) => {
+    if (data.status === "COMPLETE") {
+      setIsGenerating(false);
+      setGeneratedVideoUrl(data.video_url);
+      stopStatusChecking();
+    } else if (data.status === "FAILED") {
+      setIsGenerating(false);
+      setError("Video generation failed. Please try again.");
+      stopStatusChecking();
+    }
+  };
+
   // Function to check generation status
   const checkGenerationStatus = async (id) => {
     try {
       const response = await checkLeonardoStatus(id);
-      const data = await response.json();
-
-      if (response.ok) {
-        if (data.status === "COMPLETE") {
-          setIsGenerating(false);
-          setGeneratedVideoUrl(data.video_url);
-          clearInterval(pollingInterval);
-          setPollingInterval(null);
-        } else if (data.status === "FAILED") {
-          setIsGenerating(false);
-          setError("Video generation failed. Please try again.");
-          clearInterval(pollingInterval);
-          setPollingInterval(null);
-        }
-      } else {
-        setIsGenerating(false);
-        setError(`Error checking status: ${data.detail || "Unknown error"}`);
-        clearInterval(pollingInterval);
-        setPollingInterval(null);
-      }
+      handleStatus(response.data);
     } catch (err) {
       setIsGenerating(false);
-      setError(`Error checking status: ${err.message}`);
-      clearInterval(pollingInterval);
-      setPollingInterval(null);
+      setError(
+        `Error checking status: ${
+          err.response?.data?.detail || err.message || "Unknown error"
+        }`
+      );
+      stopStatusChecking();
     }
   };
 
+  // Fallback when the event stream is unavailable
+  const startPolling = (id) => {
+    if (pollingIntervalRef.current) return;
+
+    const interval = setInterval(() => {
+      checkGenerationStatus(id);
+    }, 5000);
+
+    pollingIntervalRef.current = interval;
+    setPollingInterval(interval);
+
+    checkGenerationStatus(id);
+  };
+
   // Handle generate click
   const handleGenerate = async () => {
     if (!prompt) return;
@@ -135,33 +163,28 @@ const LeonardoTextToVideo = () => {
     setError("");
     setGenerationId("");
 
-    if (pollingInterval) {
-      clearInterval(pollingInterval);
-      setPollingInterval(null);
-    }
+    stopStatusChecking();
 
     try {
       const payload = generatePayload();
 
       const response = await generateTextToVideo(JSON.stringify(payload));
-      const data = await response.json();
-
-      if (!response.ok) {
-        throw new Error(data.detail || "Failed to generate video");
-      }
+      const data = response.data;
 
       setGenerationId(data.generation_id);
 
-      const interval = setInterval(() => {
-        checkGenerationStatus(data.generation_id);
-      }, 5000);
-
-      setPollingInterval(interval);
-
-      checkGenerationStatus(data.generation_id);
+      // Status is pushed over SSE; polling is only the fallback
+      unsubscribeRef.current = subscribeJobEvents(
+        "leonardo",
+        data.generation_id,
+        {
+          onEvent: handleStatus,
+          onError: () => startPolling(data.generation_id),
+        }
+      );
     } catch (err) {
       setIsGenerating(false);
-      setError(`Error: ${err.message}`);
+      setError(`Error: ${err.response?.data?.detail || err.message}`);
     }
   };
 
@@ -11,6 +11,7 @@ import {
   promptGenerating,
 } from "@/services/picture-ads";
 import { download } from "@/services/upload";
+import { subscribeJobEvents } from "@/services/events";
 import {
   SiInstagram,
   SiFacebook,
@@ -24,6 +25,7 @@ const ImageGenerateResult = ({ generatedBanners, promptInput, language }) => {
   const [loadingSocialMedia, setLoadingSocialMedia] = useState({});
   const [copiedStatus, setCopiedStatus] = useState({});
   const statusCheckTimers = useRef({});
+  const statusSubscriptions = useRef({});
 
   const upscaleParams = {
     ultra_upscale_style: "ARTISTIC",
@@ -38,6 +40,9 @@ const ImageGenerateResult = ({ generatedBanners, promptInput, language }) => {
       Object.values(statusCheckTimers.current).forEach((timer) => {
         if (timer) clearTimeout(timer);
       });
+      Object.values(statusSubscriptions.current).forEach((unsubscribe) => {
+        if (unsubscribe) unsubscribe();
+      });
     };
   }, []);
 
@@ -66,54 +71,88 @@ const ImageGenerateResult = ({ generatedBanners, promptInput, language }) => {
     }
   };
 
-  const checkUpscaleStatus = async (variationId, bannerId) => {
-    try {
-      const statusResponse = await upscaleVariation(variationId);
-      const responseData = statusResponse;
+  const stopStatusChecking = (bannerId) => {
+    if (statusCheckTimers.current[bannerId]) {
+      clearTimeout(statusCheckTimers.current[bannerId]);
+      statusCheckTimers.current[bannerId] = null;
+    }
+    if (statusSubscriptions.current[bannerId]) {
+      statusSubscriptions.current[bannerId]();
+      statusSubscriptions.current[bannerId] = null;
+    }
+  };
+
+  // Apply a status payload (from SSE or polling); returns true while pending
+  const applyUpscaleStatus = (responseData, bannerId) => {
+    if (!responseData) {
+      throw new Error("No data received from API");
+    }
 
-      if (!responseData) {
-        throw new Error("No data received from API");
+    const { status, generated_images, error } = responseData;
+
+    if (error) {
+      throw new Error(error);
+    }
+
+    if (status === "COMPLETE") {
+      stopStatusChecking(bannerId);
+
+      if (generated_images) {
+        setUpscaledResults((prev) => ({
+          ...prev,
+          [bannerId]: generated_images,
+        }));
+        toast.success("Your image has been successfully upscaled");
       }
+      setUpscalingImages((prev) => ({ ...prev, [bannerId]: false }));
+      return false;
+    } else if (status === "PENDING" || status === "IN_PROGRESS") {
+      return true;
+    }
+    throw new Error(`Unexpected status: ${status}`);
+  };
 
-      const { status, generated_images, error } = responseData;
+  const handleStatusError = (error, bannerId) => {
+    error && toast.error("Failed to retrieve upscale status");
+    setUpscalingImages((prev) => ({ ...prev, [bannerId]: false }));
+    stopStatusChecking(bannerId);
+  };
 
-      if (error) {
-        throw new Error(error);
+  const checkUpscaleStatus = (variationId, bannerId) => {
+    stopStatusChecking(bannerId);
+
+    // Status is pushed over SSE; polling is only the fallback
+    statusSubscriptions.current[bannerId] = subscribeJobEvents(
+      "variation",
+      variationId,
+      {
+        onEvent: (data) => {
+          try {
+            applyUpscaleStatus(data, bannerId);
+          } catch (error) {
+            handleStatusError(error, bannerId);
+          }
+        },
+        onError: () => pollUpscaleStatus(variationId, bannerId),
       }
+    );
+  };
 
-      if (status === "COMPLETE") {
-        if (statusCheckTimers.current[bannerId]) {
-          clearTimeout(statusCheckTimers.current[bannerId]);
-          statusCheckTimers.current[bannerId] = null;
-        }
+  const pollUpscaleStatus = async (variationId, bannerId) => {
+    try {
+      const statusResponse = await upscaleVariation(variationId);
 
-        if (generated_images) {
-          setUpscaledResults((prev) => ({
-            ...prev,
-            [bannerId]: generated_images,
-          }));
-          toast.success("Your image has been successfully upscaled");
-        }
-        setUpscalingImages((prev) => ({ ...prev, [bannerId]: false }));
-      } else if (status === "PENDING" || status === "IN_PROGRESS") {
+      if (applyUpscaleStatus(statusResponse, bannerId)) {
         if (statusCheckTimers.current[bannerId]) {
           clearTimeout(statusCheckTimers.current[bannerId]);
         }
 
         statusCheckTimers.current[bannerId] = setTimeout(() => {
-          checkUpscaleStatus(variationId, bannerId);
+          pollUpscaleStatus(variationId, bannerId);
         }, 2000);
-      } else {
-        throw new Error(`Unexpected status: ${status}`);
       }
     } catch (error) {
-      error && toast.error("Failed to retrieve upscale status");
-      setUpscalingImages((prev) => ({ ...prev, [bannerId]: false }));
-
-      if (statusCheckTimers.current[bannerId]) {
-        clearTimeout(statusCheckTimers.current[bannerId]);
-        statusCheckTimers.current[bannerId] = null;
-      }
+      handleStatusError(error, bannerId);
     }
   };
 
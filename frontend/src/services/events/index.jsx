@@ -0,0 +1,69 @@
+import { HTTP_METHOD } from "@/utils/constants";
+import { HOST } from "../host";
+import Request from "../request";
+
+const BASE_API_URL = import.meta.env.VITE_BASE_API_URL;
+
+// EventSource cannot send the Authorization header, so the stream is opened
+// with a short-lived token issued for this purpose
+const getEventsToken = async () => {
+  const response = await Request({
+    method: HTTP_METHOD.POST,
+    url: HOST.eventsToken,
+  });
+  return response?.data?.token;
+};
+
+/**
+ * Listen to status changes of a job over Server-Sent Events.
+ * topic: "video" | "leonardo" | "variation". onEvent receives the same
+ * payload as the matching status endpoint; the stream closes by itself once
+ * the job is final. onError is called if the stream cannot be opened or
+ * drops early, so the caller can fall back to polling.
+ * Returns a function that closes the stream.
+ */
+const subscribeJobEvents = (topic, jobId, { onEvent, onError }) => {
+  let source = null;
+  let closed = false;
+
+  const close = () => {
+    closed = true;
+    if (source) {
+      source.close();
+    }
+  };
+
+  getEventsToken()
+    .then((token) => {
+      if (closed) return;
+      source = new EventSource(
+        `${BASE_API_URL}${HOST.events}/${topic}/${jobId}?token=${encodeURIComponent(
+          token
+        )}`
+      );
+      source.addEventListener("status", (event) => {
+        const data = JSON.parse(event.data);
+        onEvent(data);
+        if (data.final) {
+          close();
+        }
+      });
+      // The token is single-use in practice (short TTL), so no auto-reconnect
+      source.onerror = () => {
+        if (!closed) {
+          close();
+          onError?.();
+        }
+      };
+    })
+    .catch(() => {
+      if (!closed) {
+        closed = true;
+        onError?.();
+      }
+    });
+
+  return close;
+};
+
+export { subscribeJobEvents };
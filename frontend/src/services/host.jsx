@@ -21,4 +21,6 @@ export const HOST = {
   pictureAdsMergeGenerate: "picture-ads/edit-merge",
   upscaleImage: "picture-ads/upscale-from-gcs",
   upscaleVariation: "picture-ads/upscale/variations",
+  events: "events",
+  eventsToken: "events/token",
 };